@@ -0,0 +1,476 @@
+import argparse
+import collections
+import math
+import random
+import select
+import socket
+import struct
+import threading
+import time
+
+
+# Outbound packets of the ACC broadcasting server, same layouts the
+# listener decodes
+
+def encode_str(data: str) -> bytes:
+    byte_data = data.encode("utf-8")
+    return struct.pack("<H", len(byte_data)) + byte_data
+
+
+def encode_registration(connection_id: int, success: bool = True,
+                        read_only: bool = False, error_msg: str = "") -> bytes:
+    return (struct.pack("<BiBB", 1, connection_id, success, not read_only)
+            + encode_str(error_msg))
+
+
+def encode_lap(lap_time_ms: int, car_index: int, driver_index: int = 0,
+               splits: tuple = (30000, 31000, 32000), is_invalid: bool = False,
+               is_valid_for_best: bool = True, is_out_lap: bool = False,
+               is_in_lap: bool = False) -> bytes:
+    return (struct.pack("<IHHB", lap_time_ms, car_index, driver_index,
+                        len(splits))
+            + struct.pack(f"<{len(splits)}i", *splits)
+            + struct.pack("<BBBB", is_invalid, is_valid_for_best, is_out_lap,
+                          is_in_lap))
+
+
+def encode_realtime_update(session_time_ms: float = 600000.0,
+                           session_end_time_ms: float = 3000000.0,
+                           session_type: int = 10, phase: int = 5,
+                           focused_car_index: int = 0,
+                           best_session_lap: bytes = None,
+                           event_index: int = 0, session_index: int = 0,
+                           ambient_temp: int = 22, track_temp: int = 30,
+                           time_of_day_ms: float = 50400000.0) -> bytes:
+
+    if best_session_lap is None:
+        best_session_lap = encode_lap(2147483647, 0, splits=())
+
+    return (struct.pack("<BHHBBffi", 2, event_index, session_index,
+                        session_type, phase, session_time_ms,
+                        session_end_time_ms, focused_car_index)
+            + encode_str("Drivable") + encode_str("Cockpit")
+            + encode_str("Basic HUD") + b"\x00"
+            + struct.pack("<fBB", time_of_day_ms, ambient_temp, track_temp)
+            + best_session_lap)
+
+
+def encode_car_update(car_index: int, position: int, driver_index: int = 0,
+                      world_pos_x: float = 100.0, world_pos_y: float = -50.0,
+                      yaw: float = 1.5, car_location: int = 1, kmh: int = 230,
+                      spline_position: float = 0.5, lap: int = 3,
+                      delta: int = -150, best_session_lap: bytes = None,
+                      last_lap: bytes = None,
+                      current_lap: bytes = None) -> bytes:
+
+    if best_session_lap is None:
+        best_session_lap = encode_lap(89000, car_index)
+
+    if last_lap is None:
+        last_lap = encode_lap(90000, car_index)
+
+    if current_lap is None:
+        current_lap = encode_lap(45000, car_index, splits=())
+
+    return (struct.pack("<BHHBBfffBHHHHfHi", 3, car_index, driver_index, 1, 4,
+                        world_pos_x, world_pos_y, yaw, car_location, kmh,
+                        position, position, position, spline_position, lap,
+                        delta)
+            + best_session_lap + last_lap + current_lap)
+
+
+def encode_entry_list(car_ids: list, connection_id: int = 0) -> bytes:
+    return (struct.pack("<BiH", 4, connection_id, len(car_ids))
+            + struct.pack(f"<{len(car_ids)}H", *car_ids))
+
+
+def encode_entry_list_car(car_index: int, team_name: str = None,
+                          race_number: int = None, model_type: int = 1,
+                          cup_category: int = 0, drivers: list = None) -> bytes:
+
+    if team_name is None:
+        team_name = f"Team {car_index}"
+
+    if race_number is None:
+        race_number = car_index + 1
+
+    if drivers is None:
+        drivers = [("First", f"Driver {car_index}", "DRV")]
+
+    data = (struct.pack("<BHB", 6, car_index, model_type)
+            + encode_str(team_name)
+            + struct.pack("<iBBH", race_number, cup_category, 0, 1)
+            + struct.pack("<B", len(drivers)))
+
+    for first_name, last_name, short_name in drivers:
+        data += (encode_str(first_name) + encode_str(last_name)
+                 + encode_str(short_name) + struct.pack("<BH", 1, 1))
+
+    return data
+
+
+def encode_track_data(track_name: str = "monza", track_id: int = 1,
+                      track_meters: int = 5793, connection_id: int = 0,
+                      camera_sets: dict = None, hud_pages: list = None) -> bytes:
+
+    if camera_sets is None:
+        camera_sets = {
+            "Drivable": ["Chase", "FarChase", "Bonnet", "Cockpit"],
+            "Onboard": ["Onboard0", "Onboard1", "Onboard2"],
+            "set1": ["CameraTV1", "CameraTV2"],
+        }
+
+    if hud_pages is None:
+        hud_pages = ["Blank", "Basic HUD", "Help", "TimeTable", "Broadcasting"]
+
+    data = (struct.pack("<Bi", 5, connection_id) + encode_str(track_name)
+            + struct.pack("<ii", track_id, track_meters)
+            + struct.pack("<B", len(camera_sets)))
+
+    for camera_set, cameras in camera_sets.items():
+        data += encode_str(camera_set) + struct.pack("<B", len(cameras))
+        for camera in cameras:
+            data += encode_str(camera)
+
+    data += struct.pack("<B", len(hud_pages))
+    for hud_page in hud_pages:
+        data += encode_str(hud_page)
+
+    return data
+
+
+def encode_broadcast_event(event_type: int, msg: str, time_ms: int,
+                           car_index: int) -> bytes:
+    return (struct.pack("<BB", 7, event_type) + encode_str(msg)
+            + struct.pack("<ii", time_ms, car_index))
+
+
+class SimulatedCar:
+
+    def __init__(self, car_index: int, rng: random.Random):
+
+        self.car_index = car_index
+        self.speed = rng.uniform(0.0095, 0.0105)  # lap fraction per second
+        self.progress = -car_index * 0.002
+        self.car_location = 1
+        self.pit_timer = 0.0
+        self.next_pit_lap = rng.randint(3, 12)
+        self.best_lap_ms = 2147483647
+        self.last_lap_ms = 2147483647
+        self.lap_start = 0.0
+
+    @property
+    def lap(self) -> int:
+        return max(0, math.floor(self.progress))
+
+    @property
+    def spline_position(self) -> float:
+        return self.progress % 1.0
+
+    def advance(self, session_time: float, dt: float,
+                rng: random.Random) -> bool:
+
+        lap = self.lap
+
+        if self.car_location in (2, 3, 4):
+            # Slow down in the pit lane, stop a bit, then leave
+            self.pit_timer -= dt
+            self.progress += self.speed * dt * 0.3
+
+            if self.pit_timer <= 0:
+                self.car_location = 4 if self.car_location == 2 else 1
+                self.pit_timer = 2.0 if self.car_location == 4 else 0.0
+
+            elif self.car_location == 3 and self.pit_timer < 20:
+                self.car_location = 2
+
+        else:
+            self.progress += self.speed * dt * rng.uniform(0.98, 1.02)
+
+        completed = self.lap > lap
+        if completed:
+            self.last_lap_ms = int((session_time - self.lap_start) * 1000)
+            self.best_lap_ms = min(self.best_lap_ms, self.last_lap_ms)
+            self.lap_start = session_time
+
+            if self.lap >= self.next_pit_lap and self.car_location == 1:
+                self.car_location = 3
+                self.pit_timer = 25.0
+                self.next_pit_lap += rng.randint(8, 15)
+
+        return completed
+
+
+def decode_command(data: bytes) -> dict:
+
+    # Broadcast control commands sent by the client, for checking them
+
+    def read_str(offset: int):
+        lenght = struct.unpack_from("<H", data, offset)[0]
+        offset += 2
+        return str(data[offset: offset + lenght], "utf-8"), offset + lenght
+
+    if data[0] == 49:
+        connection_id = struct.unpack_from("<i", data, 1)[0]
+        hud_page, _ = read_str(5)
+        return {"type": "hud_page", "connection_id": connection_id,
+                "hud_page": hud_page}
+
+    if data[0] == 50:
+        connection_id = struct.unpack_from("<i", data, 1)[0]
+        offset = 5
+        car_index = camera_set = camera = None
+
+        if data[offset]:
+            car_index = struct.unpack_from("<H", data, offset + 1)[0]
+            offset += 2
+        offset += 1
+
+        if data[offset]:
+            camera_set, offset = read_str(offset + 1)
+            camera, offset = read_str(offset)
+
+        return {"type": "focus", "connection_id": connection_id,
+                "car_index": car_index, "camera_set": camera_set,
+                "camera": camera}
+
+    if data[0] == 51:
+        (connection_id, start, duration,
+         car_index) = struct.unpack_from("<iffi", data, 1)
+        camera_set, offset = read_str(17)
+        camera, _ = read_str(offset)
+        return {"type": "instant_replay", "connection_id": connection_id,
+                "start_session_time_ms": start, "duration_ms": duration,
+                "car_index": car_index, "camera_set": camera_set,
+                "camera": camera}
+
+    return None
+
+
+class AccServerSimulator:
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9000,
+                 car_count: int = 20, interval_ms: float = None,
+                 track_name: str = "monza", track_meters: int = 5793,
+                 loss: float = 0.0, reorder: float = 0.0,
+                 time_scale: float = 1.0, seed: int = None):
+
+        self.car_count = car_count
+        self.interval_ms = interval_ms
+        self.track_name = track_name
+        self.track_meters = track_meters
+        self.loss = loss
+        self.reorder = reorder
+        self.time_scale = time_scale
+
+        self.sent = 0
+        self.dropped = 0
+        self.reordered = 0
+        self.commands = collections.deque(maxlen=1000)
+
+        self._rng = random.Random(seed)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self.address = self._socket.getsockname()
+
+        self._cars = [SimulatedCar(car_index, self._rng)
+                      for car_index in range(car_count)]
+        self._clients = {}
+        self._next_connection_id = 0
+        self._held = None
+        self._session_time = 0.0
+
+        self._running = False
+        self._thread = None
+
+    def start(self) -> None:
+
+        self._running = True
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self._socket.close()
+
+    def serve_forever(self) -> None:
+
+        self._running = True
+        next_tick = time.perf_counter()
+        last_tick = next_tick
+
+        while self._running:
+
+            timeout = max(0.0, next_tick - time.perf_counter())
+            readable, _, _ = select.select([self._socket], [], [], timeout)
+            if readable:
+                self._receive()
+
+            now = time.perf_counter()
+            if now >= next_tick and self._clients:
+                self._tick((now - last_tick) * self.time_scale)
+                last_tick = now
+                next_tick = now + self._interval() / 1000
+
+            elif not self._clients:
+                last_tick = now
+                next_tick = now + 0.1
+
+    def _interval(self) -> float:
+
+        if self.interval_ms is not None:
+            return self.interval_ms
+
+        return min(client["speed"] for client in self._clients.values())
+
+    def _send(self, data: bytes, address) -> None:
+
+        if self.loss and self._rng.random() < self.loss:
+            self.dropped += 1
+            return
+
+        if self.reorder and self._held is None \
+                and self._rng.random() < self.reorder:
+            # Hold it back, it goes out right after the next one
+            self._held = (data, address)
+            self.reordered += 1
+            return
+
+        self._socket.sendto(data, address)
+        self.sent += 1
+
+        if self._held is not None:
+            held, self._held = self._held, None
+            self._socket.sendto(*held)
+            self.sent += 1
+
+    def _receive(self) -> None:
+
+        try:
+            data, address = self._socket.recvfrom(2048)
+
+        except OSError:
+            return
+
+        if not data:
+            return
+
+        if data[0] == 1:
+            # version, name, password, speed, command password
+            offset = 2
+            name_lenght = struct.unpack_from("<H", data, offset)[0]
+            offset += 2 + name_lenght
+            password_lenght = struct.unpack_from("<H", data, offset)[0]
+            offset += 2 + password_lenght
+            speed = struct.unpack_from("<i", data, offset)[0]
+
+            connection_id = self._next_connection_id
+            self._next_connection_id += 1
+            self._clients[address] = {
+                "id": connection_id,
+                "speed": max(1, speed)
+            }
+            self._send(encode_registration(connection_id), address)
+
+        elif data[0] == 9:
+            self._clients.pop(address, None)
+
+        elif data[0] == 10 and address in self._clients:
+            connection_id = self._clients[address]["id"]
+            car_ids = [car.car_index for car in self._cars]
+
+            self._send(encode_entry_list(car_ids, connection_id), address)
+            for car_index in car_ids:
+                self._send(encode_entry_list_car(car_index), address)
+
+        elif data[0] == 11 and address in self._clients:
+            connection_id = self._clients[address]["id"]
+            self._send(encode_track_data(self.track_name, 1,
+                                         self.track_meters, connection_id),
+                       address)
+
+        elif data[0] in (49, 50, 51) and address in self._clients:
+            self.commands.append(decode_command(data))
+
+    def _tick(self, dt: float) -> None:
+
+        self._session_time += dt
+
+        events = []
+        for car in self._cars:
+            location = car.car_location
+            if car.advance(self._session_time, dt, self._rng):
+                events.append(encode_broadcast_event(
+                    5, "Lap completed", int(self._session_time * 1000),
+                    car.car_index))
+
+            if location != car.car_location and car.car_location == 3:
+                events.append(encode_broadcast_event(
+                    3, f"Car {car.car_index} pits",
+                    int(self._session_time * 1000), car.car_index))
+
+        ranking = sorted(self._cars, key=lambda c: c.progress, reverse=True)
+        packets = [encode_realtime_update(
+            session_time_ms=self._session_time * 1000,
+            focused_car_index=ranking[0].car_index if ranking else 0)]
+
+        for position, car in enumerate(ranking, start=1):
+
+            angle = car.spline_position * 2 * math.pi
+            packets.append(encode_car_update(
+                car.car_index, position,
+                world_pos_x=math.cos(angle) * self.track_meters / 6.28,
+                world_pos_y=math.sin(angle) * self.track_meters / 6.28,
+                yaw=(angle + math.pi / 2 + math.pi) % (2 * math.pi) - math.pi,
+                car_location=car.car_location,
+                kmh=int(car.speed * self.track_meters * 3.6
+                        * (0.3 if car.car_location != 1 else 1.0)),
+                spline_position=car.spline_position, lap=car.lap,
+                last_lap=encode_lap(car.last_lap_ms, car.car_index),
+                best_session_lap=encode_lap(car.best_lap_ms, car.car_index),
+                current_lap=encode_lap(
+                    int((self._session_time - car.lap_start) * 1000),
+                    car.car_index, splits=())))
+
+        packets += events
+
+        for address in list(self._clients):
+            for packet in packets:
+                self._send(packet, address)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Stand-in ACC broadcasting server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--cars", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=None,
+                        help="update interval in ms, default is the "
+                             "client's registration speed")
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--reorder", type=float, default=0.0)
+    parser.add_argument("--time-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    simulator = AccServerSimulator(args.host, args.port, args.cars,
+                                   args.interval, loss=args.loss,
+                                   reorder=args.reorder,
+                                   time_scale=args.time_scale, seed=args.seed)
+
+    print(f"[AccServerSimulator] Serving {args.cars} cars on "
+          f"{simulator.address[0]}:{simulator.address[1]}")
+
+    try:
+        simulator.serve_forever()
+
+    except KeyboardInterrupt:
+        print(f"[AccServerSimulator] Sent {simulator.sent} packets, "
+              f"dropped {simulator.dropped}, reordered {simulator.reordered}")
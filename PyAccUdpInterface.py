@@ -1,70 +1,148 @@
+import array
+import asyncio
+import bisect
+import collections
+import copy
+import csv
 import datetime
+import functools
+import itertools
+import logging
+import queue
+import selectors
+import mmap
+import os
 import time
 import socket
+import threading
 from multiprocessing.connection import Connection
-import queue
-from multiprocessing import Process, Queue, Pipe
+from multiprocessing import Process, Pipe, Queue, shared_memory
 from enum import Enum
 from copy import deepcopy
 
 import struct
-import sys
+
+try:
+    import numpy as np
+
+except ImportError:
+    np = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+except ImportError:
+    pyarrow = None
+
+
+_logger = logging.getLogger(__name__)
+
+
+# Precompiled layouts, ACC sends everything little endian
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I8 = struct.Struct("<b")
+_I16 = struct.Struct("<h")
+_I32 = struct.Struct("<i")
+_F32 = struct.Struct("<f")
+
+# Fixed size runs of each packet type
+_REGISTRATION = struct.Struct("<iBB")
+_REALTIME_HEADER = struct.Struct("<HHBBffi")
+_REPLAY_TIMES = struct.Struct("<ff")
+_REALTIME_FOOTER = struct.Struct("<fBB")
+_CAR_UPDATE = struct.Struct("<HHBBfffBHHHHfHi")
+_CAR_UPDATE_NO_POSITION = struct.Struct("<HHBB12xBHHHHfHi")
+_LAP_HEADER = struct.Struct("<IHHB")
+_LAP_FLAGS = struct.Struct("<BBBB")
+_ENTRY_LIST_HEADER = struct.Struct("<iH")
+_TRACK_HEADER = struct.Struct("<ii")
+_CAR_INFO = struct.Struct("<iBBH")
+_DRIVER_INFO = struct.Struct("<BH")
+_BROADCAST_EVENT = struct.Struct("<ii")
+
+
+@functools.lru_cache(maxsize=64)
+def _array_layout(fmt: str, count: int) -> struct.Struct:
+    # Variable length arrays (splits, car ids) only come in a few sizes
+    return struct.Struct(f"<{count}{fmt}")
 
 
 class Cursor:
 
     def __init__(self, byte: bytes):
         self._cursor = 0
-        self._byte_array = byte
+        self._byte_array = memoryview(byte)
+
+    def read_struct(self, layout: struct.Struct) -> tuple:
+
+        data = layout.unpack_from(self._byte_array, self._cursor)
+        self._cursor += layout.size
+
+        return data
+
+    def read_array(self, fmt: str, count: int) -> tuple:
+
+        return self.read_struct(_array_layout(fmt, count))
 
     def read_u8(self) -> int:
 
-        data = self._byte_array[self._cursor: self._cursor + 1]
+        data = _U8.unpack_from(self._byte_array, self._cursor)[0]
         self._cursor += 1
 
-        return int.from_bytes(data, byteorder=sys.byteorder, signed=False)
+        return data
 
     def read_u16(self) -> int:
 
-        data = self._byte_array[self._cursor: self._cursor + 2]
+        data = _U16.unpack_from(self._byte_array, self._cursor)[0]
         self._cursor += 2
 
-        return int.from_bytes(data, byteorder=sys.byteorder, signed=False)
+        return data
 
     def read_u32(self) -> int:
 
-        data = self._byte_array[self._cursor: self._cursor + 4]
+        data = _U32.unpack_from(self._byte_array, self._cursor)[0]
         self._cursor += 4
 
-        return int.from_bytes(data, byteorder=sys.byteorder, signed=False)
+        return data
 
     def read_i8(self) -> int:
 
-        data = self._byte_array[self._cursor: self._cursor + 1]
+        data = _I8.unpack_from(self._byte_array, self._cursor)[0]
         self._cursor += 1
 
-        return int.from_bytes(data, byteorder=sys.byteorder, signed=True)
+        return data
 
     def read_i16(self) -> int:
 
-        data = self._byte_array[self._cursor: self._cursor + 2]
+        data = _I16.unpack_from(self._byte_array, self._cursor)[0]
         self._cursor += 2
 
-        return int.from_bytes(data, byteorder=sys.byteorder, signed=True)
+        return data
 
     def read_i32(self) -> int:
 
-        data = self._byte_array[self._cursor: self._cursor + 4]
+        data = _I32.unpack_from(self._byte_array, self._cursor)[0]
         self._cursor += 4
 
-        return int.from_bytes(data, byteorder=sys.byteorder, signed=True)
+        return data
 
     def read_f32(self) -> float:
 
-        data = self._byte_array[self._cursor: self._cursor + 4]
+        data = _F32.unpack_from(self._byte_array, self._cursor)[0]
         self._cursor += 4
 
-        return struct.unpack("<f", data)[0]
+        return data
+
+    def skip(self, lenght: int) -> None:
+        self._cursor += lenght
+
+    def skip_string(self) -> None:
+        lenght = self.read_u16()
+        self._cursor += lenght
 
     def read_string(self) -> str:
 
@@ -77,31 +155,36 @@ class Cursor:
         # unicode charactere)
         # so if an emoji is in a name it put garbage bytes...
         # 6 bytes of trash idk why, so I ingore them
-        return string.decode("utf-8", errors="ignore")
+        return str(string, "utf-8", errors="ignore")
 
 
 class ByteWriter:
 
+    # Grows one bytearray in place, clear() to reuse it for the next packet
+
     def __init__(self) -> None:
-        self.bytes_array = b""
+        self.bytes_array = bytearray()
+
+    def clear(self) -> None:
+        del self.bytes_array[:]
 
     def write_u8(self, data: int) -> None:
-        self.bytes_array += (data).to_bytes(1, sys.byteorder, signed=False)
+        self.bytes_array += _U8.pack(data)
 
     def write_u16(self, data: int) -> None:
-        self.bytes_array += (data).to_bytes(2, sys.byteorder, signed=False)
+        self.bytes_array += _U16.pack(data)
 
     def write_u32(self, data: int) -> None:
-        self.bytes_array += (data).to_bytes(4, sys.byteorder, signed=False)
+        self.bytes_array += _U32.pack(data)
 
     def write_i16(self, data: int) -> None:
-        self.bytes_array += (data).to_bytes(2, sys.byteorder, signed=True)
+        self.bytes_array += _I16.pack(data)
 
     def write_i32(self, data: int) -> None:
-        self.bytes_array += (data).to_bytes(4, sys.byteorder, signed=True)
+        self.bytes_array += _I32.pack(data)
 
     def write_f32(self, data: float) -> None:
-        self.bytes_array += struct.pack("<f", data)[0]
+        self.bytes_array += _F32.pack(data)
 
     def write_str(self, data: str) -> None:
         # ACC does support unicode emoji but I do, hehe 😀
@@ -110,7 +193,178 @@ class ByteWriter:
         self.bytes_array += byte_data
 
     def get_bytes(self) -> bytes:
-        return self.bytes_array
+        return bytes(self.bytes_array)
+
+
+# Outbound message types of the broadcasting protocol
+REGISTER_COMMAND_APPLICATION = 1
+UNREGISTER_COMMAND_APPLICATION = 9
+REQUEST_ENTRY_LIST = 10
+REQUEST_TRACK_DATA = 11
+CHANGE_HUD_PAGE = 49
+CHANGE_FOCUS = 50
+INSTANT_REPLAY_REQUEST = 51
+
+# Fixed layout commands, type and connection id
+_COMMAND_CONNECTION = struct.Struct("<Bi")
+_INSTANT_REPLAY = struct.Struct("<Biffi")
+
+
+class CommandQueue:
+
+    # Outgoing commands wait for the next tick. Commands with the same key
+    # in one tick are coalesced (the last HUD page wins, focus changes are
+    # merged) and a token bucket caps how many go out per second, the rest
+    # wait for the next tick. schedule(delay, callback) runs the ticks,
+    # schedule_later is the default: one flush thread for the queue's whole
+    # life instead of a timer thread per tick.
+
+    def __init__(self, send, schedule=None, rate: float = 20.0,
+                 burst: int = 10, tick: float = 0.02, max_pending: int = 64):
+
+        self._send = send
+        self._schedule = schedule or self.schedule_later
+        self.rate = rate
+        self.burst = burst
+        self.tick = tick
+        self.max_pending = max_pending
+
+        self._pending = {}
+        self._keys = itertools.count()
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+        self._due = None
+        self._wakeup = threading.Condition()
+        self._flusher = None
+
+        self.sent = 0
+        self.coalesced = 0
+        self.delayed = 0
+        self.dropped = 0
+
+    def __getstate__(self):
+
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_keys"] = None
+        state["_wakeup"] = None
+        state["_flusher"] = None
+        return state
+
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._keys = itertools.count()
+        self._wakeup = threading.Condition()
+
+    def schedule_later(self, delay: float, callback) -> None:
+
+        with self._wakeup:
+            self._due = (time.monotonic() + delay, callback)
+
+            # is_alive() is also False for the thread of the parent in a
+            # forked listener
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop,
+                                                 daemon=True)
+                self._flusher.start()
+
+            self._wakeup.notify()
+
+    def _flush_loop(self) -> None:
+
+        while True:
+
+            with self._wakeup:
+                while True:
+                    if self._due is None:
+                        self._wakeup.wait()
+                        continue
+
+                    remaining = self._due[0] - time.monotonic()
+                    if remaining <= 0:
+                        break
+
+                    self._wakeup.wait(remaining)
+
+                callback = self._due[1]
+                self._due = None
+
+            # Outside the condition, the callback may schedule the next tick
+            callback()
+
+    def submit(self, key, build, args: tuple, merge=None) -> bool:
+
+        # key None never coalesces, build(*args) makes the packet at send
+        # time so it uses the connection id of that moment
+        with self._lock:
+
+            if key is None:
+                key = next(self._keys)
+
+            pending = self._pending.get(key)
+            if pending is not None:
+                self.coalesced += 1
+                if merge is not None:
+                    args = merge(pending[1], args)
+
+            elif len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+
+            self._pending[key] = (build, args)
+
+            if not self._scheduled:
+                self._scheduled = True
+                self._schedule(self.tick, self.flush)
+
+        return True
+
+    def flush(self) -> None:
+
+        with self._lock:
+
+            self._scheduled = False
+
+            now = time.monotonic()
+            self._tokens = min(self.burst,
+                               self._tokens + (now - self._last) * self.rate)
+            self._last = now
+
+            while self._pending and self._tokens >= 1:
+
+                key = next(iter(self._pending))
+                build, args = self._pending.pop(key)
+
+                self._send(build(*args))
+                self._tokens -= 1
+                self.sent += 1
+
+            if self._pending:
+                self.delayed += 1
+                self._scheduled = True
+                self._schedule(max(self.tick, (1 - self._tokens) / self.rate),
+                               self.flush)
+
+    def stats(self) -> dict:
+
+        return {
+            "pending": len(self._pending),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "delayed": self.delayed,
+            "dropped": self.dropped,
+        }
+
+
+def _merge_focus(pending: tuple, new: tuple) -> tuple:
+    # Car and camera of a later change win, unset ones keep the pending ones
+    return tuple(old if value is None else value
+                 for old, value in zip(pending, new))
 
 
 class Nationality(Enum):
@@ -268,43 +522,59 @@ class LapType(Enum):
     InLap = 3
 
 
+class BroadcastingEventType(Enum):
+
+    NONE = 0
+    GreenFlag = 1
+    SessionOver = 2
+    PenaltyCommMsg = 3
+    Accident = 4
+    LapCompleted = 5
+    BestSessionLap = 6
+    BestPersonalLap = 7
+
+
 class LapInfo:
 
+    __slots__ = ("lap_time_ms", "car_index", "driver_index", "splits",
+                 "is_invalid", "is_valid_for_best", "_lap_type", "_cur")
+
     def __init__(self, cur: Cursor):
 
-        self.lap_time_ms = cur.read_u32()
-        self.car_index = cur.read_u16()
-        self.driver_index = cur.read_u16()
+        (self.lap_time_ms, self.car_index, self.driver_index,
+         split_count) = cur.read_struct(_LAP_HEADER)
 
-        split_count = cur.read_u8()
-        self.splits = []
-        for _ in range(split_count):
-            self.splits.append(cur.read_i32())
+        self.splits = list(cur.read_array("i", split_count))
 
-        self.is_invalid = cur.read_u8() > 0
-        self.is_valid_for_best = cur.read_u8() > 0
+        (is_invalid, is_valid_for_best,
+         is_out_lap, is_in_lap) = cur.read_struct(_LAP_FLAGS)
 
-        is_out_lap = cur.read_u8() > 0
-        is_in_lap = cur.read_u8() > 0
+        self.is_invalid = is_invalid > 0
+        self.is_valid_for_best = is_valid_for_best > 0
 
         if is_out_lap:
-            self.late_type = LapType.OutLap
+            self._lap_type = 1  # LapType.OutLap
 
         elif is_in_lap:
-            self.late_type = LapType.InLap
+            self._lap_type = 3  # LapType.InLap
 
         else:
-            self.late_type = LapType.Regular
+            self._lap_type = 2  # LapType.Regular
 
-        for i, split in enumerate(self.splits):
-            if split == 2147483647:  # Max int32 value
-                self.splits[i] = 0
+        if 2147483647 in self.splits:
+            for i, split in enumerate(self.splits):
+                if split == 2147483647:  # Max int32 value
+                    self.splits[i] = 0
 
         if self.lap_time_ms == 2147483647:
             self.lap_time_ms = 0
 
         self._cur = cur
 
+    @property
+    def late_type(self) -> LapType:
+        return LapType(self._lap_type)
+
     def get_cur(self):
         cur = self._cur
         self._cur = None
@@ -313,6 +583,9 @@ class LapInfo:
 
 class Registration:
 
+    __slots__ = ("connection_id", "connection_succes", "is_read_only",
+                 "error_msg")
+
     def __init__(self):
 
         self.connection_id = -1
@@ -322,115 +595,163 @@ class Registration:
 
     def update(self, cur: Cursor):
 
-        self.connection_id = cur.read_i32()
-        self.connection_succes = cur.read_u8() > 0
-        self.is_read_only = cur.read_u8() == 0
+        (self.connection_id, connection_succes,
+         is_read_only) = cur.read_struct(_REGISTRATION)
+
+        self.connection_succes = connection_succes > 0
+        self.is_read_only = is_read_only == 0
         self.error_msg = cur.read_string()
 
 
+def _session_clock(time_ms: float) -> datetime.datetime:
+
+    seconds = time_ms // 1000
+    if seconds == -1:
+        # -1 means there is no time limit
+        seconds = 0
+
+    return datetime.datetime.fromtimestamp(seconds)
+
+
 class RealTimeUpdate:
 
+    # Times are kept as the raw milliseconds ACC sends and enums as their
+    # raw codes, datetime and Enum objects are only built when read
+    __slots__ = ("event_index", "session_index", "_session_type", "_phase",
+                 "session_time_ms", "session_end_time_ms",
+                 "focused_car_index", "active_camera_set", "active_camera",
+                 "current_hud_page", "is_replay_playing",
+                 "replay_session_time_ms", "replay_remaining_time_ms",
+                 "time_of_day_ms", "ambient_temp", "track_temp",
+                 "best_session_lap")
+
     def __init__(self):
         self.event_index = -1
         self.session_index = -1
-        self.session_type = SessionType.NONE
-        self.phase = SessionPhase.NONE
+        self._session_type = SessionType.NONE.value
+        self._phase = SessionPhase.NONE.value
 
-        self.session_time = datetime.datetime.fromtimestamp(0)
-        self.session_end_time = datetime.datetime.fromtimestamp(0)
+        self.session_time_ms = 0.0
+        self.session_end_time_ms = 0.0
 
         self.focused_car_index = -1
         self.active_camera_set = ""
         self.active_camera = ""
         self.current_hud_page = ""
         self.is_replay_playing = False
-        self.replay_session_time = datetime.datetime.fromtimestamp(0)
-        self.replay_remaining_time = datetime.datetime.fromtimestamp(0)
+        self.replay_session_time_ms = 0.0
+        self.replay_remaining_time_ms = 0.0
 
-        self.time_of_day = datetime.datetime.fromtimestamp(0)
+        self.time_of_day_ms = 0.0
         self.ambient_temp = -1
         self.track_temp = -1
         self.best_session_lap = None
 
-    def update(self, cur: Cursor):
+    def update(self, cur: Cursor, cameras: bool = True, hud: bool = True):
 
-        self.event_index = cur.read_u16()
-        self.session_index = cur.read_u16()
-        self.session_type = SessionType(cur.read_u8())
-        self.phase = SessionPhase(cur.read_u8())
+        (self.event_index, self.session_index, self._session_type,
+         self._phase, self.session_time_ms, self.session_end_time_ms,
+         self.focused_car_index) = cur.read_struct(_REALTIME_HEADER)
 
-        session_time = cur.read_f32() // 1000
-        if session_time == -1:
-            # -1 means there is no time limit
-            session_time = 0
+        if cameras:
+            self.active_camera_set = cur.read_string()
+            self.active_camera = cur.read_string()
 
-        self.session_time = datetime.datetime.fromtimestamp(session_time)
+        else:
+            cur.skip_string()
+            cur.skip_string()
 
-        session_end_time = cur.read_f32() // 1000
-        if session_end_time == -1:
-            # -1 means there is no time limit
-            session_end_time = 0
+        if hud:
+            self.current_hud_page = cur.read_string()
 
-        self.session_end_time = datetime.datetime.fromtimestamp(
-            session_end_time)
+        else:
+            cur.skip_string()
 
-        self.focused_car_index = cur.read_i32()
-        self.active_camera_set = cur.read_string()
-        self.active_camera = cur.read_string()
-        self.current_hud_page = cur.read_string()
         self.is_replay_playing = cur.read_u8() > 0
-        self.replay_session_time = datetime.datetime.fromtimestamp(0)
-        self.replay_remaining_time = datetime.datetime.fromtimestamp(0)
+        self.replay_session_time_ms = 0.0
+        self.replay_remaining_time_ms = 0.0
 
         if self.is_replay_playing:
+            (self.replay_session_time_ms,
+             self.replay_remaining_time_ms) = cur.read_struct(_REPLAY_TIMES)
+
+        (self.time_of_day_ms, self.ambient_temp,
+         self.track_temp) = cur.read_struct(_REALTIME_FOOTER)
 
-            replay_session_time = cur.read_f32() // 1000
-            if replay_session_time != -1:
-                # -1 means there is no time limit
-                self.replay_session_time = datetime.datetime.fromtimestamp(
-                    replay_session_time)
-
-            replay_remaining_time = cur.read_f32() // 1000
-            if replay_remaining_time != -1:
-                # -1 means there is no time limit
-                self.replay_remaining_time = datetime.datetime.fromtimestamp(
-                    replay_remaining_time)
-
-        self.time_of_day = datetime.datetime.fromtimestamp(
-            cur.read_f32() / 1000)
-        self.ambient_temp = cur.read_u8()
-        self.track_temp = cur.read_u8()
         self.best_session_lap = LapInfo(cur)
+        self.best_session_lap.get_cur()
+
+    @property
+    def session_type(self) -> SessionType:
+        return SessionType(self._session_type)
+
+    @property
+    def phase(self) -> SessionPhase:
+        return SessionPhase(self._phase)
+
+    @property
+    def session_time(self) -> datetime.datetime:
+        return _session_clock(self.session_time_ms)
+
+    @property
+    def session_end_time(self) -> datetime.datetime:
+        return _session_clock(self.session_end_time_ms)
+
+    @property
+    def replay_session_time(self) -> datetime.datetime:
+        return _session_clock(self.replay_session_time_ms)
+
+    @property
+    def replay_remaining_time(self) -> datetime.datetime:
+        return _session_clock(self.replay_remaining_time_ms)
+
+    @property
+    def time_of_day(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.time_of_day_ms / 1000)
 
 
 class RealTimeCarUpdate:
 
-    def __init__(self, cur: Cursor):
+    __slots__ = ("car_index", "driver_index", "driver_count", "gear",
+                 "world_pos_x", "world_pos_y", "yaw", "_car_location", "kmh",
+                 "position", "cup_position", "track_position",
+                 "spline_position", "lap", "delta", "best_session_lap",
+                 "last_lap", "current_lap")
+
+    def __init__(self, cur: Cursor, world_position: bool = True):
+
+        if world_position:
+            (self.car_index, self.driver_index, self.driver_count, self.gear,
+             self.world_pos_x, self.world_pos_y, self.yaw,
+             self._car_location, self.kmh, self.position, self.cup_position,
+             self.track_position, self.spline_position, self.lap,
+             self.delta) = cur.read_struct(_CAR_UPDATE)
+
+        else:
+            (self.car_index, self.driver_index, self.driver_count, self.gear,
+             self._car_location, self.kmh, self.position, self.cup_position,
+             self.track_position, self.spline_position, self.lap,
+             self.delta) = cur.read_struct(_CAR_UPDATE_NO_POSITION)
+
+            self.world_pos_x = self.world_pos_y = self.yaw = 0.0
 
-        self.car_index = cur.read_u16()
-        self.driver_index = cur.read_u16()
-        self.driver_count = cur.read_u8()
-        self.gear = cur.read_u8()
-        self.world_pos_x = cur.read_f32()
-        self.world_pos_y = cur.read_f32()
-        self.yaw = cur.read_f32()
-        self.car_location = CarLocation(cur.read_u8())
-        self.kmh = cur.read_u16()
-        self.position = cur.read_u16()
-        self.cup_position = cur.read_u16()
-        self.track_position = cur.read_u16()
-        self.spline_position = cur.read_f32()
-        self.lap = cur.read_u16()
-        self.delta = cur.read_i32()
         self.best_session_lap = LapInfo(cur)
         cur = self.best_session_lap.get_cur()
         self.last_lap = LapInfo(cur)
         cur = self.last_lap.get_cur()
         self.current_lap = LapInfo(cur)
+        self.current_lap.get_cur()
+
+    @property
+    def car_location(self) -> CarLocation:
+        return CarLocation(self._car_location)
 
 
 class TrackData:
 
+    __slots__ = ("track_name", "track_id", "track_meters", "camera_sets",
+                 "hud_page")
+
     def __init__(self):
 
         self.track_name = ""
@@ -440,17 +761,23 @@ class TrackData:
         self.camera_sets = {}
         self.hud_page = []
 
-    def update(self, cur: Cursor):
+    def update(self, cur: Cursor, cameras: bool = True, hud: bool = True):
 
         _ = cur.read_i32()  # Connection id
         self.track_name = cur.read_string()
-        self.track_id = cur.read_i32()
-        self.track_meters = cur.read_i32()
+        self.track_id, self.track_meters = cur.read_struct(_TRACK_HEADER)
 
         self.camera_sets = {}
         camera_set_count = cur.read_u8()
         for _ in range(camera_set_count):
 
+            if not cameras:
+                cur.skip_string()
+                for _ in range(cur.read_u8()):
+                    cur.skip_string()
+
+                continue
+
             camera_set_name = cur.read_string()
             self.camera_sets.update({camera_set_name: []})
 
@@ -459,6 +786,10 @@ class TrackData:
                 camera_name = cur.read_string()
                 self.camera_sets[camera_set_name].append(camera_name)
 
+        if not hud:
+            # Last section of the packet, nothing to skip to
+            return
+
         self.hud_page = []
         hud_page_count = cur.read_u8()
         for _ in range(hud_page_count):
@@ -467,25 +798,27 @@ class TrackData:
 
 class CarInfo:
 
+    __slots__ = ("car_index", "model_type", "team_name", "race_number",
+                 "_cup_category", "current_driver_index", "drivers",
+                 "_nationality")
+
     def __init__(self, car_index: int):
 
         self.car_index = car_index
         self.model_type = -1
         self.team_name = ""
         self.race_number = -1
-        self.cup_category = CupCategory.National
+        self._cup_category = CupCategory.National.value
         self.current_driver_index = -1
         self.drivers = []
-        self.nationality = Nationality.Any
+        self._nationality = Nationality.Any.value
 
     def update(self, cur: Cursor):
 
         self.model_type = cur.read_u8()
         self.team_name = cur.read_string()
-        self.race_number = cur.read_i32()
-        self.cup_category = CupCategory(cur.read_u8())
-        self.current_driver_index = cur.read_u8()
-        self.nationality = Nationality(cur.read_u16())
+        (self.race_number, self._cup_category, self.current_driver_index,
+         self._nationality) = cur.read_struct(_CAR_INFO)
 
         self.drivers.clear()
         driver_count = cur.read_u8()
@@ -495,6 +828,25 @@ class CarInfo:
             cur = driver.get_cur()
             self.drivers.append(driver)
 
+    @property
+    def cup_category(self) -> CupCategory:
+        return CupCategory(self._cup_category)
+
+    @property
+    def nationality(self) -> Nationality:
+        return Nationality(self._nationality)
+
+    def __copy__(self):
+
+        # update() refills drivers in place, the drivers themselves are
+        # new objects every time
+        car_info = CarInfo.__new__(CarInfo)
+        for name in CarInfo.__slots__:
+            setattr(car_info, name, getattr(self, name))
+
+        car_info.drivers = list(self.drivers)
+        return car_info
+
     def __str__(self) -> str:
 
         return (f"ID: {self.car_index} Team: {self.team_name} "
@@ -503,42 +855,69 @@ class CarInfo:
 
 class EntryList:
 
+    __slots__ = ("entry_list", "entries")
+
     def __init__(self):
 
         self.entry_list = []
+        self.entries = {}
 
     def update(self, cur: Cursor):
 
         self.entry_list = []
+        self.entries = {}
 
-        _ = cur.read_i32()  # Connection id
-        car_entry_count = cur.read_u16()
-        for _ in range(car_entry_count):
-            self.entry_list.append(CarInfo(cur.read_u16()))
+        # Connection id
+        _, car_entry_count = cur.read_struct(_ENTRY_LIST_HEADER)
+        for car_index in cur.read_array("H", car_entry_count):
+            car_info = CarInfo(car_index)
+            self.entry_list.append(car_info)
+            self.entries[car_index] = car_info
+
+    def get(self, car_index: int):
+        return self.entries.get(car_index)
+
+    def __copy__(self):
+
+        # Car infos are updated in place, a copy gets its own
+        entry_list = EntryList()
+        entry_list.entry_list = [copy.copy(car_info)
+                                 for car_info in self.entry_list]
+        entry_list.entries = {car_info.car_index: car_info
+                              for car_info in entry_list.entry_list}
+        return entry_list
 
     def update_car(self, cur: Cursor):
         car_id = cur.read_u16()
 
-        car_info = None
-        for car in self.entry_list:
-            if car.car_index == car_id:
-                car_info = car
-
+        car_info = self.entries.get(car_id)
         if car_info:
             car_info.update(cur)
 
+        return car_info
+
 
 class DriverInfo:
 
+    __slots__ = ("first_name", "last_name", "short_name", "_category",
+                 "_nationality", "_cur")
+
     def __init__(self, cur: Cursor):
         self.first_name = cur.read_string()
         self.last_name = cur.read_string()
         self.short_name = cur.read_string()
-        self.category = DriverCategory(cur.read_u8())
-        self.nationality = Nationality(cur.read_u16())
+        self._category, self._nationality = cur.read_struct(_DRIVER_INFO)
 
         self._cur = cur
 
+    @property
+    def category(self) -> DriverCategory:
+        return DriverCategory(self._category)
+
+    @property
+    def nationality(self) -> Nationality:
+        return Nationality(self._nationality)
+
     def get_cur(self) -> Cursor:
         cur = self._cur
         self._cur = None
@@ -549,301 +928,4483 @@ class DriverInfo:
         return f"Name: {self.first_name} {self.last_name}"
 
 
-class accUpdInterface:
+class BroadcastingEvent:
 
-    def __init__(self, ip, port, instance_info):
+    __slots__ = ("_type", "msg", "time_ms", "car_index", "seq")
 
-        self.registration = Registration()
-        self.session = RealTimeUpdate()
-        self.track = TrackData()
-        self.entry_list = EntryList()
-        self.connected = False
+    def __init__(self, cur: Cursor):
 
-        self._name = instance_info["name"]
-        self._psw = instance_info["password"]
-        self._speed = instance_info["speed"]
-        self._cmd_psw = instance_info["cmd_password"]
+        self._type = cur.read_u8()
+        self.msg = cur.read_string()
+        self.time_ms, self.car_index = cur.read_struct(_BROADCAST_EVENT)
+        self.seq = 0  # Set once the event is logged
 
-        self._udp_data = {
-            "connection": {
-                "id": -1,
-                "connected": False
-            },
-            "entries": {},
-            "session": {
-                "track": "None",
-                "session_type": SessionType.NONE.name,
-                "session_time": datetime.datetime.fromtimestamp(0),
-                "session_end_time": datetime.datetime.fromtimestamp(0),
-                "air_temp": 0,
-                "track_temp": 0
-            },
-        }
+    @classmethod
+    def from_record(cls, seq: int, event_type: int, msg: str, time_ms: int,
+                    car_index: int):
 
-        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self._socket.bind(("", 3400))
+        event = cls.__new__(cls)
+        event._type = event_type
+        event.msg = msg
+        event.time_ms = time_ms
+        event.car_index = car_index
+        event.seq = seq
+        return event
 
-        self._ip = ip
-        self._port = port
-        self._last_time_requested = datetime.datetime.now()
-        self._last_connection = datetime.datetime.now()
+    @property
+    def type(self) -> BroadcastingEventType:
+        return BroadcastingEventType(self._type)
 
-        self.child_pipe, self.parent_pipe = Pipe()
-        self.data_queue = Queue()
-        self.udp_interface_listener = Process(
-            target=self.listen_udp_interface, args=(self.child_pipe, self.data_queue))
+    def __repr__(self) -> str:
+        return (f"BroadcastingEvent({self.seq}, {self.type.name}, "
+                f"car {self.car_index}, {self.time_ms}ms, {self.msg!r})")
 
-    @property
-    def udp_data(self):
-        self.parent_pipe.send("DATA_REQUEST")
-        if self.parent_pipe.recv() == "DATA_OK":
-            try:
-                return self.data_queue.get_nowait()
 
-            except(queue.Empty):
-                # idk return None
-                return None
+def _events_after(events, seq: int) -> list:
 
-    def listen_udp_interface(self, child_pipe: Connection, data_queue: Queue):
+    # Events are in seq order, walk back from the newest one
+    newer = []
+    for event in reversed(events):
+        if event.seq <= seq:
+            break
+        newer.append(event)
 
-        self.connect()
+    newer.reverse()
+    return newer
 
-        message = ""
-        while message != "STOP_PROCESS":
 
-            if child_pipe.poll():
-                message = child_pipe.recv()
+class EventLog:
 
-            now = datetime.datetime.now()
-            # if connection was lost or not established wait 2s before asking again
-            if (not self.connected and (now - self._last_connection).total_seconds() > 2):
-                self.connect()
-                self._last_connection = datetime.datetime.now()
+    # Bounded log of the broadcasting events with a per car index. Each
+    # event gets the next sequence number so readers only ask for what
+    # they haven't seen yet.
 
-            else:
-                self.update()
+    def __init__(self, capacity: int = 1024):
 
-            if message == "DATA_REQUEST":
-                data_queue.put(deepcopy(self._udp_data))
-                child_pipe.send("DATA_OK")
-                message = ""
+        self.capacity = capacity
+        self.seq = 0
+        self._events = collections.deque()
+        self._by_car = {}
 
-        self.disconnect()
-        self._socket.close()
-        child_pipe.send("PROCESS_TERMINATED")
-        print("[ASM_Reader]: Process Terminated.")
+    def __len__(self) -> int:
+        return len(self._events)
 
-    def start(self):
+    def append(self, event: BroadcastingEvent) -> None:
 
-        print("[pyUIL] Listening to the UDP interface...")
-        self.udp_interface_listener.start()
+        if len(self._events) == self.capacity:
+            oldest = self._events.popleft()
 
-    def stop(self):
+            # The oldest event of the log is the oldest of its car too
+            car_events = self._by_car[oldest.car_index]
+            car_events.popleft()
+            if not car_events:
+                del self._by_car[oldest.car_index]
 
-        print("[pyUIL]: Sending stopping command to process...")
-        self.parent_pipe.send("STOP_PROCESS")
+        self.seq += 1
+        event.seq = self.seq
+        self._events.append(event)
 
-        print("[pyUIL]: Waiting for process to finish...")
-        if (self.parent_pipe.recv() == "PROCESS_TERMINATED"):
-            # Need to empty the queue before joining process (qsize() isn't 100% accurate)
-            while self.data_queue.qsize() != 0:
-                try:
-                    _ = self.data_queue.get_nowait()
-                except queue.Empty:
-                    pass
-        else:
-            print(
-                "[pyUIL]: Received unexpected message, program might be deadlock now.")
+        car_events = self._by_car.get(event.car_index)
+        if car_events is None:
+            car_events = self._by_car[event.car_index] = collections.deque()
+        car_events.append(event)
 
-        self.udp_interface_listener.join()
+    def since(self, seq: int = 0, car_index: int = None) -> list:
 
-    def update(self):
+        if car_index is None:
+            return _events_after(self._events, seq)
 
-        # Add timeout after 1s delay to no get stuck for ever
-        self._socket.settimeout(1.0)
+        return _events_after(self._by_car.get(car_index, ()), seq)
 
-        data = None
-        try:
-            data, _ = self._socket.recvfrom(2048)
 
-        except socket.error:
-            self.connected = False
-            self._udp_data["connection"]["connected"] = False
+class SharedState:
 
-        except socket.timeout:
-            self.connected = False
-            self._udp_data["connection"]["connected"] = False
+    # Fixed binary layout of the udp data in shared memory, written by the
+    # listener process and read without any round trip by the others.
+    # A sequence counter (odd while writing) keeps snapshots consistent.
+    MAX_ENTRIES = 128
+    MAX_SECTORS = 3
 
-        finally:
-            self._socket.settimeout(None)
+    _SEQUENCE = struct.Struct("<Q")
+    _HEADER = struct.Struct("<QQQiBHH")
+    _SESSION = struct.Struct("<Q64sBddBB")
+    _ENTRY = struct.Struct("<QBHHiBHh64s32s32sHIIIB3iBfffffH")
+    _ENTRY_HEAD = struct.Struct("<QBH")
 
-        if data:
+    # Broadcasting events ring after the entries: last seq, then records of
+    # seq, type, car index, time, message
+    MAX_EVENTS = 256
+    _EVENTS_HEAD = struct.Struct("<Q")
+    _EVENT = struct.Struct("<QBii64s")
 
-            cur = Cursor(data)
-            packet_type = cur.read_u8()
+    # Frames sent by StatePublisher: length of the rest, kind, version,
+    # full, connection id, connected, entry count, removed count, then the
+    # session record, the entry records and the removed car indexes
+    _FRAME = struct.Struct("<IBQBiBHH")
+    FRAME_STATE = 0
 
-            if packet_type == 1:
-                self.registration.update(cur)
+    # Event frames: length of the rest, kind, last seq, count, then the
+    # event records
+    _EVENT_FRAME = struct.Struct("<IBQH")
+    FRAME_EVENTS = 1
 
-                info = self._udp_data["connection"]
-                info["id"] = self.registration.connection_id
-                info["connected"] = True
+    _EMPTY = 0
+    _LISTED = 1
+    _POPULATED = 2
+    _REMOVED = 3
 
-                self.request_track_data()
-                self.request_entry_list()
+    def __init__(self, name: str = None, max_entries: int = MAX_ENTRIES):
 
-            elif packet_type == 2:
-                self.session.update(cur)
-                self.update_leaderboard_session()
+        self.max_entries = max_entries
+        self._order = _array_layout("H", max_entries)
+        self._order_offset = self._HEADER.size
+        self._session_offset = self._order_offset + self._order.size
+        self._entries_offset = self._session_offset + self._SESSION.size
 
-            elif packet_type == 3:
-                car_update = RealTimeCarUpdate(cur)
-                self.is_new_entry(car_update)
+        self._events_offset = (self._entries_offset
+                               + self._ENTRY.size * max_entries)
+        self._events_end = (self._events_offset + self._EVENTS_HEAD.size
+                            + self._EVENT.size * self.MAX_EVENTS)
 
-            elif packet_type == 4:
-                self.entry_list.update(cur)
-                self.add_to_leaderboard()
+        size = self._events_end
 
-            elif packet_type == 5:
-                self.track.update(cur)
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
 
-            elif packet_type == 6:
-                self.entry_list.update_car(cur)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
 
-            elif packet_type == 7:
-                # Don't care (:
-                pass
+        self._buf = self._shm.buf
 
-    def is_new_entry(self, car_update):
+        # Writer side bookkeeping, slots are stable so readers can ask
+        # what changed, removed cars leave a tombstone behind
+        self._slots = {}
+        self._tombstones = {}
+        self._slot_count = 0
+        self._order_count = 0
+        self._removed_floor = 0
 
-        is_unkown = True
-        for car in self.entry_list.entry_list:
-            if car_update.car_index == car.car_index:
-                is_unkown = False
+    def __getstate__(self):
 
-        last_request = datetime.datetime.now() - self._last_time_requested
-        if is_unkown and last_request.total_seconds() >= 1:
-            self.request_entry_list()
-            self._last_time_requested = datetime.datetime.now()
+        # The listener process attaches to the same block by name, views
+        # and layouts are rebuilt there (spawn pickles everything)
+        state = self.__dict__.copy()
+        for key in ("_order", "_shm", "_buf"):
+            del state[key]
 
-        elif not is_unkown:
-            self.update_leaderboard(car_update)
+        state["_name"] = self._shm.name
+        return state
 
-    def add_to_leaderboard(self) -> None:
+    def __setstate__(self, state):
 
-        self._udp_data["entries"].clear()
+        state = dict(state)
+        self.__init__(state.pop("_name"), state["max_entries"])
+        state["_owner"] = False
+        self.__dict__.update(state)
 
-        for entry in self.entry_list.entry_list:
-            self._udp_data["entries"].update({entry.car_index: {}})
+    @property
+    def name(self) -> str:
+        return self._shm.name
 
-    def update_leaderboard(self, data: RealTimeCarUpdate) -> None:
+    def close(self) -> None:
 
-        entry_list = self.entry_list.entry_list
+        self._buf = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
 
-        entry_index = -1
-        for index, entry in enumerate(entry_list):
-            if entry.car_index == data.car_index:
-                entry_index = index
+    def _begin(self) -> None:
 
-        if entry_index >= 0 and len(entry_list[entry_index].drivers) > 0:
-            car_info = entry_list[entry_index]
-            drivers = car_info.drivers
+        seq = self._SEQUENCE.unpack_from(self._buf, 0)[0]
+        self._SEQUENCE.pack_into(self._buf, 0, seq + 1)
 
-            race_number = car_info.race_number
-            cup_category = car_info.cup_category
-            model_type = car_info.model_type
-            team_name = car_info.team_name
-            first_name = drivers[data.driver_index].first_name
-            last_name = drivers[data.driver_index].last_name
+    def _end(self) -> None:
 
-        else:
-            race_number = -1
-            cup_category = CupCategory.National
-            model_type = -1
-            team_name = "Team Name"
-            first_name = "First Name"
-            last_name = "Last Name"
+        seq = self._SEQUENCE.unpack_from(self._buf, 0)[0]
+        self._SEQUENCE.pack_into(self._buf, 0, seq + 1)
 
-        self._udp_data["entries"][data.car_index].update({
-            "position": data.position,
-            "car_number": race_number,
-            "car_id": data.car_index,
-            "cup_category": cup_category.name,
-            "cup_position": data.cup_position,
-            "manufacturer": model_type,
-            "team": team_name,
-            "driver": {
-                "first_name": first_name,
-                "last_name": last_name,
-            },
-            "lap": data.lap,
-            "current_lap": data.current_lap.lap_time_ms,
-            "last_lap": data.last_lap.lap_time_ms,
-            "best_session_lap": data.best_session_lap.lap_time_ms,
-            "sectors": data.last_lap.splits,
-            "car_location": data.car_location.name,
-            "world_pos_x": data.world_pos_x,
-            "world_pos_y": data.world_pos_y
-        })
+    def _pack_header(self, connection: dict, version: int) -> None:
 
-    def update_leaderboard_session(self) -> None:
+        seq = self._SEQUENCE.unpack_from(self._buf, 0)[0]
+        self._HEADER.pack_into(
+            self._buf, 0, seq, version, self._removed_floor,
+            connection["id"], connection["connected"], self._order_count,
+            self._slot_count)
 
-        session = self._udp_data["session"]
-        session.clear()
+    def _entry_offset(self, slot: int) -> int:
+        return self._entries_offset + slot * self._ENTRY.size
 
-        session["track"] = self.track.track_name
-        session["session_type"] = self.session.session_type.name
-        session["session_time"] = self.session.session_time
-        session["session_end_time"] = self.session.session_end_time
-        session["air_temp"] = self.session.ambient_temp
-        session["track_temp"] = self.session.track_temp
+    def _pack_entry(self, slot: int, car_index: int, entry: dict) -> None:
 
-    def connect(self) -> None:
+        offset = self._entry_offset(slot)
 
-        msg = ByteWriter()
-        msg.write_u8(1)
-        msg.write_u8(4)
-        msg.write_str(self._name)
-        msg.write_str(self._psw)
-        msg.write_i32(self._speed)
-        msg.write_str(self._cmd_psw)
+        if "position" not in entry:
+            self._ENTRY.pack_into(
+                self._buf, offset, entry["version"], self._LISTED, car_index,
+                0, -1, 0, 0, -1, b"", b"", b"", 0, 0, 0, 0, 0, 0, 0, 0, 0,
+                0.0, 0.0, 0.0, 0.0, 0.0, 0)
+            return
 
-        print(msg.get_bytes())
+        sectors = entry["sectors"][:self.MAX_SECTORS]
+        padded = list(sectors) + [0] * (self.MAX_SECTORS - len(sectors))
 
-        self._socket.sendto(msg.get_bytes(), (self._ip, self._port))
-        self.connected = True
+        self._ENTRY.pack_into(
+            self._buf, offset, entry["version"], self._POPULATED, car_index,
+            entry["position"], entry["car_number"],
+            CupCategory[entry["cup_category"]].value, entry["cup_position"],
+            entry["manufacturer"], entry["team"].encode("utf-8"),
+            entry["driver"]["first_name"].encode("utf-8"),
+            entry["driver"]["last_name"].encode("utf-8"), entry["lap"],
+            entry["current_lap"], entry["last_lap"],
+            entry["best_session_lap"], len(sectors), *padded,
+            CarLocation[entry["car_location"]].value, entry["world_pos_x"],
+            entry["world_pos_y"], entry["gap_to_leader"], entry["interval"],
+            entry["class_gap"], entry["laps_down"])
 
-    def disconnect(self) -> None:
+    def _allocate(self, car_index: int):
 
-        c_id = self.registration.connection_id
+        for slot, (removed_car, _) in self._tombstones.items():
+            if removed_car == car_index:
+                del self._tombstones[slot]
+                return slot
 
-        msg = ByteWriter()
-        msg.write_u8(9)
-        msg.write_i32(c_id)
+        if self._slot_count < self.max_entries:
+            self._slot_count += 1
+            return self._slot_count - 1
 
-        self._socket.sendto(msg.get_bytes(), (self._ip, self._port))
+        if not self._tombstones:
+            return None
 
-    def request_entry_list(self) -> None:
+        # Out of slots, forget the oldest removal, readers older than it
+        # will get a full snapshot instead
+        slot = min(self._tombstones, key=lambda s: self._tombstones[s][1])
+        _, version = self._tombstones.pop(slot)
+        self._removed_floor = max(self._removed_floor, version)
 
-        c_id = self.registration.connection_id
+        return slot
 
-        if c_id != -1:
+    def write_connection(self, connection: dict, version: int) -> None:
 
-            msg = ByteWriter()
-            msg.write_u8(10)
-            msg.write_i32(c_id)
+        self._begin()
+        self._pack_header(connection, version)
+        self._end()
 
-            self._socket.sendto(msg.get_bytes(), (self._ip, self._port))
+    def write_session(self, connection: dict, session: dict) -> None:
 
-    def request_track_data(self) -> None:
+        self._begin()
+        self._SESSION.pack_into(
+            self._buf, self._session_offset, session["version"],
+            session["track"].encode("utf-8"),
+            SessionType[session["session_type"]].value,
+            session["session_time"].timestamp(),
+            session["session_end_time"].timestamp(), session["air_temp"],
+            session["track_temp"])
+        self._pack_header(connection, session["version"])
+        self._end()
 
-        c_id = self.registration.connection_id
+    def write_entries(self, connection: dict, entries: dict,
+                      version: int) -> None:
 
-        msg = ByteWriter()
-        msg.write_u8(11)
-        msg.write_i32(c_id)
+        self._begin()
+
+        for car_index, slot in list(self._slots.items()):
+            if car_index not in entries:
+
+                del self._slots[car_index]
+                self._tombstones[slot] = (car_index, version)
+                self._ENTRY_HEAD.pack_into(
+                    self._buf, self._entry_offset(slot), version,
+                    self._REMOVED, car_index)
+
+        order = []
+        for car_index, entry in entries.items():
+
+            slot = self._slots.get(car_index)
+            if slot is None:
+                slot = self._allocate(car_index)
+
+                if slot is None:
+                    continue
+
+                self._slots[car_index] = slot
+
+            self._pack_entry(slot, car_index, entry)
+            order.append(slot)
+
+        self._order_count = len(order)
+        order += [0] * (self.max_entries - len(order))
+        self._order.pack_into(self._buf, self._order_offset, *order)
+        self._pack_header(connection, version)
+
+        self._end()
+
+    def write_entry(self, connection: dict, car_index: int,
+                    entry: dict) -> None:
+
+        slot = self._slots.get(car_index)
+        if slot is None:
+            return
+
+        self._begin()
+        self._pack_entry(slot, car_index, entry)
+        self._pack_header(connection, entry["version"])
+        self._end()
+
+    def connection_id(self) -> int:
+        return self._HEADER.unpack_from(self._snapshot(0, self._HEADER.size),
+                                        0)[3]
+
+    def write_event(self, event: BroadcastingEvent) -> None:
+
+        slot = event.seq % self.MAX_EVENTS
+        offset = (self._events_offset + self._EVENTS_HEAD.size
+                  + slot * self._EVENT.size)
+
+        self._begin()
+        self._EVENT.pack_into(
+            self._buf, offset, event.seq, event._type, event.car_index,
+            event.time_ms, event.msg.encode("utf-8")[:64])
+        self._EVENTS_HEAD.pack_into(self._buf, self._events_offset,
+                                    event.seq)
+        self._end()
+
+    def _event_records(self, seq: int):
+
+        # Snapshot of the ring and the offsets of the records newer than seq,
+        # oldest first
+        data = self._snapshot(self._events_offset, self._events_end)
+        last = self._EVENTS_HEAD.unpack_from(data, 0)[0]
+
+        first = max(seq, last - self.MAX_EVENTS) + 1
+        offsets = [self._EVENTS_HEAD.size
+                   + (event_seq % self.MAX_EVENTS) * self._EVENT.size
+                   for event_seq in range(first, last + 1)]
+
+        return data, last, offsets
+
+    @classmethod
+    def _decode_event(cls, data: bytes, offset: int) -> BroadcastingEvent:
+
+        seq, event_type, car_index, time_ms, msg = cls._EVENT.unpack_from(
+            data, offset)
+        return BroadcastingEvent.from_record(
+            seq, event_type, _decode_fixed(msg), time_ms, car_index)
+
+    def events_since(self, seq: int = 0, car_index: int = None) -> list:
+
+        data, _, offsets = self._event_records(seq)
+
+        events = [self._decode_event(data, offset) for offset in offsets]
+        if car_index is not None:
+            events = [event for event in events
+                      if event.car_index == car_index]
+
+        return events
+
+    def event_frame_since(self, seq: int):
+
+        # Events newer than seq as one frame of raw records
+        data, last, offsets = self._event_records(seq)
+
+        size = self._EVENT.size
+        lenght = self._EVENT_FRAME.size - 4 + size * len(offsets)
+        parts = [self._EVENT_FRAME.pack(lenght, self.FRAME_EVENTS, last,
+                                        len(offsets))]
+        parts += [data[offset: offset + size] for offset in offsets]
+
+        return last, b"".join(parts)
+
+    @classmethod
+    def _decode_entry(cls, data: bytes, offset: int):
+
+        fields = cls._ENTRY.unpack_from(data, offset)
+
+        (version, state, car_index, position, car_number, cup_category,
+         cup_position, manufacturer, team, first_name, last_name, lap,
+         current_lap, last_lap, best_session_lap, sector_count) = fields[:16]
+
+        if state == cls._LISTED:
+            return car_index, {"version": version}
+
+        sectors = list(fields[16: 16 + sector_count])
+        (car_location, world_pos_x, world_pos_y, gap_to_leader, interval,
+         class_gap, laps_down) = fields[16 + cls.MAX_SECTORS:]
+
+        return car_index, {
+            "position": position,
+            "car_number": car_number,
+            "car_id": car_index,
+            "cup_category": CupCategory(cup_category).name,
+            "cup_position": cup_position,
+            "manufacturer": manufacturer,
+            "team": _decode_fixed(team),
+            "driver": {
+                "first_name": _decode_fixed(first_name),
+                "last_name": _decode_fixed(last_name),
+            },
+            "lap": lap,
+            "current_lap": current_lap,
+            "last_lap": last_lap,
+            "best_session_lap": best_session_lap,
+            "sectors": sectors,
+            "car_location": CarLocation(car_location).name,
+            "world_pos_x": world_pos_x,
+            "world_pos_y": world_pos_y,
+            "gap_to_leader": gap_to_leader,
+            "interval": interval,
+            "class_gap": class_gap,
+            "laps_down": laps_down,
+            "version": version
+        }
+
+    @classmethod
+    def _decode_session(cls, data: bytes, offset: int) -> dict:
+
+        (version, track, session_type, session_time, session_end_time,
+         air_temp, track_temp) = cls._SESSION.unpack_from(data, offset)
+
+        return {
+            "track": _decode_fixed(track),
+            "session_type": SessionType(session_type).name,
+            "session_time": datetime.datetime.fromtimestamp(session_time),
+            "session_end_time": datetime.datetime.fromtimestamp(
+                session_end_time),
+            "air_temp": air_temp,
+            "track_temp": track_temp,
+            "version": version
+        }
+
+    def _snapshot(self, start: int = 0, end: int = None) -> bytes:
+
+        # Copy the block (by default everything but the events) and retry
+        # if the writer touched it meanwhile
+        end = self._events_offset if end is None else end
+        while True:
+
+            seq = self._SEQUENCE.unpack_from(self._buf, 0)[0]
+            if seq & 1:
+                time.sleep(0)
+                continue
+
+            data = bytes(self._buf[start:end])
+            if seq == self._SEQUENCE.unpack_from(self._buf, 0)[0]:
+                return data
+
+    def read(self) -> dict:
+        return self._read(self._snapshot())
+
+    def _read(self, data: bytes) -> dict:
+
+        (_, _, _, connection_id, connected, order_count,
+         _) = self._HEADER.unpack_from(data, 0)
+
+        entries = {}
+        order = self._order.unpack_from(data, self._order_offset)
+        for slot in order[:order_count]:
+            car_index, entry = self._decode_entry(
+                data, self._entry_offset(slot))
+            entries[car_index] = entry
+
+        return {
+            "connection": {
+                "id": connection_id,
+                "connected": connected > 0
+            },
+            "entries": entries,
+            "session": self._decode_session(data, self._session_offset),
+        }
+
+    def changes_since(self, version: int) -> dict:
+
+        data = self._snapshot()
+
+        (_, current, removed_floor, connection_id, connected, order_count,
+         slot_count) = self._HEADER.unpack_from(data, 0)
+
+        connection = {
+            "id": connection_id,
+            "connected": connected > 0
+        }
+
+        if version < removed_floor:
+            # Removals this old were forgotten, start over from scratch
+            snapshot = self._read(data)
+            snapshot.update({"version": current, "full": True, "removed": []})
+            return snapshot
+
+        entries = {}
+        removed = []
+        for slot in range(slot_count):
+
+            entry_version, state, car_index = self._ENTRY_HEAD.unpack_from(
+                data, self._entry_offset(slot))
+
+            if entry_version <= version or state == self._EMPTY:
+                continue
+
+            if state == self._REMOVED:
+                removed.append(car_index)
+
+            else:
+                car_index, entry = self._decode_entry(
+                    data, self._entry_offset(slot))
+                entries[car_index] = entry
+
+        session = self._decode_session(data, self._session_offset)
+
+        return {
+            "version": current,
+            "full": False,
+            "connection": connection,
+            "session": session if session["version"] > version else None,
+            "entries": entries,
+            "removed": removed,
+        }
+
+    def frame_since(self, version: int, full: bool = False):
+
+        # Same as changes_since but as one binary frame. Records are sliced
+        # out of shared memory as they are, nothing is decoded or encoded.
+        data = self._snapshot()
+
+        (_, current, removed_floor, connection_id, connected, order_count,
+         slot_count) = self._HEADER.unpack_from(data, 0)
+
+        full = full or version < removed_floor
+
+        removed = array.array("H")
+        if full:
+            order = self._order.unpack_from(data, self._order_offset)
+            slots = order[:order_count]
+
+        else:
+            slots = []
+            for slot in range(slot_count):
+
+                entry_version, state, car_index = self._ENTRY_HEAD.unpack_from(
+                    data, self._entry_offset(slot))
+
+                if entry_version <= version or state == self._EMPTY:
+                    continue
+
+                if state == self._REMOVED:
+                    removed.append(car_index)
+
+                else:
+                    slots.append(slot)
+
+        size = self._ENTRY.size
+        parts = [None, data[self._session_offset:
+                            self._session_offset + self._SESSION.size]]
+
+        for slot in slots:
+            offset = self._entry_offset(slot)
+            parts.append(data[offset: offset + size])
+
+        parts.append(removed.tobytes())
+
+        lenght = (self._FRAME.size - 4 + self._SESSION.size
+                  + size * len(slots) + 2 * len(removed))
+        parts[0] = self._FRAME.pack(
+            lenght, self.FRAME_STATE, current, full, connection_id, connected,
+            len(slots), len(removed))
+
+        return current, b"".join(parts)
+
+    @classmethod
+    def decode_frame(cls, data: bytes) -> dict:
+
+        # Frame back into the changes_since layout, or the events it holds
+        if data[4] == cls.FRAME_EVENTS:
+
+            _, _, seq, count = cls._EVENT_FRAME.unpack_from(data, 0)
+            offset = cls._EVENT_FRAME.size
+            events = [cls._decode_event(data, offset + index * cls._EVENT.size)
+                      for index in range(count)]
+
+            return {"seq": seq, "events": events}
+
+        (_, _, version, full, connection_id, connected, entry_count,
+         removed_count) = cls._FRAME.unpack_from(data, 0)
+
+        offset = cls._FRAME.size
+        session = cls._decode_session(data, offset)
+        offset += cls._SESSION.size
+
+        entries = {}
+        for _ in range(entry_count):
+            car_index, entry = cls._decode_entry(data, offset)
+            entries[car_index] = entry
+            offset += cls._ENTRY.size
+
+        removed = array.array("H")
+        removed.frombytes(data[offset: offset + 2 * removed_count])
+
+        return {
+            "version": version,
+            "full": full > 0,
+            "connection": {
+                "id": connection_id,
+                "connected": connected > 0
+            },
+            "session": session,
+            "entries": entries,
+            "removed": removed.tolist(),
+        }
+
+
+def _decode_fixed(data: bytes) -> str:
+    return str(data.rstrip(b"\0"), "utf-8", errors="ignore")
+
+
+class PacketRecorder:
+
+    # Append only capture of raw datagrams, each one prefixed with its
+    # monotonic receive time (ns) and its length
+    MAGIC = b"ACCUDP\x00\x01"
+    _RECORD = struct.Struct("<QI")
+
+    def __init__(self, path: str):
+
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(self.MAGIC)
+
+    def write(self, data: bytes, timestamp_ns: int = None) -> None:
+
+        if timestamp_ns is None:
+            timestamp_ns = time.monotonic_ns()
+
+        self._file.write(self._RECORD.pack(timestamp_ns, len(data)))
+        self._file.write(data)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class PacketReplay:
+
+    # Reads a PacketRecorder file through mmap, so hours of recording
+    # don't have to fit in memory
+
+    def __init__(self, path: str):
+
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(PacketRecorder.MAGIC)] != PacketRecorder.MAGIC:
+            self.close()
+            raise ValueError(f"{path} isn't a packet recording")
+
+    def __iter__(self):
+
+        record = PacketRecorder._RECORD
+        size = len(self._mmap)
+        offset = len(PacketRecorder.MAGIC)
+
+        while offset + record.size <= size:
+
+            timestamp_ns, lenght = record.unpack_from(self._mmap, offset)
+            offset += record.size
+
+            if offset + lenght > size:
+                # Recording was cut while writing the last packet
+                break
+
+            yield timestamp_ns, self._mmap[offset: offset + lenght]
+            offset += lenght
+
+    def play(self, target, speed: float = 1.0) -> int:
+
+        # speed 1 is real time, 0 or None replays as fast as possible
+        handle = getattr(target, "handle_packet", target)
+
+        count = 0
+        first = None
+        start = time.perf_counter_ns()
+        for timestamp_ns, data in self:
+
+            if speed:
+                if first is None:
+                    first = timestamp_ns
+
+                due = start + (timestamp_ns - first) / speed
+                delay = due - time.perf_counter_ns()
+                if delay > 0:
+                    time.sleep(delay / 1e9)
+
+            handle(data)
+            count += 1
+
+        return count
+
+    def close(self) -> None:
+
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class EntryCache:
+
+    # Last track data packet of a server and the car info packets per
+    # server and track, kept as the raw packets in the recorder format.
+    # After a restart or reconnect they are decoded again right away so
+    # cars have their names before ACC answers the entry list request.
+
+    def __init__(self, directory: str, server: str):
+
+        self.directory = directory
+        self.server = server
+
+        self.track_name = None
+        self.track_packet = None
+        self.cars = {}
+        self._dirty = False
+
+        path = self._path()
+        if os.path.exists(path):
+            with PacketReplay(path) as replay:
+                for _, packet in replay:
+                    self.track_packet = packet
+
+        if self.track_packet is not None:
+            track = TrackData()
+            cur = Cursor(self.track_packet)
+            cur.read_u8()
+            track.update(cur, cameras=False, hud=False)
+
+            self.track_name = track.track_name
+            self._load_cars()
+
+    def _path(self, track_name: str = None) -> str:
+
+        name = self.server if track_name is None else f"{self.server}_{track_name}"
+        name = "".join(char if char.isalnum() or char in "-_." else "_"
+                       for char in name)
+        return os.path.join(self.directory, name + ".accudp")
+
+    def _load_cars(self) -> None:
+
+        self.cars = {}
+
+        path = self._path(self.track_name)
+        if not os.path.exists(path):
+            return
+
+        with PacketReplay(path) as replay:
+            for _, packet in replay:
+                self.cars[_U16.unpack_from(packet, 1)[0]] = packet
+
+    def set_track(self, packet: bytes, track_name: str) -> None:
+
+        if track_name != self.track_name:
+            self.save()
+            self.track_name = track_name
+            self._load_cars()
+
+        self.track_packet = bytes(packet)
+        self._dirty = True
+
+    def set_car(self, packet: bytes) -> None:
+
+        self.cars[_U16.unpack_from(packet, 1)[0]] = bytes(packet)
+        self._dirty = True
+
+    def car(self, car_index: int):
+        return self.cars.get(car_index)
+
+    def _write(self, path: str, packets) -> None:
+
+        # Replaced at once so a crash never leaves half a cache behind
+        recorder = PacketRecorder(path + ".tmp")
+        for packet in packets:
+            recorder.write(packet)
+        recorder.close()
+
+        os.replace(path + ".tmp", path)
+
+    def save(self) -> None:
+
+        if not self._dirty or self.track_packet is None:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(self._path(), [self.track_packet])
+        self._write(self._path(self.track_name), self.cars.values())
+        self._dirty = False
+
+
+class _ExportTable:
+
+    # One output table, rows are packed into preallocated batch buffers and
+    # a full batch is handed to the writer thread which returns the buffer
+    # to the free list once it's written
+
+    __slots__ = ("name", "columns", "layout", "free", "buffer", "rows",
+                 "dropped")
+
+    def __init__(self, name: str, columns: tuple, batch_rows: int,
+                 max_batches: int):
+
+        self.name = name
+        self.columns = columns
+        self.layout = struct.Struct(
+            "<" + "".join(code for _, code in columns))
+
+        self.free = queue.SimpleQueue()
+        for _ in range(max_batches):
+            self.free.put(bytearray(self.layout.size * batch_rows))
+        self.buffer = None
+        self.rows = 0
+        self.dropped = 0
+
+    def dtype(self):
+        return np.dtype([(name, "<" + code) for name, code in self.columns])
+
+
+class _CsvSink:
+
+    def __init__(self, path: str, table: _ExportTable):
+
+        self._file = open(path, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([name for name, _ in table.columns])
+
+    def write(self, table: _ExportTable, data: memoryview, rows: int) -> None:
+        self._writer.writerows(table.layout.iter_unpack(data))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ArrowSink:
+
+    def __init__(self, path: str, table: _ExportTable, parquet: bool,
+                 compression: str = None):
+
+        self._dtype = table.dtype()
+        self._schema = pyarrow.schema(
+            [(name, pyarrow.from_numpy_dtype(self._dtype[name]))
+             for name in self._dtype.names])
+
+        self._file = None
+        if parquet:
+            self._writer = pyarrow.parquet.ParquetWriter(
+                path, self._schema, compression=compression or "snappy")
+
+        else:
+            self._file = pyarrow.OSFile(path, "wb")
+            options = pyarrow.ipc.IpcWriteOptions(compression=compression)
+            self._writer = pyarrow.ipc.new_file(self._file, self._schema,
+                                                options=options)
+
+    def write(self, table: _ExportTable, data: memoryview, rows: int) -> None:
+
+        records = np.frombuffer(data, self._dtype, rows)
+        batch = pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array(np.ascontiguousarray(records[name]))
+             for name in self._dtype.names], schema=self._schema)
+        self._writer.write_batch(batch)
+
+    def close(self) -> None:
+
+        self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+class ColumnarExporter:
+
+    # Streams car updates, session updates and completed laps to one file
+    # per table and session, for analysis after the race. Rows are packed
+    # with a fixed layout into a bounded pool of batch buffers and written
+    # by a background thread, as CSV or, with pyarrow, as Arrow IPC or
+    # Parquet. When the writer falls behind and every buffer of a table is
+    # waiting to be written, policy "drop" drops and counts new rows of that
+    # table instead of growing memory or holding up the listener, "block"
+    # waits for a buffer (converting a recording, nothing to hold up).
+    # Files are <name>_<event_index>_<session_index>_<table>.<format> and a
+    # new set is started whenever the session changes.
+
+    CARS = (("timestamp_ns", "q"), ("session_time_ms", "f"),
+            ("car_index", "H"), ("driver_index", "H"), ("gear", "B"),
+            ("world_pos_x", "f"), ("world_pos_y", "f"), ("yaw", "f"),
+            ("car_location", "B"), ("kmh", "H"), ("position", "H"),
+            ("cup_position", "H"), ("track_position", "H"),
+            ("spline_position", "f"), ("lap", "H"), ("delta", "i"),
+            ("current_lap_ms", "i"), ("last_lap_ms", "i"),
+            ("best_session_lap_ms", "i"))
+
+    SESSIONS = (("timestamp_ns", "q"), ("event_index", "H"),
+                ("session_index", "H"), ("session_type", "B"),
+                ("phase", "B"), ("session_time_ms", "f"),
+                ("session_end_time_ms", "f"), ("focused_car_index", "i"),
+                ("time_of_day_ms", "f"), ("ambient_temp", "B"),
+                ("track_temp", "B"), ("best_session_lap_ms", "i"))
+
+    LAPS = (("timestamp_ns", "q"), ("session_time_ms", "f"),
+            ("car_index", "H"), ("driver_index", "H"), ("lap", "H"),
+            ("lap_time_ms", "i"), ("split_1_ms", "i"), ("split_2_ms", "i"),
+            ("split_3_ms", "i"), ("is_invalid", "?"),
+            ("is_valid_for_best", "?"), ("lap_type", "B"))
+
+    FORMATS = {"csv": ".csv", "arrow": ".arrow", "parquet": ".parquet"}
+
+    def __init__(self, directory: str, format: str = "csv",
+                 batch_rows: int = 4096, max_batches: int = 4,
+                 name: str = "acc", compression: str = None,
+                 policy: str = "drop"):
+
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown export format {format}")
+
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown policy {policy}")
+
+        if format != "csv" and (pyarrow is None or np is None):
+            raise ImportError(f"{format} export needs pyarrow")
+
+        self.directory = directory
+        self.format = format
+        self.batch_rows = batch_rows
+        self.max_batches = max_batches
+        self.name = name
+        self.compression = compression
+        self.policy = policy
+
+        self.files = []
+        self.batches_written = 0
+        self.rows_written = 0
+        self.errors = 0
+
+        # Buffers, queue and thread belong to the process that starts it
+        self._tables = None
+        self._cars = self._sessions = self._laps = None
+        self._queue = None
+        self._thread = None
+
+        self._session = (-1, -1)
+        self._session_time_ms = 0.0
+
+    def __getstate__(self):
+
+        if self._thread is not None:
+            raise TypeError("A started ColumnarExporter can't be pickled")
+
+        return self.__dict__.copy()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def start(self) -> None:
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._tables = {
+            name: _ExportTable(name, columns, self.batch_rows,
+                               self.max_batches)
+            for name, columns in (("cars", self.CARS),
+                                  ("sessions", self.SESSIONS),
+                                  ("laps", self.LAPS))
+        }
+        self._cars = self._tables["cars"]
+        self._sessions = self._tables["sessions"]
+        self._laps = self._tables["laps"]
+
+        # Never more items than buffers, memory stays bounded
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+
+        if self._thread is None:
+            return
+
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def add_car(self, update: RealTimeCarUpdate,
+                timestamp_ns: int = None) -> None:
+
+        self._add(self._cars, (
+            time.time_ns() if timestamp_ns is None else timestamp_ns,
+            self._session_time_ms, update.car_index, update.driver_index,
+            update.gear, update.world_pos_x, update.world_pos_y, update.yaw,
+            update._car_location, update.kmh, update.position,
+            update.cup_position, update.track_position,
+            update.spline_position, update.lap, update.delta,
+            update.current_lap.lap_time_ms, update.last_lap.lap_time_ms,
+            update.best_session_lap.lap_time_ms))
+
+    def add_session(self, update: RealTimeUpdate,
+                    timestamp_ns: int = None) -> None:
+
+        session = (update.event_index, update.session_index)
+        if session != self._session:
+            # Everything so far goes to the old session's files
+            self.flush()
+            self._session = session
+            self._queue.put((None, session, None, 0))
+
+        self._session_time_ms = update.session_time_ms
+
+        best_lap = update.best_session_lap
+        self._add(self._sessions, (
+            time.time_ns() if timestamp_ns is None else timestamp_ns,
+            update.event_index, update.session_index, update._session_type,
+            update._phase, update.session_time_ms,
+            update.session_end_time_ms, update.focused_car_index,
+            update.time_of_day_ms, update.ambient_temp, update.track_temp,
+            best_lap.lap_time_ms if best_lap is not None else 0))
+
+    def add_lap(self, lap: LapInfo, lap_number: int,
+                timestamp_ns: int = None) -> None:
+
+        splits = lap.splits
+        self._add(self._laps, (
+            time.time_ns() if timestamp_ns is None else timestamp_ns,
+            self._session_time_ms, lap.car_index, lap.driver_index,
+            lap_number, lap.lap_time_ms,
+            splits[0] if len(splits) > 0 else 0,
+            splits[1] if len(splits) > 1 else 0,
+            splits[2] if len(splits) > 2 else 0,
+            lap.is_invalid, lap.is_valid_for_best, lap._lap_type))
+
+    def _add(self, table: _ExportTable, values: tuple) -> None:
+
+        buffer = table.buffer
+        if buffer is None:
+            try:
+                buffer = table.buffer = table.free.get(self.policy == "block")
+            except queue.Empty:
+                table.dropped += 1
+                return
+
+        table.layout.pack_into(buffer, table.rows * table.layout.size,
+                               *values)
+        table.rows += 1
+
+        if table.rows == self.batch_rows:
+            self._submit(table)
+
+    def _submit(self, table: _ExportTable) -> None:
+
+        self._queue.put((table, self._session, table.buffer, table.rows))
+        table.buffer = None
+        table.rows = 0
+
+    def flush(self) -> None:
+
+        # Hands the partly filled batches to the writer
+        for table in self._tables.values():
+            if table.rows:
+                self._submit(table)
+
+    def _path(self, table: _ExportTable, session: tuple) -> str:
+
+        event_index, session_index = session
+        base = os.path.join(
+            self.directory,
+            f"{self.name}_{event_index}_{session_index}_{table.name}")
+        extension = self.FORMATS[self.format]
+
+        # A session seen again after a restart gets new files
+        path = base + extension
+        for part in itertools.count(1):
+            if not os.path.exists(path):
+                return path
+            path = f"{base}_{part}{extension}"
+
+    def _open_sink(self, table: _ExportTable, session: tuple):
+
+        path = self._path(table, session)
+        if self.format == "csv":
+            sink = _CsvSink(path, table)
+        else:
+            sink = _ArrowSink(path, table, self.format == "parquet",
+                              self.compression)
+
+        self.files.append(path)
+        return sink
+
+    def _write(self) -> None:
+
+        sinks = {}
+        while True:
+
+            item = self._queue.get()
+            if item is None:
+                break
+
+            table, session, buffer, rows = item
+            if table is None:
+                # New session, the old files are complete
+                for sink in sinks.values():
+                    sink.close()
+                sinks.clear()
+                continue
+
+            try:
+                sink = sinks.get(table.name)
+                if sink is None:
+                    sink = sinks[table.name] = self._open_sink(table, session)
+
+                data = memoryview(buffer)[:rows * table.layout.size]
+                sink.write(table, data, rows)
+                self.batches_written += 1
+                self.rows_written += rows
+
+            except Exception as error:
+                self.errors += 1
+                print(f"[pyUIL] Export of {table.name} failed: {error}")
+
+            table.free.put(buffer)
+
+        for sink in sinks.values():
+            sink.close()
+
+    def stats(self) -> dict:
+
+        tables = self._tables or {}
+        return {
+            "batches_written": self.batches_written,
+            "rows_written": self.rows_written,
+            "errors": self.errors,
+            "dropped_rows": {name: table.dropped
+                             for name, table in tables.items()},
+            "free_batches": {name: table.free.qsize()
+                             for name, table in tables.items()},
+            "files": list(self.files),
+        }
+
+
+class TelemetryBuffer:
+
+    # Fixed size history of every car update, one preallocated column per
+    # field indexed by [car slot, sample]. Each sample is written twice,
+    # at i and i + capacity, so any window of up to capacity samples is a
+    # contiguous slice and reads can hand out views instead of copies.
+    # Memory is max_cars * capacity * 2 * (8 + 4 * len(FIELDS)) bytes.
+    FIELDS = ("world_pos_x", "world_pos_y", "yaw", "kmh", "spline_position",
+              "lap", "position", "gear", "car_location")
+
+    def __init__(self, capacity: int = 3000,
+                 max_cars: int = SharedState.MAX_ENTRIES, name: str = None,
+                 shared: bool = False):
+
+        if np is None:
+            raise ImportError("TelemetryBuffer needs numpy")
+
+        self.capacity = capacity
+        self.max_cars = max_cars
+
+        width = 2 * capacity
+        layout = (
+            ("_car_ids", np.int32, (max_cars,)),
+            ("_counts", np.int64, (max_cars,)),
+            ("_time", np.float64, (max_cars, width)),
+            ("_values", np.float32, (len(self.FIELDS), max_cars, width)),
+        )
+
+        size = 0
+        offsets = []
+        for _, dtype, shape in layout:
+            offsets.append(size)
+            size += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+
+        self._shm = None
+        self._owner = False
+        if name is not None:
+            self._shm = shared_memory.SharedMemory(name=name)
+            buffer = self._shm.buf
+
+        elif shared:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
+            buffer = self._shm.buf
+
+        else:
+            buffer = bytearray(size)
+
+        for (attribute, dtype, shape), offset in zip(layout, offsets):
+            setattr(self, attribute, np.ndarray(shape, dtype, buffer, offset))
+
+        if name is None:
+            self._car_ids[:] = -1
+            self._counts[:] = 0
+
+        self._slots = {}
+        self.nbytes = size
+
+    def __getstate__(self):
+
+        # Other processes attach to the same shared block
+        if self._shm is None:
+            raise TypeError("Only shared TelemetryBuffer can be pickled")
+
+        return self.capacity, self.max_cars, self._shm.name
+
+    def __setstate__(self, state):
+
+        capacity, max_cars, name = state
+        self.__init__(capacity, max_cars, name)
+
+    def close(self) -> None:
+
+        if self._shm is not None:
+            self._car_ids = self._counts = self._time = self._values = None
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+
+            self._shm = None
+
+    def _writer_slot(self, car_index: int):
+
+        slot = self._slots.get(car_index)
+        if slot is not None:
+            return slot
+
+        found = np.flatnonzero(self._car_ids == car_index)
+        if len(found) == 0:
+            found = np.flatnonzero(self._car_ids == -1)
+            if len(found) == 0:
+                return None
+
+            self._counts[found[0]] = 0
+            self._car_ids[found[0]] = car_index
+
+        slot = self._slots[car_index] = int(found[0])
+
+        return slot
+
+    def _slot(self, car_index: int):
+
+        found = np.flatnonzero(self._car_ids == car_index)
+        return int(found[0]) if len(found) else None
+
+    def append(self, update: RealTimeCarUpdate, timestamp: float) -> None:
+
+        slot = self._writer_slot(update.car_index)
+        if slot is None:
+            return
+
+        count = int(self._counts[slot])
+        index = count % self.capacity
+        mirror = index + self.capacity
+
+        values = (update.world_pos_x, update.world_pos_y, update.yaw,
+                  update.kmh, update.spline_position, update.lap,
+                  update.position, update.gear, update._car_location)
+
+        self._time[slot, index] = self._time[slot, mirror] = timestamp
+        self._values[:, slot, index] = values
+        self._values[:, slot, mirror] = values
+
+        # Published last, readers never see a half written sample
+        self._counts[slot] = count + 1
+
+    def _window(self, slot: int, t0: float, t1: float) -> dict:
+
+        count = int(self._counts[slot])
+        lenght = min(count, self.capacity)
+
+        end = (count - 1) % self.capacity + self.capacity + 1
+        start = end - lenght
+
+        times = self._time[slot, start:end]
+        first = start if t0 is None else start + np.searchsorted(times, t0)
+        last = end if t1 is None else start + np.searchsorted(
+            times, t1, side="right")
+
+        window = {"time": self._time[slot, first:last]}
+        for field, column in zip(self.FIELDS, self._values):
+            window[field] = column[slot, first:last]
+
+        return window
+
+    def car_ids(self) -> list:
+        return [int(car_index) for car_index in self._car_ids
+                if car_index != -1]
+
+    def car(self, car_index: int, t0: float = None, t1: float = None):
+
+        # Views on the buffer, copy them if they need to outlive capacity
+        slot = self._slot(car_index)
+        if slot is None or self._counts[slot] == 0:
+            return None
+
+        return self._window(slot, t0, t1)
+
+    def last(self, seconds: float, now: float = None) -> dict:
+
+        if now is None:
+            now = time.monotonic()
+
+        windows = {}
+        for slot in np.flatnonzero((self._car_ids != -1) & (self._counts > 0)):
+            windows[int(self._car_ids[slot])] = self._window(
+                slot, now - seconds, None)
+
+        return windows
+
+    def latest(self) -> dict:
+
+        slots = np.flatnonzero((self._car_ids != -1) & (self._counts > 0))
+        index = (self._counts[slots] - 1) % self.capacity
+
+        latest = {
+            "car_index": self._car_ids[slots].copy(),
+            "time": self._time[slots, index],
+        }
+        for field, column in zip(self.FIELDS, self._values):
+            latest[field] = column[slots, index]
+
+        return latest
+
+    def resample(self, t: float = None, history: int = 4,
+                 max_extrapolation: float = 0.25) -> dict:
+
+        # Position of every car at time t (time.monotonic() by default) from
+        # its last history samples, interpolated between the two around t or
+        # extrapolated from the last two for up to max_extrapolation seconds,
+        # held after that. The cost doesn't depend on how often cars update.
+        # Yaw and spline position are interpolated the short way round, so
+        # pi -> -pi or 0.99 -> 0.01 across the line don't spin or jump back.
+        # The capacity has to be larger than history, the sample being
+        # written is then never one of those read.
+        if not 1 <= history < self.capacity:
+            raise ValueError(f"history has to be between 1 and "
+                             f"{self.capacity - 1}, not {history}")
+
+        if t is None:
+            t = time.monotonic()
+
+        slots = np.flatnonzero((self._car_ids != -1) & (self._counts > 0))
+        counts = self._counts[slots]
+
+        # Oldest to newest, contiguous thanks to the mirrored copy
+        newest = (counts - 1) % self.capacity + self.capacity
+        columns = newest[:, None] + np.arange(1 - history, 1)
+        rows = slots[:, None]
+
+        times = self._time[rows, columns]
+        first = history - np.minimum(counts, history)
+        valid = np.arange(history) >= first[:, None]
+
+        # Last sample at or before t, then the pair around it, the newest
+        # pair when t is past the last sample
+        before = np.count_nonzero(valid & (times <= t), axis=1)
+        left = np.clip(first + before - 1, first, history - 2)
+        right = np.minimum(left + 1, history - 1)
+        single = counts == 1
+        left[single] = right[single] = history - 1
+
+        cars = np.arange(len(slots))
+        t0 = times[cars, left]
+        t1 = times[cars, right]
+        last = times[:, -1]
+
+        at = np.clip(t, times[cars, first], last + max_extrapolation)
+        span = t1 - t0
+        alpha = np.divide(at - t0, span, out=np.zeros_like(span),
+                          where=span > 0)
+
+        # x, y, yaw and spline position of every car in one gather
+        fields = np.array([0, 1, 2, 4])[:, None, None]
+        values = self._values[fields, rows, columns].astype(np.float64)
+        v0 = values[:, cars, left]
+        delta = values[:, cars, right] - v0
+
+        delta[2] = (delta[2] + np.pi) % (2 * np.pi) - np.pi
+        delta[3] = (delta[3] + 0.5) % 1.0 - 0.5
+
+        value = v0 + alpha * delta
+        value[2] = (value[2] + np.pi) % (2 * np.pi) - np.pi
+        value[3] %= 1.0
+
+        positions = {
+            "car_index": self._car_ids[slots].copy(),
+            "age": t - last,
+        }
+        for index, field in enumerate(self.FIELDS[:3] + ("spline_position",)):
+            positions[field] = value[index]
+
+        return positions
+
+
+class StandingsEngine:
+
+    # Gap to leader, interval to the car ahead, gap to the class leader
+    # and laps down for the whole field in one vectorized pass, from the
+    # track progress (lap + spline position) and each car's recent speed
+    MIN_SPEED_KMH = 20.0
+    SPEED_SMOOTHING = 0.2
+
+    def __init__(self, max_cars: int = SharedState.MAX_ENTRIES):
+
+        if np is None:
+            raise ImportError("StandingsEngine needs numpy")
+
+        self.max_cars = max_cars
+
+        self._car_ids = np.full(max_cars, -1, dtype=np.int32)
+        self._progress = np.zeros(max_cars)
+        self._speed = np.zeros(max_cars)
+        self._cup = np.zeros(max_cars, dtype=np.int64)
+        self._slots = {}
+
+        self.results = {}
+
+    def retain(self, car_ids) -> None:
+
+        for car_index in list(self._slots):
+            if car_index not in car_ids:
+                self._car_ids[self._slots.pop(car_index)] = -1
+                self.results.pop(car_index, None)
+
+    def update(self, update: RealTimeCarUpdate, cup_category: int) -> None:
+
+        slot = self._slots.get(update.car_index)
+        if slot is None:
+            free = np.flatnonzero(self._car_ids == -1)
+            if len(free) == 0:
+                return
+
+            slot = self._slots[update.car_index] = int(free[0])
+            self._car_ids[slot] = update.car_index
+            self._speed[slot] = update.kmh
+
+        self._progress[slot] = update.lap + update.spline_position
+        self._speed[slot] += self.SPEED_SMOOTHING * (
+            update.kmh - self._speed[slot])
+        self._cup[slot] = cup_category
+
+    def compute(self, track_meters: int) -> dict:
+
+        slots = np.flatnonzero(self._car_ids != -1)
+        if len(slots) == 0 or track_meters <= 0:
+            return self.results
+
+        progress = self._progress[slots]
+        cup = self._cup[slots]
+        seconds_per_lap = track_meters / (
+            np.maximum(self._speed[slots], self.MIN_SPEED_KMH) / 3.6)
+
+        behind_leader = progress.max() - progress
+        gap_to_leader = behind_leader * seconds_per_lap
+
+        order = np.argsort(-progress, kind="stable")
+        interval = np.zeros(len(slots))
+        interval[order[1:]] = (progress[order[:-1]] - progress[order[1:]]) \
+            * seconds_per_lap[order[1:]]
+
+        class_leader = np.full(cup.max() + 1, -np.inf)
+        np.maximum.at(class_leader, cup, progress)
+        class_gap = (class_leader[cup] - progress) * seconds_per_lap
+
+        laps_down = np.floor(behind_leader).astype(np.int64)
+
+        self.results = {
+            car_index: row for car_index, *row in zip(
+                self._car_ids[slots].tolist(), gap_to_leader.tolist(),
+                interval.tolist(), class_gap.tolist(), laps_down.tolist())
+        }
+
+        return self.results
+
+    def get(self, car_index: int) -> tuple:
+        return self.results.get(car_index, (0.0, 0.0, 0.0, 0))
+
+
+class LapHistory:
+
+    # Every completed lap in compact array columns (one row per lap) with
+    # running indexes for best laps, best sectors and sorted valid laps per
+    # car, class and session, so queries never rescan the history
+    SECTORS = 3
+
+    def __init__(self):
+
+        self._car_index = array.array("H")
+        self._driver_index = array.array("H")
+        self._lap = array.array("H")
+        self._lap_time_ms = array.array("I")
+        self._splits = array.array("i")
+        self._flags = array.array("B")
+        self._cup_category = array.array("B")
+        self._session_index = array.array("h")
+
+        self._car_rows = {}
+        self._best_lap = {}
+        self._best_sector = {}
+        self._sorted_laps = {}
+
+        self.session_index = 0
+
+    def __len__(self) -> int:
+        return len(self._lap)
+
+    def add(self, car_index: int, lap: int, lap_info: LapInfo,
+            cup_category: int = 0, session_index: int = None) -> int:
+
+        if session_index is None:
+            session_index = self.session_index
+
+        self.session_index = session_index
+
+        splits = list(lap_info.splits[:self.SECTORS])
+        splits += [0] * (self.SECTORS - len(splits))
+
+        row = len(self._lap)
+        self._car_index.append(car_index)
+        self._driver_index.append(lap_info.driver_index)
+        self._lap.append(lap)
+        self._lap_time_ms.append(lap_info.lap_time_ms)
+        self._splits.extend(splits)
+        self._flags.append(lap_info.is_invalid | lap_info.is_valid_for_best << 1)
+        self._cup_category.append(cup_category)
+        self._session_index.append(session_index)
+
+        self._car_rows.setdefault((session_index, car_index), []).append(row)
+
+        lap_time = lap_info.lap_time_ms
+        if lap_info.is_invalid or lap_time <= 0:
+            return row
+
+        scopes = (("car", car_index), ("class", cup_category), ("session", 0))
+        for scope in scopes:
+            key = (session_index, *scope)
+
+            best = self._best_lap.get(key)
+            if best is None or lap_time < best[0]:
+                self._best_lap[key] = (lap_time, row)
+
+            bisect.insort(self._sorted_laps.setdefault(key, []),
+                          (lap_time, row))
+
+            for sector, split in enumerate(splits):
+                if split <= 0:
+                    continue
+
+                best = self._best_sector.get((*key, sector))
+                if best is None or split < best[0]:
+                    self._best_sector[(*key, sector)] = (split, row)
+
+        return row
+
+    def lap(self, row: int) -> dict:
+
+        flags = self._flags[row]
+        splits = self._splits[row * self.SECTORS: (row + 1) * self.SECTORS]
+
+        return {
+            "car_index": self._car_index[row],
+            "driver_index": self._driver_index[row],
+            "lap": self._lap[row],
+            "lap_time_ms": self._lap_time_ms[row],
+            "splits": list(splits),
+            "is_invalid": bool(flags & 1),
+            "is_valid_for_best": bool(flags & 2),
+            "cup_category": self._cup_category[row],
+            "session_index": self._session_index[row],
+        }
+
+    def _key(self, car_index: int, cup_category: int, session_index: int):
+
+        if session_index is None:
+            session_index = self.session_index
+
+        if car_index is not None:
+            return session_index, "car", car_index
+
+        if cup_category is not None:
+            return session_index, "class", cup_category
+
+        return session_index, "session", 0
+
+    def laps(self, car_index: int, session_index: int = None) -> list:
+
+        if session_index is None:
+            session_index = self.session_index
+
+        rows = self._car_rows.get((session_index, car_index), [])
+        return [self.lap(row) for row in rows]
+
+    def best_lap(self, car_index: int = None, cup_category: int = None,
+                 session_index: int = None):
+
+        best = self._best_lap.get(
+            self._key(car_index, cup_category, session_index))
+        return self.lap(best[1]) if best else None
+
+    def top_laps(self, count: int = 10, car_index: int = None,
+                 cup_category: int = None, session_index: int = None) -> list:
+
+        rows = self._sorted_laps.get(
+            self._key(car_index, cup_category, session_index), [])
+        return [self.lap(row) for _, row in rows[:count]]
+
+    def best_sectors(self, car_index: int = None, cup_category: int = None,
+                     session_index: int = None) -> list:
+
+        key = self._key(car_index, cup_category, session_index)
+
+        sectors = []
+        for sector in range(self.SECTORS):
+            best = self._best_sector.get((*key, sector))
+            sectors.append(best[0] if best else 0)
+
+        return sectors
+
+    def theoretical_best(self, car_index: int = None, cup_category: int = None,
+                         session_index: int = None) -> int:
+
+        sectors = self.best_sectors(car_index, cup_category, session_index)
+        if 0 in sectors:
+            return 0
+
+        return sum(sectors)
+
+
+class RaceEventType(Enum):
+
+    Overtake = 0
+    PitEntry = 1
+    PitExit = 2
+    LapCompleted = 3
+
+
+class RaceEvent:
+
+    # other_car_index is the car overtaken, duration_ms the pit lane time
+    # on PitExit and the lap time on LapCompleted, -1 when not relevant
+    __slots__ = ("_type", "car_index", "lap", "position", "other_car_index",
+                 "duration_ms", "session_time_ms", "seq")
+
+    def __init__(self, event_type: int, car_index: int, lap: int,
+                 position: int, session_time_ms: float,
+                 other_car_index: int = -1, duration_ms: int = -1):
+
+        self._type = event_type
+        self.car_index = car_index
+        self.lap = lap
+        self.position = position
+        self.other_car_index = other_car_index
+        self.duration_ms = duration_ms
+        self.session_time_ms = session_time_ms
+        self.seq = 0  # Set once the event is logged
+
+    @property
+    def type(self) -> RaceEventType:
+        return RaceEventType(self._type)
+
+    def __repr__(self) -> str:
+        return (f"RaceEvent({self.seq}, {self.type.name}, car "
+                f"{self.car_index}, lap {self.lap}, P{self.position}, "
+                f"other {self.other_car_index}, {self.duration_ms}ms)")
+
+
+class _RaceCarState:
+
+    __slots__ = ("position", "car_location", "lap", "spline_position",
+                 "pit_entry_ms")
+
+    def __init__(self, car_update: RealTimeCarUpdate):
+
+        self.position = car_update.position
+        self.car_location = car_update._car_location
+        self.lap = car_update.lap
+        self.spline_position = car_update.spline_position
+        self.pit_entry_ms = None
+
+
+_NO_EVENTS = ()
+
+
+class RaceEventDetector:
+
+    # Compares each car update with that car's previous compact state
+    # instead of diffing the whole field, most updates produce no event.
+    # Overtakes only count between two cars on track where the car gaining
+    # the position is now ahead on track, pit stop shuffles don't count.
+    # A pit stop goes from Track to one of the pit locations and back,
+    # NONE (not on the map yet, back to the garage) is neither.
+
+    _TRACK = 1  # CarLocation.Track
+    _PIT = (2, 3, 4)  # CarLocation.Pitlane, PitEntry and PitExit
+
+    def __init__(self):
+
+        self._cars = {}
+        self._by_position = {}
+        self._session_index = None
+
+    def retain(self, car_ids) -> None:
+
+        for car_index in list(self._cars):
+            if car_index not in car_ids:
+                del self._cars[car_index]
+
+        for position, car_index in list(self._by_position.items()):
+            if car_index not in self._cars:
+                del self._by_position[position]
+
+    def update(self, car_update: RealTimeCarUpdate, session_time_ms: float,
+               session_index: int, lap_completed: bool):
+
+        if session_index != self._session_index:
+            self._session_index = session_index
+            self._cars.clear()
+            self._by_position.clear()
+
+        car_index = car_update.car_index
+        position = car_update.position
+        location = car_update._car_location
+
+        state = self._cars.get(car_index)
+        if state is None:
+            self._cars[car_index] = _RaceCarState(car_update)
+            self._by_position[position] = car_index
+            return _NO_EVENTS
+
+        events = None
+
+        if lap_completed:
+            events = [RaceEvent(3, car_index, car_update.lap, position,
+                                session_time_ms,
+                                duration_ms=car_update.last_lap.lap_time_ms)]
+
+        if location != state.car_location:
+
+            if state.car_location == self._TRACK and location in self._PIT:
+                # Pit timing starts at the first pit location, PitEntry
+                # unless that update was lost
+                state.pit_entry_ms = session_time_ms
+                event = RaceEvent(1, car_index, car_update.lap, position,
+                                  session_time_ms)
+                events = [event] if events is None else events + [event]
+
+            elif state.car_location in self._PIT and location == self._TRACK:
+                duration = -1
+                if state.pit_entry_ms is not None:
+                    duration = int(session_time_ms - state.pit_entry_ms)
+
+                state.pit_entry_ms = None
+                event = RaceEvent(2, car_index, car_update.lap, position,
+                                  session_time_ms, duration_ms=duration)
+                events = [event] if events is None else events + [event]
+
+        if (position < state.position and location == self._TRACK
+                and state.car_location == self._TRACK):
+
+            progress = car_update.lap + car_update.spline_position
+            for passed_position in range(position, state.position):
+
+                # Whoever held the position last, unless they moved up since
+                other = self._by_position.get(passed_position)
+                other_state = self._cars.get(other)
+                if (other_state is None or other == car_index
+                        or other_state.position < passed_position):
+                    continue
+
+                other_progress = other_state.lap + other_state.spline_position
+                if other_state.car_location != self._TRACK or other_progress > progress:
+                    continue
+
+                event = RaceEvent(0, car_index, car_update.lap, position,
+                                  session_time_ms, other_car_index=other)
+                events = [event] if events is None else events + [event]
+
+        if position != state.position:
+            self._by_position[position] = car_index
+
+        state.position = position
+        state.car_location = location
+        state.lap = car_update.lap
+        state.spline_position = car_update.spline_position
+
+        return _NO_EVENTS if events is None else events
+
+
+class Subscription:
+
+    # Which packet types (and optional field groups) get decoded at all,
+    # anything else is dropped after the type byte or skipped by lenght.
+    # Entries need car_update, entry_list and entry_list_car, car_update
+    # brings the other two along (without them every car stays unknown and
+    # the entry list is requested again and again).
+    PACKETS = {
+        "registration": 1,
+        "realtime_update": 2,
+        "car_update": 3,
+        "entry_list": 4,
+        "track_data": 5,
+        "entry_list_car": 6,
+        "broadcast_event": 7,
+    }
+    FIELDS = ("cameras", "hud", "world_position")
+
+    def __init__(self, packets=None, fields=None):
+
+        if packets is None:
+            packets = self.PACKETS
+
+        if fields is None:
+            fields = self.FIELDS
+
+        for name in packets:
+            if name not in self.PACKETS:
+                raise ValueError(f"Unknown packet type {name}")
+
+        for name in fields:
+            if name not in self.FIELDS:
+                raise ValueError(f"Unknown field group {name}")
+
+        # Registration is always needed to get connected
+        self.packet_types = bytearray(256)
+        self.packet_types[1] = 1
+        for name in packets:
+            self.packet_types[self.PACKETS[name]] = 1
+
+        if "car_update" in packets:
+            self.packet_types[self.PACKETS["entry_list"]] = 1
+            self.packet_types[self.PACKETS["entry_list_car"]] = 1
+
+        self.cameras = "cameras" in fields
+        self.hud = "hud" in fields
+        self.world_position = "world_position" in fields
+
+    def accepts(self, packet_type: int) -> bool:
+        return self.packet_types[packet_type] == 1
+
+
+class Histogram:
+
+    # Fixed bucket latency histogram in nanoseconds, last bucket is +Inf
+    BOUNDS_NS = (1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000,
+                 500000, 1000000, 5000000)
+
+    __slots__ = ("counts", "total_ns", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_NS) + 1)
+        self.total_ns = 0
+        self.count = 0
+
+    def observe(self, elapsed_ns: int) -> None:
+        self.counts[bisect.bisect_left(self.BOUNDS_NS, elapsed_ns)] += 1
+        self.total_ns += elapsed_ns
+        self.count += 1
+
+    def stats(self) -> dict:
+
+        return {
+            "count": self.count,
+            "sum_ns": self.total_ns,
+            "mean_ns": self.total_ns / self.count if self.count else 0.0,
+            "buckets": list(self.counts),
+        }
+
+
+class ListenerMetrics:
+
+    # Counters kept by a listener created with metrics=True, every hook is
+    # behind an "is not None" check so they cost nothing when disabled
+
+    PACKET_NAMES = {packet_type: name
+                    for name, packet_type in Subscription.PACKETS.items()}
+
+    __slots__ = ("packets", "bytes", "unknown", "failed", "decode",
+                 "socket_timeouts", "connect_attempts", "entry_list_requests",
+                 "snapshot")
+
+    def __init__(self):
+
+        self.packets = [0] * 256
+        self.bytes = 0
+        self.unknown = 0
+        self.failed = 0
+        self.decode = {packet_type: Histogram()
+                       for packet_type in self.PACKET_NAMES}
+        self.socket_timeouts = 0
+        self.connect_attempts = 0
+        self.entry_list_requests = 0
+        self.snapshot = Histogram()
+
+    def packet(self, packet_type: int, size: int, elapsed_ns: int) -> None:
+
+        self.packets[packet_type] += 1
+        self.bytes += size
+
+        histogram = self.decode.get(packet_type)
+        if histogram is None:
+            self.unknown += 1
+        elif elapsed_ns is not None:
+            histogram.observe(elapsed_ns)
+
+    def stats(self) -> dict:
+
+        return {
+            "packets": {name: self.packets[packet_type]
+                        for packet_type, name in self.PACKET_NAMES.items()},
+            "bytes": self.bytes,
+            "unknown": self.unknown,
+            "failed": self.failed,
+            "decode": {self.PACKET_NAMES[packet_type]: histogram.stats()
+                       for packet_type, histogram in self.decode.items()},
+            "socket_timeouts": self.socket_timeouts,
+            "connect_attempts": self.connect_attempts,
+            "entry_list_requests": self.entry_list_requests,
+            "snapshot": self.snapshot.stats(),
+        }
+
+
+def _prometheus_series(name: str, labels: dict) -> str:
+
+    if not labels:
+        return name
+
+    text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    return f"{name}{{{text}}}"
+
+
+def prometheus_text(stats: dict, prefix: str = "acc_udp",
+                    label: str = None) -> str:
+
+    # Prometheus text format for ListenerMetrics.stats(). With label, stats
+    # maps that label's values (e.g. server ids) to one stats dict each.
+    if label is None:
+        samples = [({}, stats)]
+    else:
+        samples = [({label: value}, sample) for value, sample in stats.items()]
+
+    bounds = [bound / 1e9 for bound in Histogram.BOUNDS_NS] + ["+Inf"]
+    lines = []
+
+    def counter(name: str, values_of, help_text: str) -> None:
+
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} counter")
+        for labels, sample in samples:
+            for extra, value in values_of(sample):
+                series = _prometheus_series(f"{prefix}_{name}",
+                                            {**labels, **extra})
+                lines.append(f"{series} {value}")
+
+    def histogram(name: str, histograms_of, help_text: str) -> None:
+
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} histogram")
+        for labels, sample in samples:
+            for extra, values in histograms_of(sample):
+
+                series = {**labels, **extra}
+                cumulative = 0
+                for bound, count in zip(bounds, values["buckets"]):
+                    cumulative += count
+                    bucket = _prometheus_series(f"{prefix}_{name}_bucket",
+                                                {**series, "le": bound})
+                    lines.append(f"{bucket} {cumulative}")
+
+                total = _prometheus_series(f"{prefix}_{name}_sum", series)
+                count = _prometheus_series(f"{prefix}_{name}_count", series)
+                lines.append(f"{total} {values['sum_ns'] / 1e9}")
+                lines.append(f"{count} {values['count']}")
+
+    counter("packets_total",
+            lambda sample: [({"type": name}, count)
+                            for name, count in sample["packets"].items()],
+            "Packets received by type.")
+
+    for key, help_text in (
+            ("bytes", "Bytes received."),
+            ("unknown", "Packets of an unknown type."),
+            ("failed", "Packets that failed to decode."),
+            ("socket_timeouts", "Receive timeouts."),
+            ("connect_attempts", "Registration requests sent."),
+            ("entry_list_requests", "Entry list requests sent for unknown cars.")):
+        counter(f"{key}_total", lambda sample, key=key: [({}, sample[key])],
+                help_text)
+
+    histogram("decode_seconds",
+              lambda sample: [({"type": name}, values)
+                              for name, values in sample["decode"].items()],
+              "Time to decode and apply a packet.")
+    histogram("snapshot_seconds",
+              lambda sample: [({}, sample["snapshot"])],
+              "Time to read a udp_data snapshot.")
+
+    # Socket side, left out where a value isn't known (no listener socket,
+    # no /proc/net/udp)
+    def receive(key: str, kind: str, name: str, help_text: str) -> None:
+
+        values = [(labels, sample["receive"][key])
+                  for labels, sample in samples
+                  if sample.get("receive", {}).get(key) is not None]
+        if not values:
+            return
+
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for labels, value in values:
+            series = _prometheus_series(f"{prefix}_{name}", labels)
+            lines.append(f"{series} {value}")
+
+    receive("batches", "counter", "receive_batches_total",
+            "Batches drained from the socket.")
+    receive("full_batches", "counter", "receive_full_batches_total",
+            "Batches that filled the whole buffer pool.")
+    receive("kernel_drops", "counter", "kernel_drops_total",
+            "Datagrams dropped by the kernel, receive buffer full.")
+    receive("backlog_bytes", "gauge", "receive_backlog_bytes",
+            "Bytes waiting in the socket receive buffer.")
+    receive("rcvbuf", "gauge", "receive_buffer_bytes",
+            "Size of the socket receive buffer.")
+
+    return "\n".join(lines) + "\n"
+
+
+EVENT_KINDS = ("car_update", "session_update", "entry_list", "track_data",
+               "broadcast_event", "lap_completed", "race_event")
+
+
+class _Handler:
+
+    __slots__ = ("kind", "callback", "policy", "max_queue", "block_timeout",
+                 "queue", "condition", "scheduled", "ready", "inbox",
+                 "threads", "calls", "dropped", "errors", "latencies",
+                 "max_latency")
+
+    def __init__(self, kind: str, callback, max_queue: int, policy: str,
+                 block_timeout: float):
+
+        if policy not in ("drop_oldest", "block"):
+            raise ValueError(f"Unknown backpressure policy {policy}")
+
+        self.kind = kind
+        self.callback = callback
+        self.policy = policy
+        self.max_queue = max_queue
+        self.block_timeout = block_timeout
+
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.scheduled = False
+
+        # Set by the dispatcher, inbox and threads only when dedicated
+        self.ready = None
+        self.inbox = None
+        self.threads = ()
+
+        self.calls = 0
+        self.dropped = 0
+        self.errors = 0
+        self.latencies = collections.deque(maxlen=1000)
+        self.max_latency = 0.0
+
+    def stats(self) -> dict:
+
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+
+        return {
+            "kind": self.kind,
+            "callback": getattr(self.callback, "__qualname__",
+                                repr(self.callback)),
+            "calls": self.calls,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queued": len(self.queue) + (self.inbox.qsize()
+                                         if self.inbox is not None else 0),
+            "latency_mean": sum(latencies) / count if count else 0.0,
+            "latency_p99": latencies[int(count * 0.99)] if count else 0.0,
+            "latency_max": self.max_latency,
+        }
+
+
+class EventDispatcher:
+
+    # Runs event handlers on a small thread pool. Each handler has its own
+    # bounded queue and at most one worker at a time (so it sees events in
+    # order), a slow handler only ever fills its own queue.
+    # With dedicated=True every handler gets its own worker and a feed
+    # thread that applies its policy, emit never waits then. It's for an
+    # emitter that feeds every handler from one thread (the forwarder of
+    # the process listener) and would otherwise wait on each "block" one.
+
+    def __init__(self, max_workers: int = 4, dedicated: bool = False):
+
+        self.max_workers = max_workers
+        self.dedicated = dedicated
+
+        self._handlers = {}
+        self._ready = queue.SimpleQueue()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, kind: str, callback, max_queue: int = 256,
+                  policy: str = "drop_oldest",
+                  block_timeout: float = 0.1) -> _Handler:
+
+        handler = _Handler(kind, callback, max_queue, policy, block_timeout)
+
+        with self._lock:
+            if self.dedicated:
+                self._start_dedicated(handler)
+
+            elif not self._workers:
+                self._start()
+
+            if handler.ready is None:
+                handler.ready = self._ready
+
+            # Copy on write, emit never takes the lock
+            handlers = dict(self._handlers)
+            handlers[kind] = handlers.get(kind, ()) + (handler,)
+            self._handlers = handlers
+
+        return handler
+
+    def unsubscribe(self, handler: _Handler) -> None:
+
+        with self._lock:
+            handlers = dict(self._handlers)
+            handlers[handler.kind] = tuple(
+                h for h in handlers.get(handler.kind, ()) if h is not handler)
+            self._handlers = handlers
+
+        self._stop_dedicated(handler)
+
+    def kinds(self) -> set:
+        return {kind for kind, handlers in self._handlers.items() if handlers}
+
+    def _start(self) -> None:
+
+        for _ in range(self.max_workers):
+            worker = threading.Thread(target=self._work, args=(self._ready,),
+                                      daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _start_dedicated(self, handler: _Handler) -> None:
+
+        # The inbox only overflows when the handler's own queue is full
+        # and its feed is waiting for room
+        handler.ready = queue.SimpleQueue()
+        handler.inbox = queue.Queue(handler.max_queue)
+        handler.threads = (
+            threading.Thread(target=self._feed, args=(handler,), daemon=True),
+            threading.Thread(target=self._work, args=(handler.ready,),
+                             daemon=True),
+        )
+
+        for thread in handler.threads:
+            thread.start()
+
+    def _stop_dedicated(self, handler: _Handler) -> None:
+
+        if not handler.threads:
+            return
+
+        feed, worker = handler.threads
+        handler.threads = ()
+
+        handler.inbox.put(None)
+        feed.join()
+        handler.ready.put(None)
+        worker.join()
+
+    def stop(self) -> None:
+
+        with self._lock:
+            for _ in self._workers:
+                self._ready.put(None)
+
+            workers, self._workers = self._workers, []
+
+        for worker in workers:
+            worker.join()
+
+        for handlers in self._handlers.values():
+            for handler in handlers:
+                self._stop_dedicated(handler)
+
+    def emit(self, kind: str, payload) -> None:
+
+        now = time.perf_counter()
+        for handler in self._handlers.get(kind, ()):
+
+            if handler.inbox is None:
+                self._offer(handler, now, payload)
+                continue
+
+            try:
+                handler.inbox.put_nowait((now, payload))
+
+            except queue.Full:
+                with handler.condition:
+                    handler.dropped += 1
+
+    def _feed(self, handler: _Handler) -> None:
+
+        while True:
+            event = handler.inbox.get()
+            if event is None:
+                return
+
+            self._offer(handler, *event)
+
+    def _offer(self, handler: _Handler, queued_at: float, payload) -> None:
+
+        # Applies the handler's policy, "block" waits here
+        with handler.condition:
+
+            if len(handler.queue) >= handler.max_queue:
+                if handler.policy == "block":
+                    handler.condition.wait_for(
+                        lambda: len(handler.queue) < handler.max_queue,
+                        handler.block_timeout)
+
+                if len(handler.queue) >= handler.max_queue:
+                    # drop_oldest, or block that timed out
+                    if handler.policy == "drop_oldest":
+                        handler.queue.popleft()
+
+                    else:
+                        handler.dropped += 1
+                        return
+
+                    handler.dropped += 1
+
+            handler.queue.append((queued_at, payload))
+
+            if not handler.scheduled:
+                handler.scheduled = True
+                handler.ready.put(handler)
+
+    def _work(self, ready) -> None:
+
+        while True:
+
+            handler = ready.get()
+            if handler is None:
+                return
+
+            # A few events per turn so busy handlers share the pool
+            for _ in range(32):
+
+                with handler.condition:
+                    if not handler.queue:
+                        break
+
+                    queued_at, payload = handler.queue.popleft()
+                    handler.condition.notify()
+
+                try:
+                    handler.callback(payload)
+
+                except Exception as error:
+                    handler.errors += 1
+                    print(f"[pyUIL]: {handler.kind} handler raised {error!r}")
+
+                latency = time.perf_counter() - queued_at
+                handler.calls += 1
+                handler.latencies.append(latency)
+                handler.max_latency = max(handler.max_latency, latency)
+
+            with handler.condition:
+                if handler.queue:
+                    ready.put(handler)
+
+                else:
+                    handler.scheduled = False
+
+    def stats(self) -> list:
+        return [handler.stats() for handlers in self._handlers.values()
+                for handler in handlers]
+
+
+class AccUdpState:
+
+    # Packet decoding and udp data bookkeeping shared by every listener,
+    # subclasses only decide how datagrams are received and sent.
+
+    # An entry list request is answered with the whole list, so one in
+    # flight covers every unknown car. Without an answer it's sent again
+    # after the timeout, right after one only once the car infos settled.
+    ENTRY_LIST_TIMEOUT = 2.0
+    ENTRY_LIST_SETTLE = 0.25
+
+    def __init__(self, ip, port, instance_info, record_path: str = None,
+                 subscription: Subscription = None, metrics: bool = False,
+                 cache_dir: str = None, exporter: ColumnarExporter = None):
+
+        self.subscription = subscription or Subscription()
+        self.metrics = ListenerMetrics() if metrics else None
+        self.registration = Registration()
+        self.session = RealTimeUpdate()
+        self.track = TrackData()
+        self.entry_list = EntryList()
+        self.connected = False
+
+        self._name = instance_info["name"]
+        self._psw = instance_info["password"]
+        self._speed = instance_info["speed"]
+        self._cmd_psw = instance_info["cmd_password"]
+
+        self._udp_data = {
+            "connection": {
+                "id": -1,
+                "connected": False
+            },
+            "entries": {},
+            "session": {
+                "track": "None",
+                "session_type": SessionType.NONE.name,
+                "session_time": datetime.datetime.fromtimestamp(0),
+                "session_end_time": datetime.datetime.fromtimestamp(0),
+                "air_temp": 0,
+                "track_temp": 0,
+                "version": 0
+            },
+        }
+
+        # Every change to an entry or the session gets a new version so
+        # readers can ask for what changed since their last look
+        self._version = 0
+        self._removed = {}
+
+        self._ip = ip
+        self._port = port
+        self._entry_list_deadline = 0.0
+
+        # Opened by the listener itself, file handles don't cross processes
+        self._record_path = record_path
+        self.recorder = None
+        self.exporter = exporter
+
+        self.telemetry = None
+        self.standings = StandingsEngine() if np is not None else None
+
+        self.laps = LapHistory()
+        self._car_laps = {}
+
+        self.events = EventLog()
+
+        self.race_detector = RaceEventDetector()
+        self.race_events = EventLog()
+
+        self._writer = ByteWriter()
+        self.commands = CommandQueue(self._send, self._schedule_command)
+
+        self.cache = None
+        if cache_dir is not None:
+            self.cache = EntryCache(cache_dir, f"{ip}_{port}")
+            if self.cache.track_packet is not None:
+                cur = Cursor(self.cache.track_packet)
+                cur.read_u8()
+                self.track.update(cur)
+
+        self.dispatcher = None
+        self._event_kinds = frozenset()
+
+    def _open_outputs(self) -> None:
+
+        if self._record_path is not None:
+            self.recorder = PacketRecorder(self._record_path)
+
+        if self.exporter is not None:
+            self.exporter.start()
+
+    def _close_outputs(self) -> None:
+
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+        if self.exporter is not None:
+            self.exporter.close()
+
+    def _next_version(self) -> int:
+        self._version += 1
+        return self._version
+
+    def _send(self, data: bytes) -> None:
+        # Offline state (replay, tests) has nowhere to send to
+        pass
+
+    def _schedule_command(self, delay: float, callback) -> None:
+        self.commands.schedule_later(delay, callback)
+
+    @property
+    def connection_id(self) -> int:
+        return self.registration.connection_id
+
+    def _connection_changed(self) -> None:
+        pass
+
+    def _session_changed(self) -> None:
+        pass
+
+    def _entries_changed(self) -> None:
+        pass
+
+    def _entry_changed(self, car_index: int) -> None:
+        pass
+
+    def _event_logged(self, event: BroadcastingEvent) -> None:
+        pass
+
+    def connection_lost(self) -> None:
+
+        self.save_cache()
+        self.connected = False
+        self._udp_data["connection"]["connected"] = False
+        self._connection_changed()
+
+    def handle_packet(self, data: bytes):
+
+        # A malformed or truncated datagram is dropped, it must not take
+        # the listener down with it
+        metrics = self.metrics
+        if metrics is None:
+            try:
+                return self._handle_packet(data)
+
+            except Exception as error:
+                self._packet_failed(data, error)
+                return None
+
+        start = time.perf_counter_ns()
+        try:
+            result = self._handle_packet(data)
+
+        except Exception as error:
+            metrics.failed += 1
+            self._packet_failed(data, error)
+            return None
+
+        # Packets of types nobody subscribed to are counted but not
+        # decoded, they stay out of the decode times
+        elapsed_ns = None
+        if self.subscription.packet_types[data[0]]:
+            elapsed_ns = time.perf_counter_ns() - start
+
+        metrics.packet(data[0], len(data), elapsed_ns)
+        return result
+
+    def _packet_failed(self, data: bytes, error: Exception) -> None:
+        _logger.debug("Dropped a packet of %d bytes that failed to decode: %r",
+                      len(data), error, exc_info=error)
+
+    def stats(self) -> dict:
+        return None if self.metrics is None else self.metrics.stats()
+
+    def prometheus(self, prefix: str = "acc_udp") -> str:
+
+        # An empty exposition without metrics, a scrape finds no series
+        stats = self.stats()
+        return "" if stats is None else prometheus_text(stats, prefix)
+
+    def exporter_stats(self) -> dict:
+        return None if self.exporter is None else self.exporter.stats()
+
+    def _handle_packet(self, data: bytes):
+
+        if self.recorder is not None:
+            self.recorder.write(data)
+
+        subscription = self.subscription
+        if not subscription.packet_types[data[0]]:
+            return None
+
+        cur = Cursor(data)
+        packet_type = cur.read_u8()
+
+        if packet_type == 1:
+            self.registration.update(cur)
+
+            info = self._udp_data["connection"]
+            info["id"] = self.registration.connection_id
+            info["connected"] = True
+            self._connection_changed()
+
+            # Always asked on registration, and it counts as the one in
+            # flight for the cars that show up before the answer
+            self.request_track_data()
+            self.request_entry_list()
+            self._entry_list_deadline = time.monotonic() + self.ENTRY_LIST_TIMEOUT
+
+            return self.registration
+
+        elif packet_type == 2:
+            self.session.update(cur, subscription.cameras, subscription.hud)
+            self.update_leaderboard_session()
+            self.update_standings()
+
+            if self.exporter is not None:
+                self.exporter.add_session(self.session)
+
+            # Events are copies, handlers read them while the next
+            # packets update the originals
+            if "session_update" in self._event_kinds:
+                self._emit("session_update", copy.copy(self.session))
+
+            return self.session
+
+        elif packet_type == 3:
+            car_update = RealTimeCarUpdate(cur, subscription.world_position)
+            self.is_new_entry(car_update)
+            lap_completed = self.detect_lap(car_update)
+            self.detect_race_events(car_update, lap_completed)
+
+            if self.telemetry is not None:
+                self.telemetry.append(car_update, time.monotonic())
+
+            exporter = self.exporter
+            if exporter is not None:
+                exporter.add_car(car_update)
+                if lap_completed:
+                    exporter.add_lap(car_update.last_lap, car_update.lap)
+
+            if "car_update" in self._event_kinds:
+                self._emit("car_update", car_update)
+
+            return car_update
+
+        elif packet_type == 4:
+            self.entry_list.update(cur)
+            self._entry_list_deadline = time.monotonic() + self.ENTRY_LIST_SETTLE
+
+            if self.cache is not None:
+                self.apply_cached_cars()
+
+            self.add_to_leaderboard()
+
+            if "entry_list" in self._event_kinds:
+                self._emit("entry_list", copy.copy(self.entry_list))
+
+            return self.entry_list
+
+        elif packet_type == 5:
+            self.track.update(cur, subscription.cameras, subscription.hud)
+
+            if self.cache is not None:
+                self.cache.set_track(data, self.track.track_name)
+
+            if "track_data" in self._event_kinds:
+                self._emit("track_data", copy.copy(self.track))
+
+            return self.track
+
+        elif packet_type == 6:
+            car_info = self.entry_list.update_car(cur)
+
+            if car_info is not None and self.cache is not None:
+                self.cache.set_car(data)
+
+            if car_info is not None and "entry_list" in self._event_kinds:
+                self._emit("entry_list", copy.copy(car_info))
+
+            return car_info
+
+        elif packet_type == 7:
+            event = BroadcastingEvent(cur)
+            self.events.append(event)
+            self._event_logged(event)
+
+            if "broadcast_event" in self._event_kinds:
+                self._emit("broadcast_event", event)
+
+            return event
+
+        return None
+
+    def subscribe(self, kind: str, callback, max_queue: int = 256,
+                  policy: str = "drop_oldest", block_timeout: float = 0.1):
+
+        # policy "drop_oldest" discards the oldest queued event when the
+        # handler's queue is full, "block" waits up to block_timeout for
+        # room and then drops the new one
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event {kind}")
+
+        if self.dispatcher is None:
+            self.dispatcher = self._new_dispatcher()
+
+        handler = self.dispatcher.subscribe(kind, callback, max_queue, policy,
+                                            block_timeout)
+        self._event_kinds = frozenset(self.dispatcher.kinds())
+
+        return handler
+
+    def unsubscribe(self, handler) -> None:
+
+        self.dispatcher.unsubscribe(handler)
+        self._event_kinds = frozenset(self.dispatcher.kinds())
+
+    def on_car_update(self, callback, **options):
+        return self.subscribe("car_update", callback, **options)
+
+    def on_session_update(self, callback, **options):
+        return self.subscribe("session_update", callback, **options)
+
+    def on_entry_list(self, callback, **options):
+        return self.subscribe("entry_list", callback, **options)
+
+    def on_track_data(self, callback, **options):
+        return self.subscribe("track_data", callback, **options)
+
+    def on_broadcast_event(self, callback, **options):
+        return self.subscribe("broadcast_event", callback, **options)
+
+    def on_lap_completed(self, callback, **options):
+        return self.subscribe("lap_completed", callback, **options)
+
+    def on_race_event(self, callback, **options):
+        return self.subscribe("race_event", callback, **options)
+
+    def _new_dispatcher(self) -> EventDispatcher:
+        return EventDispatcher()
+
+    def handler_stats(self) -> list:
+        return self.dispatcher.stats() if self.dispatcher else []
+
+    def _emit(self, kind: str, payload) -> None:
+        self.dispatcher.emit(kind, payload)
+
+    def is_new_entry(self, car_update):
+
+        car_info = self.entry_list.get(car_update.car_index)
+
+        if car_info is None:
+            self.request_entry_list_throttled()
+
+        else:
+            self.update_leaderboard(car_update, car_info)
+
+    def request_entry_list_throttled(self) -> None:
+
+        now = time.monotonic()
+        if now >= self._entry_list_deadline:
+            self.request_entry_list()
+            self._entry_list_deadline = now + self.ENTRY_LIST_TIMEOUT
+
+            if self.metrics is not None:
+                self.metrics.entry_list_requests += 1
+
+    def apply_cached_cars(self) -> None:
+
+        # Cached car infos until ACC sends the real ones, ACC can only be
+        # asked for the whole entry list, not for single cars
+        for car_info in self.entry_list.entry_list:
+
+            packet = self.cache.car(car_info.car_index)
+            if packet is not None and not car_info.drivers:
+                cur = Cursor(packet)
+                cur.read_u8()
+                self.entry_list.update_car(cur)
+
+    def save_cache(self) -> None:
+        if self.cache is not None:
+            self.cache.save()
+
+    def detect_lap(self, car_update: RealTimeCarUpdate) -> bool:
+
+        previous = self._car_laps.get(car_update.car_index)
+        self._car_laps[car_update.car_index] = car_update.lap
+
+        if previous is None or car_update.lap <= previous:
+            return False
+
+        car_info = self.entry_list.get(car_update.car_index)
+        cup_category = car_info._cup_category if car_info else 0
+
+        row = self.laps.add(car_update.car_index, car_update.lap,
+                            car_update.last_lap, cup_category,
+                            self.session.session_index)
+
+        if "lap_completed" in self._event_kinds:
+            self._emit("lap_completed", self.laps.lap(row))
+
+        return True
+
+    def detect_race_events(self, car_update: RealTimeCarUpdate,
+                           lap_completed: bool) -> None:
+
+        events = self.race_detector.update(
+            car_update, self.session.session_time_ms,
+            self.session.session_index, lap_completed)
+
+        for event in events:
+            self.race_events.append(event)
+
+            if "race_event" in self._event_kinds:
+                self._emit("race_event", event)
+
+    def race_events_since(self, seq: int = 0, car_index: int = None) -> list:
+        return self.race_events.since(seq, car_index)
+
+    def add_to_leaderboard(self) -> None:
+
+        version = self._next_version()
+        entries = self._udp_data["entries"]
+
+        for car_index in entries:
+            if car_index not in self.entry_list.entries:
+                self._removed[car_index] = version
+
+        entries.clear()
+
+        for entry in self.entry_list.entry_list:
+            entries.update({entry.car_index: {"version": version}})
+            self._removed.pop(entry.car_index, None)
+
+        if self.standings is not None:
+            self.standings.retain(self.entry_list.entries)
+
+        self.race_detector.retain(self.entry_list.entries)
+
+        self._entries_changed()
+
+    def update_leaderboard(self, data: RealTimeCarUpdate,
+                           car_info: CarInfo = None) -> None:
+
+        if car_info is None:
+            car_info = self.entry_list.get(data.car_index)
+
+            if car_info is None:
+                # Not in the entry list yet, there's no entry to update
+                return
+
+        if self.standings is not None:
+            self.standings.update(data, car_info._cup_category)
+            (gap_to_leader, interval, class_gap,
+             laps_down) = self.standings.get(data.car_index)
+
+        else:
+            gap_to_leader, interval, class_gap, laps_down = 0.0, 0.0, 0.0, 0
+
+        if len(car_info.drivers) > 0:
+            drivers = car_info.drivers
+
+            race_number = car_info.race_number
+            cup_category = car_info.cup_category
+            model_type = car_info.model_type
+            team_name = car_info.team_name
+
+            # A cached car info can be from before a driver joined, the
+            # fresh one from ACC fixes the names
+            if data.driver_index < len(drivers):
+                first_name = drivers[data.driver_index].first_name
+                last_name = drivers[data.driver_index].last_name
+            else:
+                first_name = "First Name"
+                last_name = "Last Name"
+
+        else:
+            race_number = -1
+            cup_category = CupCategory.National
+            model_type = -1
+            team_name = "Team Name"
+            first_name = "First Name"
+            last_name = "Last Name"
+
+        self._udp_data["entries"][data.car_index].update({
+            "position": data.position,
+            "car_number": race_number,
+            "car_id": data.car_index,
+            "cup_category": cup_category.name,
+            "cup_position": data.cup_position,
+            "manufacturer": model_type,
+            "team": team_name,
+            "driver": {
+                "first_name": first_name,
+                "last_name": last_name,
+            },
+            "lap": data.lap,
+            "current_lap": data.current_lap.lap_time_ms,
+            "last_lap": data.last_lap.lap_time_ms,
+            "best_session_lap": data.best_session_lap.lap_time_ms,
+            "sectors": data.last_lap.splits,
+            "car_location": data.car_location.name,
+            "world_pos_x": data.world_pos_x,
+            "world_pos_y": data.world_pos_y,
+            "gap_to_leader": gap_to_leader,
+            "interval": interval,
+            "class_gap": class_gap,
+            "laps_down": laps_down,
+            "version": self._next_version()
+        })
+
+        self._entry_changed(data.car_index)
+
+    def update_leaderboard_session(self) -> None:
+
+        session = self._udp_data["session"]
+        session.clear()
+
+        session["track"] = self.track.track_name
+        session["session_type"] = self.session.session_type.name
+        session["session_time"] = self.session.session_time
+        session["session_end_time"] = self.session.session_end_time
+        session["air_temp"] = self.session.ambient_temp
+        session["track_temp"] = self.session.track_temp
+        session["version"] = self._next_version()
+
+        self._session_changed()
+
+    def events_since(self, seq: int = 0, car_index: int = None) -> list:
+        return self.events.since(seq, car_index)
+
+    def changes_since(self, version: int) -> dict:
+
+        session = self._udp_data["session"]
+        entries = self._udp_data["entries"]
+
+        return {
+            "version": self._version,
+            "full": False,
+            "connection": dict(self._udp_data["connection"]),
+            "session": deepcopy(session) if session["version"] > version else None,
+            "entries": {
+                car_index: deepcopy(entry)
+                for car_index, entry in entries.items()
+                if entry["version"] > version
+            },
+            "removed": [
+                car_index for car_index, removed in self._removed.items()
+                if removed > version
+            ],
+        }
+
+    def update_standings(self) -> None:
+
+        # Once per realtime update, with every car's latest position
+        if self.standings is None:
+            return
+
+        entries = self._udp_data["entries"]
+        results = self.standings.compute(self.track.track_meters)
+
+        for car_index, (gap_to_leader, interval, class_gap,
+                        laps_down) in results.items():
+
+            entry = entries.get(car_index)
+            if entry is None or "position" not in entry:
+                continue
+
+            # Gaps only move when positions do, most ticks change nothing
+            # and shouldn't show up in changes_since()
+            if ("gap_to_leader" in entry
+                    and entry["gap_to_leader"] == gap_to_leader
+                    and entry["interval"] == interval
+                    and entry["class_gap"] == class_gap
+                    and entry["laps_down"] == laps_down):
+                continue
+
+            entry["gap_to_leader"] = gap_to_leader
+            entry["interval"] = interval
+            entry["class_gap"] = class_gap
+            entry["laps_down"] = laps_down
+            entry["version"] = self._next_version()
+
+            self._entry_changed(car_index)
+
+    def connect(self) -> None:
+
+        msg = ByteWriter()
+        msg.write_u8(REGISTER_COMMAND_APPLICATION)
+        msg.write_u8(4)
+        msg.write_str(self._name)
+        msg.write_str(self._psw)
+        msg.write_i32(self._speed)
+        msg.write_str(self._cmd_psw)
+
+        print(msg.get_bytes())
+
+        self._send(msg.get_bytes())
+        self.connected = True
+
+        if self.metrics is not None:
+            self.metrics.connect_attempts += 1
+
+    def disconnect(self) -> None:
+
+        self._send(_COMMAND_CONNECTION.pack(
+            UNREGISTER_COMMAND_APPLICATION, self.connection_id))
+
+    def request_entry_list(self) -> None:
+
+        c_id = self.connection_id
+
+        if c_id != -1:
+            self._send(_COMMAND_CONNECTION.pack(REQUEST_ENTRY_LIST, c_id))
+
+    def request_track_data(self) -> None:
+
+        self._send(_COMMAND_CONNECTION.pack(REQUEST_TRACK_DATA,
+                                            self.connection_id))
+
+    # Broadcast control, queued in self.commands and sent on the next tick
+
+    def change_hud_page(self, hud_page: str) -> bool:
+        return self.commands.submit("hud_page", self._build_hud_page,
+                                    (hud_page,))
+
+    def change_focus(self, car_index: int = None, camera_set: str = None,
+                     camera: str = None) -> bool:
+
+        if (camera_set is None) != (camera is None):
+            raise ValueError("camera_set and camera go together")
+
+        return self.commands.submit("focus", self._build_focus,
+                                    (car_index, camera_set, camera),
+                                    _merge_focus)
+
+    def set_camera(self, camera_set: str, camera: str) -> bool:
+        return self.change_focus(None, camera_set, camera)
+
+    def request_instant_replay(self, start_session_time_ms: float,
+                               duration_ms: float, car_index: int = -1,
+                               camera_set: str = "",
+                               camera: str = "") -> bool:
+
+        # Every replay request counts, they are never coalesced
+        return self.commands.submit(
+            None, self._build_instant_replay,
+            (start_session_time_ms, duration_ms, car_index, camera_set,
+             camera))
+
+    def _build_hud_page(self, hud_page: str) -> bytes:
+
+        msg = self._writer
+        msg.clear()
+        msg.write_u8(CHANGE_HUD_PAGE)
+        msg.write_i32(self.connection_id)
+        msg.write_str(hud_page)
+
+        return msg.get_bytes()
+
+    def _build_focus(self, car_index: int, camera_set: str,
+                     camera: str) -> bytes:
+
+        msg = self._writer
+        msg.clear()
+        msg.write_u8(CHANGE_FOCUS)
+        msg.write_i32(self.connection_id)
+
+        if car_index is None:
+            msg.write_u8(0)
+        else:
+            msg.write_u8(1)
+            msg.write_u16(car_index)
+
+        if camera_set is None:
+            msg.write_u8(0)
+        else:
+            msg.write_u8(1)
+            msg.write_str(camera_set)
+            msg.write_str(camera)
+
+        return msg.get_bytes()
+
+    def _build_instant_replay(self, start_session_time_ms: float,
+                              duration_ms: float, car_index: int,
+                              camera_set: str, camera: str) -> bytes:
+
+        msg = self._writer
+        msg.clear()
+        msg.bytes_array += _INSTANT_REPLAY.pack(
+            INSTANT_REPLAY_REQUEST, self.connection_id,
+            start_session_time_ms, duration_ms, car_index)
+        msg.write_str(camera_set)
+        msg.write_str(camera)
+
+        return msg.get_bytes()
+
+
+class _RemoteAttribute:
+
+    # aui.remote.laps.top_laps(10) runs laps.top_laps(10) in the listener
+    # process and brings the result back through the pipe
+
+    def __init__(self, interface, path: str):
+        self._interface = interface
+        self._path = path
+
+    def __getattr__(self, name: str):
+        return _RemoteAttribute(self._interface, f"{self._path}.{name}")
+
+    def __call__(self, *args, **kwargs):
+        return self._interface.call(self._path, *args, **kwargs)
+
+
+class _Remote:
+
+    def __init__(self, interface):
+        self._interface = interface
+
+    def __getattr__(self, name: str):
+        return _RemoteAttribute(self._interface, name)
+
+
+def _udp_socket(local_port: int, rcvbuf: int = None) -> socket.socket:
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if rcvbuf is not None:
+        # Linux doubles it and caps it at net.core.rmem_max, ask the socket
+        # for what it really got
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.bind(("", local_port))
+
+    return sock
+
+
+def udp_socket_stats(sock: socket.socket) -> dict:
+
+    # Receive buffer size plus what the kernel holds for this socket and how
+    # many datagrams it dropped because the buffer was full. The last two
+    # come from /proc/net/udp and are None where that doesn't exist.
+    stats = {
+        "rcvbuf": sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF),
+        "backlog_bytes": None,
+        "kernel_drops": None,
+    }
+
+    inode = str(os.fstat(sock.fileno()).st_ino)
+    for path in ("/proc/net/udp", "/proc/net/udp6"):
+        try:
+            with open(path) as file:
+                lines = file.readlines()[1:]
+        except OSError:
+            continue
+
+        for line in lines:
+            fields = line.split()
+            if len(fields) > 12 and fields[9] == inode:
+                stats["backlog_bytes"] = int(fields[4].split(":")[1], 16)
+                stats["kernel_drops"] = int(fields[12])
+                return stats
+
+    return stats
+
+
+class DatagramReceiver:
+
+    # Drains every datagram the kernel holds on each wakeup into a pool of
+    # preallocated buffers, nothing is allocated per packet except the
+    # memoryview handed out. A view is only valid until the next drain,
+    # decoded objects copy what they keep.
+
+    __slots__ = ("_socket", "_views", "_sizes", "packets", "batches",
+                 "full_batches", "max_batch")
+
+    def __init__(self, sock: socket.socket, pool_size: int = 64,
+                 buffer_size: int = 2048):
+
+        # Non blocking once, readiness comes from a selector
+        sock.setblocking(False)
+        self._socket = sock
+
+        self._views = [memoryview(bytearray(buffer_size))
+                       for _ in range(pool_size)]
+        self._sizes = [0] * pool_size
+
+        self.packets = 0
+        self.batches = 0
+        self.full_batches = 0  # The pool filled up, more was waiting
+        self.max_batch = 0
+
+    def __getstate__(self):
+
+        # Spawned listeners get a fresh pool of the same size
+        return (self._socket, len(self._views), len(self._views[0]),
+                self.packets, self.batches, self.full_batches, self.max_batch)
+
+    def __setstate__(self, state):
+
+        (sock, pool_size, buffer_size, self.packets, self.batches,
+         self.full_batches, self.max_batch) = state
+
+        self._socket = sock
+        self._views = [memoryview(bytearray(buffer_size))
+                       for _ in range(pool_size)]
+        self._sizes = [0] * pool_size
+
+    def drain(self, handle) -> int:
+
+        recv_into = self._socket.recv_into
+        views = self._views
+        sizes = self._sizes
+        pool_size = len(views)
+
+        total = 0
+        while True:
+
+            count = 0
+            error = None
+            try:
+                while count < pool_size:
+                    sizes[count] = recv_into(views[count])
+                    count += 1
+
+            except BlockingIOError:
+                pass
+
+            except OSError as exc:
+                # Hand out what already arrived before reporting it
+                error = exc
+
+            for index in range(count):
+                # Empty datagrams are legal UDP and carry nothing
+                if sizes[index]:
+                    handle(views[index][:sizes[index]])
+
+            if count:
+                total += count
+                self.packets += count
+                self.batches += 1
+                self.max_batch = max(self.max_batch, count)
+
+            if error is not None:
+                raise error
+
+            if count < pool_size:
+                return total
+
+            self.full_batches += 1
+
+    def stats(self) -> dict:
+
+        return {
+            "packets": self.packets,
+            "batches": self.batches,
+            "full_batches": self.full_batches,
+            "max_batch": self.max_batch,
+            "pool_size": len(self._views),
+        }
+
+
+class _UdpListenerState(AccUdpState):
+
+    # State fed by a socket of its own, drained in batches whenever a
+    # selector says it's readable
+
+    def __init__(self, ip, port, instance_info, local_port: int = 3400,
+                 record_path: str = None, subscription: Subscription = None,
+                 metrics: bool = False, cache_dir: str = None,
+                 rcvbuf: int = None, exporter: ColumnarExporter = None):
+
+        super().__init__(ip, port, instance_info, record_path, subscription,
+                         metrics, cache_dir, exporter)
+
+        self._socket = _udp_socket(local_port, rcvbuf)
+        self._receiver = DatagramReceiver(self._socket)
+
+        self._last_packet = time.monotonic()
+        self._last_connection = time.monotonic()
+
+    @property
+    def local_port(self) -> int:
+        return self._socket.getsockname()[1]
+
+    def _send(self, data: bytes) -> None:
+        self._socket.sendto(data, (self._ip, self._port))
+
+    def receive(self) -> int:
+
+        # handle_packet drops a datagram that fails to decode, the rest of
+        # the batch is still handled
+        try:
+            count = self._receiver.drain(self.handle_packet)
+
+        except OSError:
+            # ICMP port unreachable while the server is down
+            self.connection_lost()
+            return 0
+
+        if count:
+            self._last_packet = time.monotonic()
+
+        return count
+
+    def check_connection(self, now: float) -> None:
+
+        # 1s without data is a lost connection and we ask again every 2s
+        # until it's back
+        if self.connected and now - self._last_packet > 1.0:
+            if self.metrics is not None:
+                self.metrics.socket_timeouts += 1
+            self.connection_lost()
+
+        elif not self.connected and now - self._last_connection > 2.0:
+            self.connect()
+            self._last_connection = now
+
+    def receive_stats(self) -> dict:
+        return {**self._receiver.stats(), **udp_socket_stats(self._socket)}
+
+    def stats(self) -> dict:
+
+        stats = super().stats()
+        if stats is not None:
+            stats["receive"] = self.receive_stats()
+
+        return stats
+
+
+class _SharedAccUdpState(_UdpListenerState):
+
+    # State decoded by a listener process and published to shared memory,
+    # the socket is bound here so its port is known before the fork.
+    # Events are decoded there too and cross to the handlers in this
+    # process through a queue.
+
+    # The listener drops (and counts) a new event when it's full rather
+    # than wait
+    EVENT_QUEUE_SIZE = 4096
+
+    def __init__(self, ip, port, instance_info, local_port: int = 3400,
+                 record_path: str = None, subscription: Subscription = None,
+                 metrics: bool = False, cache_dir: str = None,
+                 rcvbuf: int = None, exporter: ColumnarExporter = None):
+
+        super().__init__(ip, port, instance_info, local_port, record_path,
+                         subscription, metrics, cache_dir, rcvbuf, exporter)
+
+        self._shared = SharedState()
+        self._shared.write_session(
+            self._udp_data["connection"], self._udp_data["session"])
+
+        self._event_queue = Queue(self.EVENT_QUEUE_SIZE)
+        self._events_dropped = 0
+        self._forwarder = None
+
+    def __getstate__(self):
+
+        # Threads can't cross processes, the listener only needs the kinds
+        state = self.__dict__.copy()
+        state["dispatcher"] = None
+        state["_forwarder"] = None
+        return state
+
+    def _listener_alive(self) -> bool:
+        raise NotImplementedError
+
+    def subscribe(self, kind: str, callback, **options):
+
+        handler = super().subscribe(kind, callback, **options)
+        self._sync_event_kinds()
+
+        return handler
+
+    def unsubscribe(self, handler) -> None:
+
+        super().unsubscribe(handler)
+        self._sync_event_kinds()
+
+    def _sync_event_kinds(self) -> None:
+
+        # Before the start the listener gets them with the rest of the state
+        if self._listener_alive():
+            self._start_forwarder()
+            self._in_listener("_set_event_kinds", self._event_kinds)
+
+    def _set_event_kinds(self, kinds: frozenset) -> None:
+        self._event_kinds = kinds
+
+    def _new_dispatcher(self) -> EventDispatcher:
+        # One forwarder feeds every handler, a "block" handler must only
+        # hold back its own feed
+        return EventDispatcher(dedicated=True)
+
+    def _emit(self, kind: str, payload) -> None:
+
+        try:
+            self._event_queue.put_nowait((kind, payload))
+
+        except queue.Full:
+            self._events_dropped += 1
+
+    def _count_events_dropped(self) -> int:
+        return self._events_dropped
+
+    def events_dropped(self) -> int:
+        # Events the listener couldn't queue for this process, the drops of
+        # each handler are in handler_stats()
+        return self._in_listener("_count_events_dropped")
+
+    def _start_forwarder(self) -> None:
+
+        if self._forwarder is None and self.dispatcher is not None:
+            self._forwarder = threading.Thread(target=self._forward_events,
+                                               daemon=True)
+            self._forwarder.start()
+
+    def _forward_events(self) -> None:
+
+        while True:
+            event = self._event_queue.get()
+            if event is None:
+                return
+
+            self.dispatcher.emit(*event)
+
+    def _stop_events(self) -> None:
+
+        if self._forwarder is not None:
+            self._event_queue.put(None)
+            self._forwarder.join()
+            self._forwarder = None
+
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+
+    def _answer_call(self, child_pipe: Connection, path: str, args: tuple,
+                     kwargs: dict) -> None:
+
+        try:
+            target = self
+            for name in path.split("."):
+                target = getattr(target, name)
+
+            child_pipe.send(("OK", target(*args, **kwargs)))
+
+        except Exception as error:
+            child_pipe.send(("ERROR", error))
+
+    @property
+    def connection_id(self) -> int:
+        # Commands are sent straight from whichever process asks
+        return self._shared.connection_id()
+
+    @property
+    def udp_data(self):
+
+        metrics = self.metrics
+        if metrics is None:
+            return self._shared.read()
+
+        start = time.perf_counter_ns()
+        data = self._shared.read()
+        metrics.snapshot.observe(time.perf_counter_ns() - start)
+        return data
+
+    def changes_since(self, version: int) -> dict:
+        return self._shared.changes_since(version)
+
+    def events_since(self, seq: int = 0, car_index: int = None) -> list:
+        return self._shared.events_since(seq, car_index)
+
+    def _event_logged(self, event: BroadcastingEvent) -> None:
+        self._shared.write_event(event)
+
+    def stats(self) -> dict:
+
+        # Packet counters live in the listener process, snapshot reads
+        # happen here
+        if self.metrics is None:
+            return None
+
+        stats = self._in_listener("metrics.stats")
+        stats["snapshot"] = self.metrics.snapshot.stats()
+        stats["receive"] = self.receive_stats()
+        return stats
+
+    def receive_stats(self) -> dict:
+        return {**self._in_listener("_receiver.stats"),
+                **udp_socket_stats(self._socket)}
+
+    def race_events_since(self, seq: int = 0, car_index: int = None) -> list:
+        # The detector runs with the decoding, in the listener
+        return self._in_listener("race_events.since", seq, car_index)
+
+    def exporter_stats(self) -> dict:
+        # The exporter writes in the listener, the copy here never starts
+        if self.exporter is None:
+            return None
+        return self._in_listener("exporter.stats")
+
+    def _in_listener(self, path: str, *args, **kwargs):
+
+        # Runs path where the listener lives, here unless a subclass moves
+        # it to another process
+        target = self
+        for name in path.split("."):
+            target = getattr(target, name)
+
+        return target(*args, **kwargs)
+
+    def _connection_changed(self) -> None:
+        self._shared.write_connection(
+            self._udp_data["connection"], self._version)
+
+    def _session_changed(self) -> None:
+        self._shared.write_session(
+            self._udp_data["connection"], self._udp_data["session"])
+
+    def _entries_changed(self) -> None:
+        self._shared.write_entries(
+            self._udp_data["connection"], self._udp_data["entries"],
+            self._version)
+
+    def _entry_changed(self, car_index: int) -> None:
+        self._shared.write_entry(
+            self._udp_data["connection"], car_index,
+            self._udp_data["entries"][car_index])
+
+
+class _Control:
+
+    # Pipe to a listener process plus a socket pair that wakes up its
+    # selector when something was sent, on Windows selectors only take
+    # sockets
+
+    def __init__(self):
+
+        self.child_pipe, self.parent_pipe = Pipe()
+        self.wakeup, self._wakeup_sender = socket.socketpair()
+        self.wakeup.setblocking(False)
+        self._wakeup_sender.setblocking(False)
+
+    def send(self, message) -> None:
+
+        self.parent_pipe.send(message)
+        try:
+            self._wakeup_sender.send(b"\0")
+        except BlockingIOError:
+            pass  # Plenty of wakeups pending already
+
+    def call(self, message):
+        self.send(message)
+        return self.parent_pipe.recv()
+
+    def received(self) -> list:
+
+        # Listener side, the wakeup bytes only say that the pipe has
+        # something, they're sent after the message
+        try:
+            while self.wakeup.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        messages = []
+        while self.child_pipe.poll():
+            messages.append(self.child_pipe.recv())
+
+        return messages
+
+    def close(self) -> None:
+        self.wakeup.close()
+        self._wakeup_sender.close()
+
+
+def _stop_process(process: Process, control: _Control):
+
+    # A listener that already died never answers, don't wait for it
+    if not process.is_alive():
+        return None
+
+    control.send("STOP_PROCESS")
+
+    print("[pyUIL]: Waiting for process to finish...")
+    while process.is_alive() or control.parent_pipe.poll():
+        if control.parent_pipe.poll(0.5):
+            return control.parent_pipe.recv()
+
+    return None
+
+
+class accUpdInterface(_SharedAccUdpState):
+
+    def __init__(self, ip, port, instance_info, record_path: str = None,
+                 telemetry_capacity: int = None,
+                 subscription: Subscription = None, local_port: int = 3400,
+                 metrics: bool = False, cache_dir: str = None,
+                 rcvbuf: int = None, exporter: ColumnarExporter = None):
+
+        super().__init__(ip, port, instance_info, local_port, record_path,
+                         subscription, metrics, cache_dir, rcvbuf, exporter)
+
+        if telemetry_capacity is not None:
+            self.telemetry = TelemetryBuffer(telemetry_capacity, shared=True)
+
+        self._control = _Control()
+        self.child_pipe = self._control.child_pipe
+        self.parent_pipe = self._control.parent_pipe
+        self._pipe_lock = threading.Lock()
+        self.udp_interface_listener = Process(
+            target=self.listen_udp_interface, args=(self._control,))
+
+    def __getstate__(self):
+
+        # Locks and threads can't cross processes, the listener doesn't
+        # need them anyway
+        state = super().__getstate__()
+        state["_pipe_lock"] = None
+        state["udp_interface_listener"] = None
+        return state
+
+    def _listener_alive(self) -> bool:
+        return self.udp_interface_listener.is_alive()
+
+    @property
+    def remote(self) -> _Remote:
+        return _Remote(self)
+
+    def _in_listener(self, path: str, *args, **kwargs):
+        return self.call(path, *args, **kwargs)
+
+    def call(self, path: str, *args, **kwargs):
+
+        with self._pipe_lock:
+            status, result = self._control.call(("CALL", path, args, kwargs))
+
+        if status == "ERROR":
+            raise result
+
+        return result
+
+    def listen_udp_interface(self, control: _Control):
+
+        self._open_outputs()
+        self.connect()
+
+        # One wakeup for whatever is ready, the socket is drained in full
+        # and the pipe is only looked at when something was sent on it
+        selector = selectors.DefaultSelector()
+        selector.register(control.wakeup, selectors.EVENT_READ, None)
+        selector.register(self._socket, selectors.EVENT_READ, self)
+
+        running = True
+        while running:
+
+            for key, _ in selector.select(timeout=0.5):
+
+                if key.data is not None:
+                    self.receive()
+                    continue
+
+                for message in control.received():
+                    if message == "STOP_PROCESS":
+                        running = False
+
+                    elif isinstance(message, tuple) and message[0] == "CALL":
+                        self._answer_call(control.child_pipe, *message[1:])
+
+            self.check_connection(time.monotonic())
+
+        selector.close()
+        self.disconnect()
+        self._socket.close()
+        self._close_outputs()
+        self.save_cache()
+        control.child_pipe.send("PROCESS_TERMINATED")
+        print("[ASM_Reader]: Process Terminated.")
+
+    def start(self):
+
+        print("[pyUIL] Listening to the UDP interface...")
+        self.udp_interface_listener.start()
+        self._start_forwarder()
+
+    def stop(self):
+
+        print("[pyUIL]: Sending stopping command to process...")
+        with self._pipe_lock:
+            message = _stop_process(self.udp_interface_listener,
+                                    self._control)
+
+        if (message != "PROCESS_TERMINATED"):
+            print(
+                "[pyUIL]: Received unexpected message, program might be deadlock now.")
+
+        self.udp_interface_listener.join()
+        self._socket.close()
+        self._control.close()
+        self._shared.close()
+        self._stop_events()
+
+        if self.telemetry is not None:
+            self.telemetry.close()
+
+
+class ThreadedAccUdpInterface(_UdpListenerState):
+
+    # Same listener in a thread of this process, nothing is pickled and
+    # reads don't cross a process boundary. The receive thread publishes
+    # a new udp_data dict after every change by swapping the attribute,
+    # so a reader keeps a consistent snapshot for as long as it holds it.
+    # Treat it as read only, it's shared with every other reader.
+    # Everything else (laps, telemetry, ...) belongs to the receive thread,
+    # hold lock while reading it.
+
+    def __init__(self, ip, port, instance_info, record_path: str = None,
+                 telemetry_capacity: int = None,
+                 subscription: Subscription = None, local_port: int = 3400,
+                 metrics: bool = False, cache_dir: str = None,
+                 rcvbuf: int = None, exporter: ColumnarExporter = None):
+
+        super().__init__(ip, port, instance_info, local_port, record_path,
+                         subscription, metrics, cache_dir, rcvbuf, exporter)
+
+        if telemetry_capacity is not None:
+            self.telemetry = TelemetryBuffer(telemetry_capacity)
+
+        self.lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+        self._changed_connection = False
+        self._changed_session = False
+        self._changed_all = False
+        self._changed_cars = set()
+
+        self._published_version = 0
+        self.udp_data = {
+            "connection": dict(self._udp_data["connection"]),
+            "entries": {},
+            "session": dict(self._udp_data["session"]),
+        }
+
+    def _publish(self, connection: dict, entries: dict, session: dict) -> None:
+
+        # Data first and version second, readers look at the version first
+        # so at worst they get a change twice, never miss one
+        self.udp_data = {
+            "connection": connection,
+            "entries": entries,
+            "session": session,
+        }
+        self._published_version = self._version
+
+    # The hooks only note what changed, _publish_changes() builds one
+    # snapshot per packet instead of one per car
+
+    def _connection_changed(self) -> None:
+        self._changed_connection = True
+
+    def _session_changed(self) -> None:
+        self._changed_session = True
+
+    def _entries_changed(self) -> None:
+        self._changed_all = True
+
+    def _entry_changed(self, car_index: int) -> None:
+        self._changed_cars.add(car_index)
+
+    def _publish_changes(self) -> None:
+
+        if not (self._changed_connection or self._changed_session
+                or self._changed_all or self._changed_cars):
+            return
+
+        data = self.udp_data
+        source = self._udp_data
+
+        connection = data["connection"]
+        if self._changed_connection:
+            connection = dict(source["connection"])
+
+        session = data["session"]
+        if self._changed_session:
+            session = dict(source["session"])
+
+        # Nested values (driver, sectors) are new objects on every update,
+        # a shallow copy of the entry is enough
+        entries = data["entries"]
+        if self._changed_all:
+            entries = {car_index: dict(entry)
+                       for car_index, entry in source["entries"].items()}
+        elif self._changed_cars:
+            entries = entries.copy()
+            for car_index in self._changed_cars:
+                entry = source["entries"].get(car_index)
+                if entry is not None:
+                    entries[car_index] = dict(entry)
+
+        self._changed_connection = False
+        self._changed_session = False
+        self._changed_all = False
+        self._changed_cars.clear()
+
+        self._publish(connection, entries, session)
+
+    def handle_packet(self, data: bytes):
+        result = super().handle_packet(data)
+        self._publish_changes()
+        return result
+
+    def check_connection(self, now: float) -> None:
+        super().check_connection(now)
+        self._publish_changes()
+
+    def changes_since(self, version: int) -> dict:
+
+        current = self._published_version
+        data = self.udp_data
+        removed = self._removed.copy()
+
+        session = data["session"]
+        return {
+            "version": current,
+            "full": False,
+            "connection": data["connection"],
+            "session": session if session["version"] > version else None,
+            "entries": {car_index: entry
+                        for car_index, entry in data["entries"].items()
+                        if entry["version"] > version},
+            "removed": [car_index for car_index, removed_at in removed.items()
+                        if removed_at > version],
+        }
+
+    def events_since(self, seq: int = 0, car_index: int = None) -> list:
+        with self.lock:
+            return self.events.since(seq, car_index)
+
+    def race_events_since(self, seq: int = 0, car_index: int = None) -> list:
+        with self.lock:
+            return self.race_events.since(seq, car_index)
+
+    def receive_stats(self) -> dict:
+        with self.lock:
+            return super().receive_stats()
+
+    def exporter_stats(self) -> dict:
+        with self.lock:
+            return super().exporter_stats()
+
+    def start(self) -> None:
+
+        print("[pyUIL] Listening to the UDP interface in a thread...")
+        self._running = True
+        self._thread = threading.Thread(target=self._receive, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+
+        print("[pyUIL]: Listener stopped.")
+
+    def _receive(self) -> None:
+
+        with self.lock:
+            self._open_outputs()
+            self.connect()
+            self._publish_changes()
+
+        selector = selectors.DefaultSelector()
+        selector.register(self._socket, selectors.EVENT_READ)
+
+        # The lock is held for a whole batch, readers of udp_data never
+        # take it anyway
+        while self._running:
+
+            ready = selector.select(timeout=0.5)
+            with self.lock:
+                if ready:
+                    self.receive()
+                self.check_connection(time.monotonic())
+
+        selector.close()
+        with self.lock:
+            self.disconnect()
+            self._publish_changes()
+        self._socket.close()
+        self._close_outputs()
+        self.save_cache()
+
+
+class _GroupServer(_SharedAccUdpState):
+
+    # One server of an AccServerGroup, received from a shared selector loop
+
+    def __init__(self, server_id, ip, port, instance_info,
+                 local_port: int = 0, record_path: str = None,
+                 subscription: Subscription = None, metrics: bool = False,
+                 cache_dir: str = None, rcvbuf: int = None,
+                 exporter: ColumnarExporter = None):
+
+        super().__init__(ip, port, instance_info, local_port, record_path,
+                         subscription, metrics, cache_dir, rcvbuf, exporter)
+
+        self.server_id = server_id
+
+        # Set by the group, _call runs in the listener process
+        self._call = None
+        self._process = None
+
+    def __getstate__(self):
+
+        # Both go through the group's process, only the parent uses them
+        state = super().__getstate__()
+        state["_call"] = None
+        state["_process"] = None
+        return state
+
+    def _listener_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def _in_listener(self, path: str, *args, **kwargs):
+        return self._call(path, *args, **kwargs)
+
+
+def _serve_group(servers: dict, control: _Control) -> None:
+
+    # Listener process of an AccServerGroup, one selector for every socket
+    # it owns plus the control wakeup
+    selector = selectors.DefaultSelector()
+    selector.register(control.wakeup, selectors.EVENT_READ, None)
+
+    for server in servers.values():
+        server._open_outputs()
+        server.connect()
+        selector.register(server._socket, selectors.EVENT_READ, server)
+
+    running = True
+    while running:
+
+        for key, _ in selector.select(timeout=0.5):
+
+            if key.data is not None:
+                key.data.receive()
+                continue
+
+            for message in control.received():
+                if message == "STOP_PROCESS":
+                    running = False
+
+                elif isinstance(message, tuple) and message[0] == "CALL":
+                    servers[message[1]]._answer_call(control.child_pipe,
+                                                     *message[2:])
+
+        now = time.monotonic()
+        for server in servers.values():
+            server.check_connection(now)
+
+    for server in servers.values():
+        selector.unregister(server._socket)
+        server.disconnect()
+        server._socket.close()
+        server._close_outputs()
+        server.save_cache()
+
+    selector.close()
+    control.child_pipe.send("PROCESS_TERMINATED")
+    print("[ASM_Reader]: Group process terminated.")
+
+
+class AccServerGroup:
+
+    # Listens to many ACC servers at once, each with its own socket and state
+    # keyed by server id. All sockets share one selector loop in one process
+    # unless workers spreads them over a small pool of processes.
+
+    def __init__(self, servers: dict, workers: int = 1):
+
+        self.servers = {}
+        for server_id, config in servers.items():
+            server = _GroupServer(server_id, **config)
+            server._call = functools.partial(self.call, server_id)
+            self.servers[server_id] = server
+
+        workers = max(1, min(workers, len(self.servers)))
+        server_ids = list(self.servers)
+
+        self._workers = []
+        self._worker_of = {}
+        for index in range(workers):
+
+            owned = {server_id: self.servers[server_id]
+                     for server_id in server_ids[index::workers]}
+
+            control = _Control()
+            process = Process(target=_serve_group, args=(owned, control))
+            worker = (process, control, threading.Lock())
+
+            for server in owned.values():
+                server._process = process
+
+            self._workers.append(worker)
+            for server_id in owned:
+                self._worker_of[server_id] = worker
+
+    def __getitem__(self, server_id) -> _GroupServer:
+        return self.servers[server_id]
+
+    def __iter__(self):
+        return iter(self.servers)
+
+    def __len__(self) -> int:
+        return len(self.servers)
+
+    @property
+    def udp_data(self) -> dict:
+        return {server_id: server.udp_data
+                for server_id, server in self.servers.items()}
+
+    def changes_since(self, server_id, version: int) -> dict:
+        return self.servers[server_id].changes_since(version)
+
+    def events_since(self, server_id, seq: int = 0,
+                     car_index: int = None) -> list:
+        return self.servers[server_id].events_since(seq, car_index)
+
+    def stats(self) -> dict:
+
+        # Servers created without metrics are left out
+        return {server_id: server.stats()
+                for server_id, server in self.servers.items()
+                if server.metrics is not None}
+
+    def prometheus(self, prefix: str = "acc_udp") -> str:
+        return prometheus_text(self.stats(), prefix, label="server")
+
+    @property
+    def local_ports(self) -> dict:
+        return {server_id: server.local_port
+                for server_id, server in self.servers.items()}
+
+    def call(self, server_id, path: str, *args, **kwargs):
+
+        _, control, lock = self._worker_of[server_id]
+        with lock:
+            status, result = control.call(
+                ("CALL", server_id, path, args, kwargs))
+
+        if status == "ERROR":
+            raise result
+
+        return result
+
+    def start(self) -> None:
+
+        print(f"[pyUIL] Listening to {len(self.servers)} servers with "
+              f"{len(self._workers)} process(es)...")
+        for process, _, _ in self._workers:
+            process.start()
+
+        for server in self.servers.values():
+            server._start_forwarder()
+
+    def stop(self) -> None:
+
+        for process, control, lock in self._workers:
+            with lock:
+                message = _stop_process(process, control)
+
+            if message != "PROCESS_TERMINATED":
+                print("[pyUIL]: Received unexpected message, program might be deadlock now.")
+
+            process.join()
+            control.close()
+
+        for server in self.servers.values():
+            server._socket.close()
+            server._shared.close()
+            server._stop_events()
+
+
+def _open_socket(address):
+
+    # A path is a unix socket, anything else a (host, port) tcp address
+    if isinstance(address, str):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+
+class _Subscriber:
+
+    __slots__ = ("sock", "pending", "version", "event_seq", "address")
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.pending = bytearray()
+        self.version = None
+        self.event_seq = 0
+        self.address = address
+
+
+class StatePublisher:
+
+    # Serves the state of one listener to many local readers. Every tick the
+    # changes are turned into a single frame that all subscribers share, a
+    # new subscriber first gets a full snapshot. A subscriber that can't keep
+    # up is skipped until its buffer drains and then gets one merged delta,
+    # or is disconnected with slow="disconnect".
+
+    def __init__(self, source, address, interval: float = 0.05,
+                 max_buffer: int = 1 << 20, slow: str = "downsample"):
+
+        if slow not in ("downsample", "disconnect"):
+            raise ValueError(f"Unknown slow subscriber policy: {slow}")
+
+        # Frames are sliced out of the shared memory records, only the
+        # process listeners (and group servers) have them
+        if isinstance(source, SharedState):
+            self._shared = source
+        elif isinstance(source, _SharedAccUdpState):
+            self._shared = source._shared
+        else:
+            raise TypeError(
+                "StatePublisher needs an accUpdInterface, a server of an "
+                f"AccServerGroup or a SharedState, not {type(source).__name__}")
+        self.address = address
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self.slow = slow
+
+        self._server = _open_socket(address)
+        if not isinstance(address, str):
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(address)
+        self._server.listen()
+        self._server.setblocking(False)
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._server, selectors.EVENT_READ, None)
+
+        # Changed by the publisher thread only, the lock is for stats()
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.skipped = 0
+        self.disconnected = 0
+
+        self._running = False
+        self._thread = None
+
+    @property
+    def local_address(self):
+        return self._server.getsockname()
+
+    def start(self) -> None:
+
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        for subscriber in list(self._subscribers.values()):
+            self._drop(subscriber)
+
+        self._selector.close()
+        self._server.close()
+
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def stats(self) -> dict:
+
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+
+        return {
+            "subscribers": len(subscribers),
+            "frames_sent": self.frames_sent,
+            "bytes_sent": self.bytes_sent,
+            "skipped": self.skipped,
+            "disconnected": self.disconnected,
+            "pending_bytes": sum(len(subscriber.pending)
+                                 for subscriber in subscribers),
+        }
+
+    def _serve(self) -> None:
+
+        next_tick = time.monotonic()
+        while self._running:
+
+            timeout = max(0.0, next_tick - time.monotonic())
+            for key, events in self._selector.select(timeout):
+
+                if key.data is None:
+                    self._accept()
+
+                elif events & selectors.EVENT_READ and not self._readable(key.data):
+                    self._drop(key.data)
+
+                elif events & selectors.EVENT_WRITE:
+                    self._flush(key.data)
+
+            if time.monotonic() >= next_tick:
+                self._publish()
+                next_tick = max(next_tick + self.interval, time.monotonic())
+
+    def _accept(self) -> None:
+
+        try:
+            sock, address = self._server.accept()
+
+        except BlockingIOError:
+            return
+
+        sock.setblocking(False)
+        subscriber = _Subscriber(sock, address)
+        with self._lock:
+            self._subscribers[sock.fileno()] = subscriber
+        self._selector.register(sock, selectors.EVENT_READ, subscriber)
+
+    def _readable(self, subscriber: _Subscriber) -> bool:
+
+        # Subscribers never talk, anything readable is them going away
+        try:
+            return len(subscriber.sock.recv(4096)) > 0
+
+        except BlockingIOError:
+            return True
+
+        except OSError:
+            return False
+
+    def _drop(self, subscriber: _Subscriber) -> None:
+
+        with self._lock:
+            self._subscribers.pop(subscriber.sock.fileno(), None)
+        self._selector.unregister(subscriber.sock)
+        subscriber.sock.close()
+
+    def _publish(self) -> None:
+
+        frames = {}
+        event_frames = {}
+        for subscriber in list(self._subscribers.values()):
+
+            if subscriber.pending:
+
+                if self.slow == "downsample":
+                    self.skipped += 1
+                    continue
+
+                if len(subscriber.pending) > self.max_buffer:
+                    self.disconnected += 1
+                    self._drop(subscriber)
+                    continue
+
+            # Subscribers at the same version share the same frame bytes
+            frame = frames.get(subscriber.version)
+            if frame is None:
+                if subscriber.version is None:
+                    frame = self._shared.frame_since(0, full=True)
+                else:
+                    frame = self._shared.frame_since(subscriber.version)
+                frames[subscriber.version] = frame
+
+            version, data = frame
+            if version != subscriber.version:
+                subscriber.pending += data
+                subscriber.version = version
+                self.frames_sent += 1
+
+            # Then the broadcasting events, the whole ring on join
+            frame = event_frames.get(subscriber.event_seq)
+            if frame is None:
+                frame = self._shared.event_frame_since(subscriber.event_seq)
+                event_frames[subscriber.event_seq] = frame
+
+            seq, data = frame
+            if seq != subscriber.event_seq:
+                subscriber.pending += data
+                subscriber.event_seq = seq
+                self.frames_sent += 1
+
+            if subscriber.pending:
+                self._flush(subscriber)
+
+    def _flush(self, subscriber: _Subscriber) -> None:
+
+        if subscriber.sock.fileno() not in self._subscribers:
+            return
+
+        try:
+            sent = subscriber.sock.send(subscriber.pending)
+
+        except BlockingIOError:
+            sent = 0
+
+        except OSError:
+            self._drop(subscriber)
+            return
+
+        del subscriber.pending[:sent]
+        self.bytes_sent += sent
+
+        events = selectors.EVENT_READ
+        if subscriber.pending:
+            events |= selectors.EVENT_WRITE
+
+        self._selector.modify(subscriber.sock, events, subscriber)
+
+
+class StateSubscriber:
+
+    # Reader side of StatePublisher, keeps udp_data up to date from the
+    # snapshot and the deltas that follow it
+
+    def __init__(self, address, timeout: float = None):
+
+        self._socket = _open_socket(address)
+        self._socket.connect(address)
+        self._socket.settimeout(timeout)
+        self._file = self._socket.makefile("rb")
+
+        self.version = 0
+        self.event_seq = 0
+        self.events = collections.deque(maxlen=SharedState.MAX_EVENTS)
+        self.udp_data = {
+            "connection": {
+                "id": -1,
+                "connected": False
+            },
+            "entries": {},
+            "session": None,
+        }
+
+    def receive(self) -> dict:
+
+        # Next frame as a changes_since dict applied to udp_data, or as
+        # {"seq", "events"} added to events
+        prefix = self._file.read(4)
+        if len(prefix) < 4:
+            raise ConnectionError("Publisher closed the connection")
+
+        lenght = _U32.unpack(prefix)[0]
+        changes = SharedState.decode_frame(prefix + self._file.read(lenght))
+
+        if "events" in changes:
+            self.events.extend(changes["events"])
+            self.event_seq = changes["seq"]
+            return changes
+
+        entries = self.udp_data["entries"]
+        if changes["full"]:
+            entries.clear()
+
+        entries.update(changes["entries"])
+        for car_index in changes["removed"]:
+            entries.pop(car_index, None)
+
+        self.udp_data["connection"] = changes["connection"]
+        self.udp_data["session"] = changes["session"]
+        self.version = changes["version"]
+
+        return changes
+
+    def __iter__(self):
+
+        while True:
+            try:
+                yield self.receive()
+
+            except ConnectionError:
+                return
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+
+class _AccDatagramProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, client):
+        self._client = client
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self._client._datagram_received(data)
+
+    def error_received(self, exc: Exception) -> None:
+        self._client.connection_lost()
+
+
+class AsyncAccUdpInterface(AccUdpState):
+
+    def __init__(self, ip, port, instance_info, local_port: int = 3400,
+                 max_pending: int = 1024, record_path: str = None,
+                 telemetry_capacity: int = None,
+                 subscription: Subscription = None, metrics: bool = False,
+                 cache_dir: str = None, rcvbuf: int = None,
+                 exporter: ColumnarExporter = None):
+
+        super().__init__(ip, port, instance_info, record_path, subscription,
+                         metrics, cache_dir, exporter)
+
+        if telemetry_capacity is not None:
+            self.telemetry = TelemetryBuffer(telemetry_capacity)
+
+        self._local_port = local_port
+        self._rcvbuf = rcvbuf
+        self._transport = None
+        self._loop = None
+
+        self._updates = asyncio.Queue(maxsize=max_pending)
+        self._data_event = asyncio.Event()
+        self._last_packet = 0.0
+        self._last_connection = 0.0
+        self._watchdog_handle = None
+
+    @property
+    def udp_data(self):
+
+        metrics = self.metrics
+        if metrics is None:
+            return deepcopy(self._udp_data)
+
+        start = time.perf_counter_ns()
+        data = deepcopy(self._udp_data)
+        metrics.snapshot.observe(time.perf_counter_ns() - start)
+        return data
+
+    async def get_udp_data(self, wait: bool = False):
+
+        if wait:
+            self._data_event.clear()
+            await self._data_event.wait()
+
+        return deepcopy(self._udp_data)
+
+    async def start(self) -> None:
+
+        print("[pyUIL] Listening to the UDP interface...")
+
+        self._open_outputs()
+        self._loop = asyncio.get_running_loop()
+        self._transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: _AccDatagramProtocol(self),
+            sock=_udp_socket(self._local_port, self._rcvbuf))
+
+        self.connect()
+        self._last_packet = self._loop.time()
+        self._last_connection = self._loop.time()
+        self._watchdog_handle = self._loop.call_later(1.0, self._watchdog)
+
+    async def stop(self) -> None:
+
+        if self._watchdog_handle is not None:
+            self._watchdog_handle.cancel()
+
+        if self._transport is not None:
+            self.disconnect()
+            self._transport.close()
+            self._transport = None
+
+        self._close_outputs()
+        self.save_cache()
+
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+
+        print("[pyUIL]: Listener stopped.")
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._updates.get()
+
+    def _send(self, data: bytes) -> None:
+        if self._transport is not None:
+            self._transport.sendto(data, (self._ip, self._port))
+
+    def _datagram_received(self, data: bytes) -> None:
+
+        self._last_packet = self._loop.time()
+
+        update = self.handle_packet(data)
+        if update is None:
+            return
+
+        if self._updates.full():
+            # Slow consumer, newest data is more useful than old one
+            self._updates.get_nowait()
+
+        self._updates.put_nowait(update)
+        self._data_event.set()
+
+    def receive_stats(self) -> dict:
+        # The event loop reads the socket, only the kernel side is known
+        return udp_socket_stats(self._transport.get_extra_info("socket"))
+
+    def stats(self) -> dict:
+
+        stats = super().stats()
+        if stats is not None and self._transport is not None:
+            stats["receive"] = self.receive_stats()
+
+        return stats
+
+    def _schedule_command(self, delay: float, callback) -> None:
+
+        loop = self._loop
+        if loop is None:
+            super()._schedule_command(delay, callback)
+            return
+
+        # change_* may be called from another thread, call_later isn't
+        # thread safe, the flush still runs on the loop either way
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            loop.call_later(delay, callback)
+        else:
+            loop.call_soon_threadsafe(loop.call_later, delay, callback)
+
+    def _watchdog(self) -> None:
+
+        now = self._loop.time()
+        if self.connected and now - self._last_packet > 1.0:
+            if self.metrics is not None:
+                self.metrics.socket_timeouts += 1
+            self.connection_lost()
+
+        # if connection was lost or not established wait 2s before asking again
+        if not self.connected and now - self._last_connection > 2.0:
+            self.connect()
+            self._last_connection = now
 
-        self._socket.sendto(msg.get_bytes(), (self._ip, self._port))
+        self._watchdog_handle = self._loop.call_later(1.0, self._watchdog)
 
 
 if __name__ == "__main__":
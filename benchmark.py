@@ -0,0 +1,471 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from AccServerSimulator import (encode_broadcast_event, encode_car_update,
+                                encode_entry_list, encode_entry_list_car,
+                                encode_lap, encode_realtime_update,
+                                encode_registration, encode_str,
+                                encode_track_data)
+from PyAccUdpInterface import (AccUdpState, ColumnarExporter, Cursor,
+                               DriverInfo, LapInfo, RealTimeCarUpdate,
+                               RealTimeUpdate, TelemetryBuffer,
+                               ThreadedAccUdpInterface, accUpdInterface, np,
+                               pyarrow)
+
+
+INFO = {
+    "name": "benchmark",
+    "password": "",
+    "speed": 100,
+    "cmd_password": ""
+}
+
+
+def make_state(grid_size: int, metrics: bool = False,
+               exporter: ColumnarExporter = None) -> AccUdpState:
+
+    state = AccUdpState("127.0.0.1", 9000, INFO, metrics=metrics,
+                        exporter=exporter)
+
+    car_ids = list(range(grid_size))
+    state.handle_packet(encode_entry_list(car_ids))
+    for car_index in car_ids:
+        state.handle_packet(encode_entry_list_car(car_index))
+
+    return state
+
+
+def make_corpus(grid_size: int) -> dict:
+
+    # One list of packets per inbound packet type, sized like a real grid
+    car_ids = list(range(grid_size))
+
+    return {
+        "registration": [encode_registration(1)],
+        "realtime_update": [encode_realtime_update()],
+        "car_update": [encode_car_update(car_index, car_index + 1)
+                       for car_index in car_ids],
+        "entry_list": [encode_entry_list(car_ids)],
+        "entry_list_car": [encode_entry_list_car(car_index)
+                           for car_index in car_ids],
+        "track_data": [encode_track_data()],
+        "broadcast_event": [encode_broadcast_event(5, "Lap completed",
+                                                   60000, 0)],
+    }
+
+
+def decode_realtime_update(data: bytes) -> RealTimeUpdate:
+
+    update = RealTimeUpdate()
+    update.update(Cursor(data))
+    return update
+
+
+def make_class_corpus() -> dict:
+
+    # Packet bodies for the decoding classes on their own
+    driver = (encode_str("First") + encode_str("Last") + encode_str("FLA")
+              + b"\x01\x01\x00")
+
+    return {
+        "LapInfo": (lambda data: LapInfo(Cursor(data)), encode_lap(90000, 0)),
+        "RealTimeCarUpdate": (lambda data: RealTimeCarUpdate(Cursor(data)),
+                              encode_car_update(0, 1)[1:]),
+        "DriverInfo": (lambda data: DriverInfo(Cursor(data)), driver),
+        "RealTimeUpdate": (decode_realtime_update,
+                           encode_realtime_update()[1:]),
+    }
+
+
+def percentile(values: list, percent: float) -> float:
+
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+
+def measure_allocations(handle, packets: list) -> dict:
+
+    tracemalloc.start()
+    handle(packets[0])  # Warm up caches first
+
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+
+    blocks = sys.getallocatedblocks()
+    for packet in packets:
+        handle(packet)
+    blocks = sys.getallocatedblocks() - blocks
+
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "peak_bytes_per_packet": (peak - before) / len(packets),
+        "retained_bytes_per_packet": (current - before) / len(packets),
+        "retained_blocks_per_packet": blocks / len(packets),
+    }
+
+
+def measure_retained(decode, data: bytes, count: int = 1000) -> float:
+
+    # Memory held by decoded objects that are kept around
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    kept = [decode(data) for _ in range(count)]
+
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+
+    return (current - before) / count
+
+
+def bench_decode(grid_sizes: list, rounds: int) -> dict:
+
+    results = {}
+    for grid_size in grid_sizes:
+
+        results[grid_size] = {}
+        for packet_type, packets in make_corpus(grid_size).items():
+
+            state = make_state(grid_size)
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for packet in packets:
+                    state.handle_packet(packet)
+            elapsed = time.perf_counter() - start
+
+            count = rounds * len(packets)
+            results[grid_size][packet_type] = {
+                "packets_per_sec": count / elapsed,
+                "ns_per_packet": elapsed / count * 1e9,
+                **measure_allocations(make_state(grid_size).handle_packet,
+                                      packets),
+            }
+
+    return results
+
+
+def bench_classes(rounds: int) -> dict:
+
+    results = {}
+    for name, (decode, data) in make_class_corpus().items():
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            decode(data)
+        elapsed = time.perf_counter() - start
+
+        results[name] = {
+            "decodes_per_sec": rounds / elapsed,
+            "ns_per_decode": elapsed / rounds * 1e9,
+            **measure_allocations(decode, [data] * 100),
+            "retained_bytes_per_object": measure_retained(decode, data),
+        }
+
+    return results
+
+
+def bench_grid(grid_sizes: list, rounds: int) -> dict:
+
+    results = {}
+    for grid_size in grid_sizes:
+
+        state = make_state(grid_size)
+        packets = [encode_car_update(car_index, car_index + 1)
+                   for car_index in range(grid_size)]
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for packet in packets:
+                state.handle_packet(packet)
+        elapsed = time.perf_counter() - start
+
+        results[grid_size] = {
+            "ns_per_packet": elapsed / (rounds * grid_size) * 1e9
+        }
+
+    return results
+
+
+def bench_metrics(grid_size: int, rounds: int) -> dict:
+
+    # Cost of the instrumentation, "uninstrumented" skips handle_packet and
+    # its metrics check entirely
+    packets = [encode_car_update(car_index, car_index + 1)
+               for car_index in range(grid_size)]
+
+    handles = {
+        "uninstrumented_ns": make_state(grid_size)._handle_packet,
+        "disabled_ns": make_state(grid_size).handle_packet,
+        "enabled_ns": make_state(grid_size, metrics=True).handle_packet,
+    }
+
+    # Interleaved and best of several runs, the differences are small
+    # next to the noise of a single run
+    results = {}
+    for _ in range(7):
+        for name, handle in handles.items():
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for packet in packets:
+                    handle(packet)
+            elapsed = time.perf_counter() - start
+
+            ns_per_packet = elapsed / (rounds * grid_size) * 1e9
+            results[name] = min(results.get(name, ns_per_packet),
+                                ns_per_packet)
+
+    results["disabled_overhead_ns"] = (results["disabled_ns"]
+                                       - results["uninstrumented_ns"])
+    results["enabled_overhead_ns"] = (results["enabled_ns"]
+                                      - results["uninstrumented_ns"])
+
+    return results
+
+
+def bench_export(grid_size: int, rounds: int) -> dict:
+
+    # A session update and a car update per car each round, like ACC sends
+    # them, with every car finishing a lap now and then. "none" is decoding
+    # alone and "json_lines" the udp_data dump per update the exporter
+    # replaces. Timed until the writer is done, "block" keeps every row so
+    # this is what it sustains.
+    session = encode_realtime_update()
+    rounds_packets = [
+        [encode_car_update(car_index, car_index + 1, lap=round // 50 + 1)
+         for car_index in range(grid_size)]
+        for round in range(rounds)]
+
+    directory = tempfile.mkdtemp()
+    results = {}
+    try:
+        formats = ["none", "json_lines", "csv"]
+        if pyarrow is not None:
+            formats += ["arrow", "parquet"]
+
+        for format in formats:
+
+            exporter = None
+            if format not in ("none", "json_lines"):
+                exporter = ColumnarExporter(directory, format,
+                                            name=format, policy="block")
+                exporter.start()
+
+            state = make_state(grid_size, exporter=exporter)
+            output = open(os.path.join(directory, "udp_data.jsonl"), "w")
+
+            start = time.perf_counter()
+            for packets in rounds_packets:
+                state.handle_packet(session)
+                for packet in packets:
+                    state.handle_packet(packet)
+
+                    if format == "json_lines":
+                        output.write(json.dumps(state._udp_data, default=str))
+                        output.write("\n")
+
+            if exporter is not None:
+                exporter.close()
+            output.close()
+            elapsed = time.perf_counter() - start
+
+            count = rounds * (grid_size + 1)
+            size = sum(os.path.getsize(os.path.join(directory, name))
+                       for name in os.listdir(directory)
+                       if name.startswith(format) or (
+                           format == "json_lines" and name.endswith(".jsonl")))
+
+            results[format] = {
+                "packets_per_sec": count / elapsed,
+                "ns_per_packet": elapsed / count * 1e9,
+                "bytes_per_car_update": size / (rounds * grid_size),
+            }
+
+    finally:
+        shutil.rmtree(directory)
+
+    return results
+
+
+def bench_resample(grid_sizes: list, frames: int) -> dict:
+
+    # One resample per 60 fps frame, against grid size and how often each
+    # car sends. It only ever reads the last few samples per car.
+    if np is None:
+        return {}
+
+    results = {}
+    for grid_size in grid_sizes:
+
+        results[grid_size] = {}
+        for rate_hz in (10, 50, 100):
+
+            buffer = TelemetryBuffer(3000, max_cars=max(grid_size, 1))
+            updates = [RealTimeCarUpdate(Cursor(
+                encode_car_update(car_index, car_index + 1)[1:]))
+                for car_index in range(grid_size)]
+
+            for sample in range(int(rate_hz * 10)):
+                for car_index, update in enumerate(updates):
+                    # Jittered arrival, cars don't send in lockstep
+                    buffer.append(update, sample / rate_hz
+                                  + car_index * 0.37 % 1 / rate_hz)
+
+            now = 10.0
+            start = time.perf_counter()
+            for frame in range(frames):
+                buffer.resample(now + frame / 60)
+            elapsed = time.perf_counter() - start
+
+            results[grid_size][f"{rate_hz}hz_us_per_frame"] = (
+                elapsed / frames * 1e6)
+
+    return results
+
+
+def bench_latency(samples: int, grid_size: int,
+                  interface=accUpdInterface) -> dict:
+
+    # Plays the ACC server by hand and times each car update from sendto
+    # until udp_data shows it
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(5.0)
+
+    # Startup is until the registration answer can be read
+    start = time.perf_counter_ns()
+    client = interface("127.0.0.1", server.getsockname()[1], INFO)
+    client.start()
+    started = time.perf_counter_ns() - start
+
+    try:
+        _, address = server.recvfrom(2048)
+        server.sendto(encode_registration(1), address)
+
+        while not client.udp_data["connection"]["connected"]:
+            time.sleep(0)
+        connected = time.perf_counter_ns() - start
+
+        car_ids = list(range(grid_size))
+        server.sendto(encode_entry_list(car_ids, 1), address)
+        for car_index in car_ids:
+            server.sendto(encode_entry_list_car(car_index), address)
+
+        while len(client.udp_data["entries"]) < grid_size:
+            time.sleep(0.01)
+
+        latencies = []
+        reads = []
+        for sample in range(samples):
+
+            car_index = sample % grid_size
+            lap = sample % 60000 + 1
+            packet = encode_car_update(car_index, car_index + 1, lap=lap)
+
+            sent = time.perf_counter_ns()
+            server.sendto(packet, address)
+
+            while True:
+                read_start = time.perf_counter_ns()
+                entry = client.udp_data["entries"][car_index]
+                reads.append(time.perf_counter_ns() - read_start)
+
+                if entry.get("lap") == lap:
+                    break
+
+            latencies.append(time.perf_counter_ns() - sent)
+
+    finally:
+        client.stop()
+        server.close()
+
+    return {
+        "samples": samples,
+        "grid_size": grid_size,
+        "start_ms": started / 1e6,
+        "connected_ms": connected / 1e6,
+        "p50_us": percentile(latencies, 50) / 1000,
+        "p99_us": percentile(latencies, 99) / 1000,
+        "max_us": max(latencies) / 1000,
+        "udp_data_read_p50_us": percentile(reads, 50) / 1000,
+        "udp_data_read_p99_us": percentile(reads, 99) / 1000,
+    }
+
+
+def bench_modes(samples: int, grid_size: int) -> dict:
+
+    # Listener process with shared memory against the receive thread
+    return {
+        "process": bench_latency(samples, grid_size, accUpdInterface),
+        "thread": bench_latency(samples, grid_size, ThreadedAccUdpInterface),
+    }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--grid", type=int, nargs="+",
+                        default=[10, 30, 60, 120, 240])
+    parser.add_argument("--samples", type=int, default=2000,
+                        help="car updates timed by the latency benchmark")
+    parser.add_argument("--latency-grid", type=int, default=60)
+    parser.add_argument("--only", nargs="+",
+                        choices=["decode", "classes", "grid", "metrics",
+                                 "export", "resample", "latency", "modes"],
+                        default=["decode", "classes", "grid", "metrics",
+                                 "export", "resample", "latency", "modes"])
+    parser.add_argument("--output", default=None,
+                        help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.time(),
+    }
+
+    if "decode" in args.only:
+        results["decode"] = bench_decode(args.grid, args.rounds)
+
+    if "classes" in args.only:
+        results["classes"] = bench_classes(args.rounds * 50)
+
+    if "grid" in args.only:
+        results["grid"] = bench_grid(args.grid, args.rounds)
+
+    if "metrics" in args.only:
+        results["metrics"] = bench_metrics(args.latency_grid, args.rounds)
+
+    if "export" in args.only:
+        results["export"] = bench_export(args.latency_grid, args.rounds)
+
+    if "resample" in args.only:
+        results["resample"] = bench_resample(args.grid, args.rounds * 5)
+
+    if "latency" in args.only:
+        results["latency"] = bench_latency(args.samples,
+                                           args.latency_grid)
+
+    if "modes" in args.only:
+        results["modes"] = bench_modes(args.samples, args.latency_grid)
+
+    output = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+
+    print(output)
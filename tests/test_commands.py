@@ -0,0 +1,68 @@
+import asyncio
+import socket
+import threading
+import time
+
+from PyAccUdpInterface import AsyncAccUdpInterface, CommandQueue
+
+INFO = {
+    "name": "tests",
+    "password": "",
+    "speed": 100,
+    "cmd_password": ""
+}
+
+
+def test_ticks_share_one_flush_thread():
+
+    sent = []
+    commands = CommandQueue(sent.append, rate=100.0, burst=1, tick=0.005)
+
+    for index in range(5):
+        commands.submit(None, bytes, ((index,),))
+    threads = threading.active_count()
+
+    deadline = time.monotonic() + 2.0
+    while len(sent) < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # Rate limited into several ticks, without a new thread for each one
+    assert sent == [bytes((index,)) for index in range(5)]
+    assert commands.stats()["delayed"] > 0
+    assert threading.active_count() == threads
+
+
+def test_async_commands_from_another_thread():
+
+    acc = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    acc.bind(("127.0.0.1", 0))
+    acc.settimeout(0.5)
+
+    async def run() -> bytes:
+
+        aui = AsyncAccUdpInterface("127.0.0.1", acc.getsockname()[1], INFO,
+                                   local_port=0)
+        await aui.start()
+        loop = asyncio.get_running_loop()
+        try:
+            registration = await loop.run_in_executor(None, acc.recv, 4096)
+            assert registration[0] == 1
+
+            # Called once the loop sleeps in the executor wait, only a
+            # thread safe schedule wakes it up for the tick
+            def change_hud_page() -> None:
+                time.sleep(0.1)
+                aui.change_hud_page("Blank")
+
+            threading.Thread(target=change_hud_page).start()
+            return await loop.run_in_executor(None, acc.recv, 4096)
+
+        finally:
+            await aui.stop()
+
+    try:
+        command = asyncio.run(run())
+    finally:
+        acc.close()
+
+    assert command[0] == 49
@@ -0,0 +1,257 @@
+import random
+import struct
+from enum import Enum
+
+import pytest
+
+import legacy_decoders as legacy
+import PyAccUdpInterface as current
+from AccServerSimulator import (encode_broadcast_event, encode_car_update,
+                                encode_entry_list, encode_entry_list_car,
+                                encode_lap, encode_realtime_update,
+                                encode_registration, encode_track_data)
+
+
+# Every inbound packet type decoded by the old per field reads and by the
+# struct layouts, the results have to be the same
+
+PACKETS_PER_TYPE = 300
+GRID = list(range(6))
+
+
+def pack_str(data: str) -> bytes:
+    byte_data = data.encode("utf-8")
+    return struct.pack("<H", len(byte_data)) + byte_data
+
+
+class RandomPackets:
+
+    # Valid packets with random content (unset times, replays, empty and
+    # unicode strings, variable counts...), type byte included
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+
+    def string(self) -> str:
+        rng = self.rng
+        length = rng.randint(0, 12)
+        return "".join(rng.choice("abcé Z") for _ in range(length))
+
+    def time_ms(self) -> float:
+        return self.rng.choice([-1000.0, self.rng.uniform(0, 1e7)])
+
+    def lap(self) -> bytes:
+
+        rng = self.rng
+        splits = [rng.choice([2147483647, rng.randint(0, 90000)])
+                  for _ in range(rng.choice([0, 3]))]
+
+        return (struct.pack("<IHHB", rng.choice([2147483647,
+                                                 rng.randint(0, 200000)]),
+                            rng.randint(0, 80), rng.randint(0, 3), len(splits))
+                + struct.pack(f"<{len(splits)}i", *splits)
+                + bytes(rng.randint(0, 1) for _ in range(4)))
+
+    def registration(self) -> bytes:
+        rng = self.rng
+        return (struct.pack("<BiBB", 1, rng.randint(-1, 9), rng.randint(0, 1),
+                            rng.randint(0, 1)) + pack_str(self.string()))
+
+    def realtime_update(self) -> bytes:
+
+        rng = self.rng
+        replay = rng.randint(0, 1)
+
+        data = (struct.pack("<BHHBBffi", 2, rng.randint(0, 9),
+                            rng.randint(0, 9), rng.choice([0, 4, 10]),
+                            rng.randint(0, 8), self.time_ms(), self.time_ms(),
+                            rng.randint(-1, 60))
+                + pack_str(self.string()) + pack_str(self.string())
+                + pack_str(self.string()) + bytes([replay]))
+
+        if replay:
+            data += struct.pack("<ff", self.time_ms(), self.time_ms())
+
+        return (data + struct.pack("<fBB", rng.uniform(0, 8e7),
+                                   rng.randint(0, 40), rng.randint(0, 50))
+                + self.lap())
+
+    def car_update(self) -> bytes:
+        rng = self.rng
+        return (struct.pack("<BHHBBfffBHHHHfHi", 3, rng.randint(0, 80),
+                            rng.randint(0, 3), rng.randint(1, 4),
+                            rng.randint(0, 7), rng.uniform(-1e3, 1e3),
+                            rng.uniform(-1e3, 1e3), rng.uniform(-3.14, 3.14),
+                            rng.randint(0, 4), rng.randint(0, 300),
+                            rng.randint(1, 60), rng.randint(1, 60),
+                            rng.randint(1, 60), rng.random(),
+                            rng.randint(0, 99), rng.randint(-9999, 9999))
+                + self.lap() + self.lap() + self.lap())
+
+    def entry_list(self) -> bytes:
+        car_ids = self.rng.sample(range(120), self.rng.randint(0, 60))
+        return encode_entry_list(car_ids, self.rng.randint(0, 9))
+
+    def track_data(self) -> bytes:
+
+        rng = self.rng
+        data = (struct.pack("<Bi", 5, rng.randint(0, 9))
+                + pack_str(self.string())
+                + struct.pack("<ii", rng.randint(0, 30),
+                              rng.randint(3000, 7000)))
+
+        camera_sets = rng.randint(0, 4)
+        data += bytes([camera_sets])
+        for index in range(camera_sets):
+            cameras = rng.randint(0, 5)
+            data += pack_str(f"set{index}") + bytes([cameras])
+            data += b"".join(pack_str(self.string()) for _ in range(cameras))
+
+        hud_pages = rng.randint(0, 5)
+        return (data + bytes([hud_pages])
+                + b"".join(pack_str(self.string()) for _ in range(hud_pages)))
+
+    def entry_list_car(self) -> bytes:
+
+        rng = self.rng
+        drivers = rng.randint(0, 4)
+
+        data = (struct.pack("<BHB", 6, rng.choice(GRID), rng.randint(0, 40))
+                + pack_str(self.string())
+                + struct.pack("<iBBH", rng.randint(0, 999), rng.randint(0, 4),
+                              rng.randint(0, 3), rng.randint(0, 84))
+                + bytes([drivers]))
+
+        for _ in range(drivers):
+            data += (pack_str(self.string()) + pack_str(self.string())
+                     + pack_str(self.string())
+                     + struct.pack("<BH", rng.randint(0, 3),
+                                   rng.randint(0, 84)))
+
+        return data
+
+    def broadcast_event(self) -> bytes:
+        rng = self.rng
+        return encode_broadcast_event(rng.randint(0, 7), self.string(),
+                                      rng.randint(0, 10000000),
+                                      rng.randint(-1, 80))
+
+
+def simulator_packets() -> list:
+
+    # What the simulator sends, with the edge cases its defaults skip
+    return [
+        encode_registration(3),
+        encode_registration(-1, success=False, read_only=True,
+                            error_msg="Wrong password"),
+        encode_realtime_update(),
+        encode_realtime_update(session_time_ms=-1000.0,
+                               session_end_time_ms=-1000.0, phase=7,
+                               best_session_lap=encode_lap(88123, 4)),
+        encode_car_update(0, 1),
+        encode_car_update(5, 12, driver_index=1, car_location=2, lap=17,
+                          delta=420, current_lap=encode_lap(
+                              2147483647, 5, splits=(2147483647,) * 3,
+                              is_invalid=True, is_out_lap=True)),
+        encode_entry_list(GRID),
+        encode_entry_list([]),
+        encode_track_data(),
+        encode_track_data("spa", 7, 7004, camera_sets={}, hud_pages=[]),
+        encode_entry_list_car(2),
+        encode_entry_list_car(4, "Team ünicode", 99, 30, 3, drivers=[
+            ("A", "B", "C"), ("Dé", "", "EFG")]),
+        encode_entry_list_car(1, drivers=[]),
+        encode_broadcast_event(5, "Lap completed", 1234567, 3),
+        encode_broadcast_event(0, "", 0, -1),
+    ]
+
+
+def plain(value, reference=None):
+
+    # Comparable form of a decoded packet, the attributes are the ones of
+    # the old object (reference) read from either of them
+    reference = value if reference is None else reference
+
+    if isinstance(value, Enum):
+        return type(value).__name__, value.value
+
+    if isinstance(value, (list, tuple)):
+        return [len(value)] + [plain(item, ref)
+                               for item, ref in zip(value, reference)]
+
+    if isinstance(value, dict):
+        return {key: plain(item, reference.get(key))
+                for key, item in value.items()}
+
+    if hasattr(reference, "__dict__") and not isinstance(reference, type):
+        return {name: plain(getattr(value, name), getattr(reference, name))
+                for name in vars(reference) if name != "_cur"}
+
+    return value
+
+
+def decode(module, data: bytes):
+
+    # current gets a memoryview, like the datagrams of the receiver
+    cur = module.Cursor(memoryview(data) if module is current else data)
+    packet_type = cur.read_u8()
+
+    if packet_type == 3:
+        return module.RealTimeCarUpdate(cur)
+
+    if packet_type == 7:
+        if module is current:
+            event = module.BroadcastingEvent(cur)
+            return event.type.value, event.msg, event.time_ms, event.car_index
+
+        # The old listener ignored broadcast events, same primitives it
+        # used for everything else
+        return (cur.read_u8(), cur.read_string(), cur.read_i32(),
+                cur.read_i32())
+
+    result = {
+        1: module.Registration,
+        2: module.RealTimeUpdate,
+        4: module.EntryList,
+        5: module.TrackData,
+        6: module.EntryList,
+    }[packet_type]()
+
+    if packet_type == 6:
+        result.update(module.Cursor(encode_entry_list(GRID)[1:]))
+        result.update_car(cur)
+    else:
+        result.update(cur)
+
+    return result
+
+
+def assert_same_decoding(data: bytes) -> None:
+
+    # The new object is walked with the old one's attributes
+    expected = decode(legacy, data)
+    assert plain(decode(current, data), expected) == plain(expected)
+
+
+@pytest.mark.parametrize("packet_type, generator", [
+    (1, RandomPackets.registration),
+    (2, RandomPackets.realtime_update),
+    (3, RandomPackets.car_update),
+    (4, RandomPackets.entry_list),
+    (5, RandomPackets.track_data),
+    (6, RandomPackets.entry_list_car),
+    (7, RandomPackets.broadcast_event),
+])
+def test_random_packets_decode_the_same(packet_type, generator):
+
+    packets = RandomPackets(packet_type)
+    for _ in range(PACKETS_PER_TYPE):
+        data = generator(packets)
+        assert data[0] == packet_type
+        assert_same_decoding(data)
+
+
+@pytest.mark.parametrize("data", simulator_packets(),
+                         ids=lambda data: f"type{data[0]}")
+def test_simulator_packets_decode_the_same(data):
+    assert_same_decoding(data)
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from AccServerSimulator import (encode_entry_list, encode_entry_list_car,
+                                encode_track_data)
+from PyAccUdpInterface import AccUdpState, EventDispatcher
+
+
+INFO = {
+    "name": "tests",
+    "password": "",
+    "speed": 100,
+    "cmd_password": ""
+}
+
+
+def wait_for(predicate, timeout: float = 2.0) -> bool:
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+
+    return False
+
+
+def test_dedicated_block_handler_only_holds_back_itself():
+
+    dispatcher = EventDispatcher(dedicated=True)
+    release = threading.Event()
+    fast = []
+
+    slow = dispatcher.subscribe("car_update", lambda _: release.wait(),
+                                max_queue=2, policy="block", block_timeout=5.0)
+    dispatcher.subscribe("car_update", fast.append, max_queue=1000)
+
+    start = time.monotonic()
+    for index in range(100):
+        dispatcher.emit("car_update", index)
+    emitted = time.monotonic() - start
+
+    wait_for(lambda: len(fast) == 100)
+
+    # The slow handler's feed waits for room, emit and the other handler
+    # don't
+    assert emitted < 1.0
+    assert fast == list(range(100))
+    assert slow.dropped > 0
+
+    release.set()
+    dispatcher.stop()
+
+
+def test_emitted_objects_are_not_updated_later():
+
+    state = AccUdpState("127.0.0.1", 9000, INFO)
+    received = []
+    for kind in ("entry_list", "track_data"):
+        state.subscribe(kind, received.append)
+
+    state.handle_packet(encode_entry_list([0, 1]))
+    state.handle_packet(encode_entry_list_car(0, "Before"))
+    state.handle_packet(encode_track_data("monza"))
+    wait_for(lambda: len(received) == 3)
+
+    state.handle_packet(encode_entry_list([0]))
+    state.handle_packet(encode_entry_list_car(0, "After", drivers=[]))
+    state.handle_packet(encode_track_data("spa"))
+    wait_for(lambda: len(received) == 6)
+    state.dispatcher.stop()
+
+    entry_list, car_info, track = received[:3]
+    assert [car.car_index for car in entry_list.entry_list] == [0, 1]
+    assert entry_list.get(0).team_name == ""
+    assert car_info.team_name == "Before"
+    assert len(car_info.drivers) == 1
+    assert track.track_name == "monza"
@@ -0,0 +1,70 @@
+import csv
+import os
+
+from AccServerSimulator import (encode_car_update, encode_lap,
+                                encode_realtime_update)
+from PyAccUdpInterface import (ColumnarExporter, Cursor, LapInfo,
+                               RealTimeCarUpdate, RealTimeUpdate)
+
+
+def session_update(session_index: int,
+                   session_time_ms: float) -> RealTimeUpdate:
+
+    update = RealTimeUpdate()
+    update.update(Cursor(encode_realtime_update(
+        session_time_ms, session_index=session_index)[1:]))
+    return update
+
+
+def car_update(car_index: int, lap: int) -> RealTimeCarUpdate:
+    return RealTimeCarUpdate(Cursor(encode_car_update(car_index, car_index + 1,
+                                                      lap=lap)[1:]))
+
+
+def read_rows(path: str) -> list:
+
+    with open(path, newline="") as file:
+        header, *rows = csv.reader(file)
+
+    return [dict(zip(header, row)) for row in rows]
+
+
+def test_rows_and_session_rotation(tmp_path):
+
+    exporter = ColumnarExporter(str(tmp_path), batch_rows=8)
+    with exporter:
+
+        # Several full batches and a partial one in the first session
+        exporter.add_session(session_update(0, 1000.0))
+        for lap in range(10):
+            for car_index in range(2):
+                exporter.add_car(car_update(car_index, lap))
+        exporter.add_lap(LapInfo(Cursor(encode_lap(90500, 1))), 4)
+
+        exporter.add_session(session_update(1, 2000.0))
+        for car_index in range(3):
+            exporter.add_car(car_update(car_index, 0))
+
+    stats = exporter.stats()
+    assert stats["rows_written"] == 20 + 1 + 1 + 1 + 3
+    assert stats["errors"] == 0
+    assert stats["dropped_rows"] == {"cars": 0, "sessions": 0, "laps": 0}
+    assert sorted(os.path.basename(path) for path in stats["files"]) == [
+        "acc_0_0_cars.csv", "acc_0_0_laps.csv", "acc_0_0_sessions.csv",
+        "acc_0_1_cars.csv", "acc_0_1_sessions.csv"]
+
+    cars = read_rows(tmp_path / "acc_0_0_cars.csv")
+    assert len(cars) == 20
+    assert [int(row["lap"]) for row in cars[::2]] == list(range(10))
+    assert {float(row["session_time_ms"]) for row in cars} == {1000.0}
+
+    laps = read_rows(tmp_path / "acc_0_0_laps.csv")
+    assert [(row["car_index"], row["lap"], row["lap_time_ms"])
+            for row in laps] == [("1", "4", "90500")]
+
+    # Rows after the session change only in the new files
+    cars = read_rows(tmp_path / "acc_0_1_cars.csv")
+    assert [row["car_index"] for row in cars] == ["0", "1", "2"]
+    assert {float(row["session_time_ms"]) for row in cars} == {2000.0}
+    assert [row["session_index"]
+            for row in read_rows(tmp_path / "acc_0_1_sessions.csv")] == ["1"]
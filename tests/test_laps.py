@@ -0,0 +1,105 @@
+from AccServerSimulator import (encode_car_update, encode_entry_list,
+                                encode_entry_list_car, encode_lap)
+from PyAccUdpInterface import AccUdpState, Cursor, LapHistory, LapInfo
+
+
+INFO = {
+    "name": "tests",
+    "password": "",
+    "speed": 100,
+    "cmd_password": ""
+}
+
+
+def lap_info(lap_time_ms: int, car_index: int, splits=(30000, 31000, 32000),
+             is_invalid: bool = False) -> LapInfo:
+    return LapInfo(Cursor(encode_lap(lap_time_ms, car_index, splits=splits,
+                                     is_invalid=is_invalid)))
+
+
+def history() -> LapHistory:
+
+    # Car 1 and 2 in class 0, car 3 in class 1, session 2
+    laps = LapHistory()
+    laps.add(1, 2, lap_info(93000, 1, (31000, 31000, 31000)), 0, 2)
+    laps.add(1, 3, lap_info(91000, 1, (30500, 30000, 30500)), 0, 2)
+    laps.add(2, 2, lap_info(92000, 2, (30000, 31000, 31000)), 0, 2)
+    laps.add(2, 3, lap_info(85000, 2, (28000, 28000, 29000),
+                            is_invalid=True), 0, 2)
+    laps.add(3, 2, lap_info(90000, 3, (30000, 30000, 30000)), 1, 2)
+    laps.add(3, 3, lap_info(95000, 3, ()), 1, 2)
+
+    return laps
+
+
+def test_laps_of_a_car():
+
+    laps = history()
+    assert len(laps) == 6
+
+    car = laps.laps(2)
+    assert [(lap["lap"], lap["lap_time_ms"], lap["is_invalid"])
+            for lap in car] == [(2, 92000, False), (3, 85000, True)]
+    assert car[1]["splits"] == [28000, 28000, 29000]
+    assert car[1]["session_index"] == 2
+
+    # Missing splits are zeros
+    assert laps.laps(3)[1]["splits"] == [0, 0, 0]
+    assert laps.laps(3)[1]["cup_category"] == 1
+
+
+def test_best_laps_skip_invalid_ones():
+
+    laps = history()
+
+    assert laps.best_lap(car_index=2)["lap_time_ms"] == 92000
+    assert laps.best_lap(cup_category=0)["lap_time_ms"] == 91000
+    assert laps.best_lap()["car_index"] == 3
+    assert [lap["lap_time_ms"] for lap in laps.top_laps(4)] == [
+        90000, 91000, 92000, 93000]
+    assert [lap["lap_time_ms"] for lap in laps.top_laps(
+        cup_category=1)] == [90000, 95000]
+
+
+def test_best_sectors_and_theoretical_best():
+
+    laps = history()
+
+    assert laps.best_sectors(car_index=1) == [30500, 30000, 30500]
+    assert laps.theoretical_best(car_index=1) == 91000
+    assert laps.best_sectors() == [30000, 30000, 30000]
+    assert laps.theoretical_best() == 90000
+
+    # A car without a single split has no theoretical best
+    laps.add(4, 2, lap_info(99000, 4, ()), 1, 2)
+    assert laps.theoretical_best(car_index=4) == 0
+
+
+def test_sessions_are_kept_apart():
+
+    laps = history()
+    laps.add(1, 2, lap_info(88000, 1), 0, 3)
+
+    assert laps.session_index == 3
+    assert laps.best_lap()["lap_time_ms"] == 88000
+    assert laps.best_lap(session_index=2)["lap_time_ms"] == 90000
+    assert len(laps.laps(1)) == 1
+    assert len(laps.laps(1, session_index=2)) == 2
+    assert laps.best_lap(car_index=2) is None
+
+
+def test_listener_records_completed_laps():
+
+    state = AccUdpState("127.0.0.1", 9000, INFO)
+    state.handle_packet(encode_entry_list([5]))
+    state.handle_packet(encode_entry_list_car(5, cup_category=2))
+
+    state.handle_packet(encode_car_update(5, 1, lap=3))
+    state.handle_packet(encode_car_update(5, 1, lap=3))
+    state.handle_packet(encode_car_update(
+        5, 1, lap=4, last_lap=encode_lap(91234, 5, splits=(30000, 30000,
+                                                          31234))))
+
+    assert [(lap["lap"], lap["lap_time_ms"], lap["cup_category"])
+            for lap in state.laps.laps(5, state.session.session_index)] == [
+        (4, 91234, 2)]
@@ -0,0 +1,112 @@
+import socket
+import time
+
+import pytest
+
+from AccServerSimulator import (encode_car_update, encode_entry_list,
+                                encode_entry_list_car)
+from PyAccUdpInterface import (AccUdpState, StatePublisher, StateSubscriber,
+                               ThreadedAccUdpInterface, accUpdInterface)
+
+
+INFO = {
+    "name": "tests",
+    "password": "",
+    "speed": 100,
+    "cmd_password": ""
+}
+
+CARS = list(range(60))
+
+
+@pytest.fixture
+def source():
+
+    # Never started, packets are handled right here and written to the
+    # shared memory the publisher reads
+    source = accUpdInterface("127.0.0.1", 9000, INFO, local_port=0)
+    source.handle_packet(encode_entry_list(CARS))
+    for car_index in CARS:
+        source.handle_packet(encode_entry_list_car(car_index))
+
+    yield source
+    source._socket.close()
+    source._shared.close()
+
+
+def drive_until(source, predicate, timeout: float = 10.0) -> int:
+
+    # A lap for every car per round, until the publisher falls behind
+    deadline = time.monotonic() + timeout
+    lap = 0
+    while time.monotonic() < deadline and not predicate():
+        lap += 1
+        for car_index in CARS:
+            source.handle_packet(encode_car_update(car_index, car_index + 1,
+                                                   lap=lap))
+        time.sleep(0.002)
+
+    return lap
+
+
+# A unix socket, a tcp one that stays full too long waits on the peer's
+# zero window probes after it's read again
+needs_unix = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"),
+                                reason="No unix sockets here")
+
+
+@needs_unix
+def test_slow_subscriber_downsampled(source, tmp_path):
+
+    address = str(tmp_path / "acc.sock")
+    publisher = StatePublisher(source, address, interval=0.005)
+    publisher.start()
+
+    # Connected and then not read until the publisher falls behind
+    subscriber = StateSubscriber(address, timeout=5.0)
+    try:
+        lap = drive_until(source, lambda: publisher.stats()["skipped"] > 0)
+        assert publisher.stats()["skipped"] > 0
+
+        # Once it reads again it catches up with one merged delta
+        while subscriber.udp_data["entries"].get(0, {}).get("lap") != lap:
+            subscriber.receive()
+
+        assert len(subscriber.udp_data["entries"]) == len(CARS)
+        assert publisher.stats()["disconnected"] == 0
+
+    finally:
+        subscriber.close()
+        publisher.stop()
+
+
+@needs_unix
+def test_slow_subscriber_disconnected(source, tmp_path):
+
+    address = str(tmp_path / "acc.sock")
+    publisher = StatePublisher(source, address, interval=0.005,
+                               max_buffer=4096, slow="disconnect")
+    publisher.start()
+
+    subscriber = StateSubscriber(address, timeout=5.0)
+    try:
+        drive_until(source, lambda: publisher.stats()["disconnected"] > 0)
+        assert publisher.stats()["disconnected"] == 1
+        assert publisher.stats()["subscribers"] == 0
+
+        with pytest.raises(ConnectionError):
+            while True:
+                subscriber.receive()
+
+    finally:
+        subscriber.close()
+        publisher.stop()
+
+
+@pytest.mark.parametrize("listener", [AccUdpState, ThreadedAccUdpInterface])
+def test_publisher_needs_shared_memory(listener):
+
+    kwargs = {"local_port": 0} if listener is not AccUdpState else {}
+    source = listener("127.0.0.1", 9000, INFO, **kwargs)
+    with pytest.raises(TypeError, match="StatePublisher needs"):
+        StatePublisher(source, ("127.0.0.1", 0))
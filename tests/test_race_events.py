@@ -0,0 +1,116 @@
+from AccServerSimulator import (encode_car_update, encode_entry_list,
+                                encode_entry_list_car, encode_lap,
+                                encode_realtime_update)
+from PyAccUdpInterface import AccUdpState, RaceEventType
+
+
+INFO = {
+    "name": "tests",
+    "password": "",
+    "speed": 100,
+    "cmd_password": ""
+}
+
+TRACK, PITLANE, PIT_ENTRY, PIT_EXIT = 1, 2, 3, 4
+
+
+def make_state(car_ids: list) -> AccUdpState:
+
+    state = AccUdpState("127.0.0.1", 9000, INFO)
+    state.handle_packet(encode_entry_list(car_ids))
+    for car_index in car_ids:
+        state.handle_packet(encode_entry_list_car(car_index))
+
+    return state
+
+
+def drive(state: AccUdpState, session_time_ms: float, car_index: int,
+          **update) -> list:
+
+    # One realtime update for the session time, then the car
+    before = len(state.race_events_since(0))
+    state.handle_packet(encode_realtime_update(session_time_ms))
+    state.handle_packet(encode_car_update(car_index, **update))
+    return state.race_events_since(0)[before:]
+
+
+def types(events: list) -> list:
+    return [event.type for event in events]
+
+
+def test_pit_stop():
+
+    state = make_state([0])
+    assert drive(state, 1000, 0, position=1, car_location=TRACK) == []
+
+    entry = drive(state, 2000, 0, position=1, car_location=PIT_ENTRY)
+    assert types(entry) == [RaceEventType.PitEntry]
+
+    assert drive(state, 5000, 0, position=1, car_location=PITLANE) == []
+    assert drive(state, 30000, 0, position=1, car_location=PIT_EXIT) == []
+
+    exit_ = drive(state, 32000, 0, position=1, car_location=TRACK)
+    assert types(exit_) == [RaceEventType.PitExit]
+    assert exit_[0].duration_ms == 30000
+
+
+def test_none_location_is_not_a_pit_stop():
+
+    # Cars show up as NONE before they're on the map and go back to it in
+    # the garage
+    state = make_state([0])
+    assert drive(state, 1000, 0, position=1, car_location=0) == []
+    assert drive(state, 2000, 0, position=1, car_location=TRACK) == []
+    assert drive(state, 3000, 0, position=1, car_location=0) == []
+    assert drive(state, 4000, 0, position=1, car_location=TRACK) == []
+
+
+def test_overtake_on_track():
+
+    state = make_state([0, 1])
+    drive(state, 1000, 0, position=1, lap=3, spline_position=0.50)
+    drive(state, 1000, 1, position=2, lap=3, spline_position=0.49)
+
+    events = drive(state, 2000, 1, position=1, lap=3, spline_position=0.52)
+    assert types(events) == [RaceEventType.Overtake]
+    assert events[0].car_index == 1
+    assert events[0].other_car_index == 0
+
+    # The car that lost the place didn't pass anyone
+    assert drive(state, 2000, 0, position=2, lap=3,
+                 spline_position=0.51) == []
+
+
+def test_position_gained_in_the_pits_is_no_overtake():
+
+    state = make_state([0, 1])
+    drive(state, 1000, 0, position=1, car_location=TRACK)
+    drive(state, 1000, 1, position=2, car_location=TRACK)
+    drive(state, 2000, 0, position=1, car_location=PITLANE)
+
+    events = drive(state, 3000, 1, position=1, car_location=TRACK,
+                   spline_position=0.6)
+    assert types(events) == []
+
+
+def test_lap_completed():
+
+    state = make_state([0])
+    drive(state, 1000, 0, position=1, lap=3)
+
+    events = drive(state, 90000, 0, position=1, lap=4,
+                   last_lap=encode_lap(88500, 0))
+    assert types(events) == [RaceEventType.LapCompleted]
+    assert events[0].duration_ms == 88500
+    assert events[0].lap == 4
+
+
+def test_removed_cars_leave_the_position_index():
+
+    state = make_state([0, 1, 2])
+    for car_index in range(3):
+        drive(state, 1000, car_index, position=car_index + 1)
+
+    state.handle_packet(encode_entry_list([0, 2]))
+    assert 1 not in state.race_detector._by_position.values()
+    assert set(state.race_detector._cars) == {0, 2}
@@ -0,0 +1,71 @@
+import socket
+import time
+
+from AccServerSimulator import (encode_car_update, encode_entry_list,
+                                encode_entry_list_car, encode_registration)
+from PyAccUdpInterface import AccUdpState, DatagramReceiver
+
+
+INFO = {
+    "name": "tests",
+    "password": "",
+    "speed": 100,
+    "cmd_password": ""
+}
+
+CARS = list(range(12))
+
+
+def packets() -> list:
+
+    # Different names and values in every datagram, a decoded object
+    # still pointing into a reused buffer would show the wrong one
+    data = [encode_registration(1), encode_entry_list(CARS)]
+    for car_index in CARS:
+        data.append(encode_entry_list_car(
+            car_index, f"Team {car_index}", 100 + car_index,
+            drivers=[(f"First {car_index}", f"Last {car_index}",
+                      f"S{car_index}")]))
+
+    for car_index in CARS:
+        data.append(encode_car_update(car_index, car_index + 1,
+                                      lap=car_index, kmh=100 + car_index,
+                                      spline_position=car_index / 20))
+
+    return data
+
+
+def test_pool_reuse_keeps_decoded_data():
+
+    receiving = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiving.bind(("127.0.0.1", 0))
+    sending = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    try:
+        for data in packets():
+            sending.sendto(data, receiving.getsockname())
+        time.sleep(0.1)
+
+        # Every buffer of the pool is reused several times in one drain
+        pooled = AccUdpState("127.0.0.1", 9000, INFO)
+        receiver = DatagramReceiver(receiving, pool_size=4)
+        assert receiver.drain(pooled.handle_packet) == len(packets())
+
+    finally:
+        receiving.close()
+        sending.close()
+
+    stats = receiver.stats()
+    assert stats["full_batches"] >= len(packets()) // 4 - 1
+    assert stats["max_batch"] == 4
+
+    expected = AccUdpState("127.0.0.1", 9000, INFO)
+    for data in packets():
+        expected.handle_packet(data)
+
+    assert pooled._udp_data == expected._udp_data
+    for car_index in CARS:
+        entry = pooled._udp_data["entries"][car_index]
+        assert entry["team"] == f"Team {car_index}"
+        assert entry["driver"]["last_name"] == f"Last {car_index}"
+        assert entry["lap"] == car_index
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from PyAccUdpInterface import PacketRecorder, PacketReplay
+
+
+# Five datagrams 100 ms apart
+TIMESTAMPS_NS = [5_000_000_000 + index * 100_000_000 for index in range(5)]
+
+
+@pytest.fixture
+def recording(tmp_path) -> str:
+
+    path = str(tmp_path / "race.accudp")
+    recorder = PacketRecorder(path)
+    for index, timestamp_ns in enumerate(TIMESTAMPS_NS):
+        recorder.write(bytes([3, index]) * (index + 1), timestamp_ns)
+    recorder.close()
+
+    return path
+
+
+def play(path: str, speed: float) -> list:
+
+    received = []
+    with PacketReplay(path) as replay:
+        count = replay.play(
+            lambda data: received.append((time.perf_counter(), bytes(data))),
+            speed)
+
+    assert count == len(received)
+    return received
+
+
+def test_replay_keeps_the_order(recording):
+
+    received = play(recording, 0)
+    assert [data for _, data in received] == [
+        bytes([3, index]) * (index + 1) for index in range(5)]
+
+
+@pytest.mark.parametrize("speed", [1.0, 4.0])
+def test_replay_speed(recording, speed):
+
+    received = play(recording, speed)
+
+    # Spaced like the recording, scaled by speed
+    start = received[0][0]
+    for (at, _), timestamp_ns in zip(received, TIMESTAMPS_NS):
+        expected = (timestamp_ns - TIMESTAMPS_NS[0]) / 1e9 / speed
+        assert expected - 0.005 <= at - start < expected + 0.05
+
+
+def test_replay_as_fast_as_possible(recording):
+
+    received = play(recording, 0)
+    assert received[-1][0] - received[0][0] < 0.05
+
+
+def test_replay_stops_at_a_cut_record(recording):
+
+    # The last packet was only half written
+    with open(recording, "r+b") as file:
+        file.truncate(file.seek(0, 2) - 3)
+
+    assert len(play(recording, 0)) == 4
@@ -0,0 +1,133 @@
+import multiprocessing
+import time
+
+import pytest
+
+from AccServerSimulator import AccServerSimulator
+from PyAccUdpInterface import AccServerGroup, accUpdInterface
+
+
+INFO = {
+    "name": "spawn",
+    "password": "",
+    "speed": 20,
+    "cmd_password": ""
+}
+
+
+@pytest.fixture
+def spawn():
+
+    # Windows only has spawn, every listener object crosses the process
+    # boundary pickled there
+    method = multiprocessing.get_start_method(allow_none=True)
+    multiprocessing.set_start_method("spawn", force=True)
+    yield
+    multiprocessing.set_start_method(method, force=True)
+
+
+@pytest.fixture
+def simulator():
+
+    simulator = AccServerSimulator(port=0, car_count=5, interval_ms=20,
+                                   seed=1)
+    simulator.start()
+    yield simulator
+    simulator.stop()
+
+
+def wait_for(predicate, timeout: float = 10.0) -> bool:
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+
+    return False
+
+
+def test_process_listener_under_spawn(spawn, simulator):
+
+    ip, port = simulator.address
+    aui = accUpdInterface(ip, port, INFO, local_port=0, metrics=True,
+                          telemetry_capacity=16)
+    aui.start()
+    try:
+        assert wait_for(lambda: len(aui.udp_data["entries"]) == 5)
+        assert wait_for(lambda: aui.stats()["packets"]["car_update"] > 0)
+        assert aui.udp_data["connection"]["connected"]
+        assert len(aui.telemetry.latest()["car_index"]) == 5
+
+    finally:
+        aui.stop()
+
+    assert not aui.udp_interface_listener.is_alive()
+
+
+def test_group_under_spawn(spawn, simulator):
+
+    ip, port = simulator.address
+    group = AccServerGroup({"a": {"ip": ip, "port": port,
+                                  "instance_info": INFO}})
+    group.start()
+    try:
+        assert wait_for(lambda: len(group["a"].udp_data["entries"]) == 5)
+
+    finally:
+        group.stop()
+
+
+@pytest.fixture(params=["fork", "spawn"])
+def start_method(request):
+
+    if request.param not in multiprocessing.get_all_start_methods():
+        pytest.skip(f"No {request.param} start method here")
+
+    method = multiprocessing.get_start_method(allow_none=True)
+    multiprocessing.set_start_method(request.param, force=True)
+    yield request.param
+    multiprocessing.set_start_method(method, force=True)
+
+
+def test_group_member_callbacks(start_method, simulator):
+
+    ip, port = simulator.address
+    group = AccServerGroup({"a": {"ip": ip, "port": port,
+                                  "instance_info": INFO}})
+
+    # One handler known when the worker starts, one added while it runs
+    car_updates = []
+    entry_lists = []
+    group["a"].on_car_update(car_updates.append)
+    group.start()
+    try:
+        group["a"].on_entry_list(entry_lists.append)
+        assert wait_for(lambda: len(car_updates) > 10)
+        group.call("a", "request_entry_list")
+        assert wait_for(lambda: len(entry_lists) > 0)
+        assert car_updates[0].car_index in range(5)
+
+    finally:
+        group.stop()
+
+
+def test_process_listener_race_events():
+
+    # Laps go by fast enough to get LapCompleted events
+    simulator = AccServerSimulator(port=0, car_count=5, interval_ms=20,
+                                   time_scale=40, seed=1)
+    simulator.start()
+
+    aui = accUpdInterface(*simulator.address, INFO, local_port=0)
+    aui.start()
+    try:
+        assert wait_for(lambda: len(aui.race_events_since(0)) > 0)
+        event = aui.race_events_since(0)[0]
+        assert event.car_index in range(5)
+        assert all(later.seq > event.seq
+                   for later in aui.race_events_since(event.seq))
+
+    finally:
+        aui.stop()
+        simulator.stop()
@@ -0,0 +1,142 @@
+from AccServerSimulator import (encode_car_update, encode_entry_list,
+                                encode_entry_list_car, encode_realtime_update,
+                                encode_registration, encode_track_data)
+from PyAccUdpInterface import (AccUdpState, Cursor, RealTimeCarUpdate,
+                               Subscription)
+
+
+INFO = {
+    "name": "tests",
+    "password": "",
+    "speed": 100,
+    "cmd_password": ""
+}
+
+
+class SendingState(AccUdpState):
+
+    # Keeps the type of every packet sent instead of sending it
+    def __init__(self, *args, **kwargs):
+        self.sent = []
+        super().__init__("127.0.0.1", 9000, INFO, *args, **kwargs)
+
+    def _send(self, data: bytes) -> None:
+        self.sent.append(data[0])
+
+
+def make_grid(state: AccUdpState, car_ids: list) -> None:
+
+    state.handle_packet(encode_entry_list(car_ids))
+    for car_index in car_ids:
+        state.handle_packet(encode_entry_list_car(car_index))
+
+
+def test_registration_request_covers_unknown_cars():
+
+    state = SendingState()
+    state.handle_packet(encode_registration(1))
+    for car_index in range(5):
+        state.handle_packet(encode_car_update(car_index, car_index + 1))
+
+    # Track data and one entry list request, the unknown cars wait for it
+    assert state.sent == [11, 10]
+
+
+def test_car_updates_bring_the_entry_list_along():
+
+    state = SendingState(subscription=Subscription(["car_update"]))
+    state.handle_packet(encode_registration(1))
+    make_grid(state, [0, 1])
+
+    # Long after the registration's entry list request, the cars are known
+    # and there is nothing left to ask for
+    state._entry_list_deadline = 0.0
+    for car_index in range(2):
+        state.handle_packet(encode_car_update(car_index, car_index + 1))
+
+    assert state.sent == [11, 10]
+    assert sorted(state._udp_data["entries"]) == [0, 1]
+
+
+def test_update_leaderboard_looks_up_the_car():
+
+    state = SendingState()
+    make_grid(state, [0, 1])
+
+    known = RealTimeCarUpdate(Cursor(encode_car_update(1, 1, lap=3)[1:]))
+    state.update_leaderboard(known)
+    assert state._udp_data["entries"][1]["lap"] == 3
+
+    # A car outside the entry list is left alone
+    unknown = RealTimeCarUpdate(Cursor(encode_car_update(7, 3)[1:]))
+    state.update_leaderboard(unknown)
+    assert 7 not in state._udp_data["entries"]
+
+
+def test_unchanged_standings_keep_entry_versions():
+
+    state = SendingState()
+    state.handle_packet(encode_track_data())
+    make_grid(state, [0, 1, 2])
+    for car_index in range(3):
+        state.handle_packet(encode_car_update(
+            car_index, car_index + 1, spline_position=0.5 - car_index * 0.1))
+
+    state.handle_packet(encode_realtime_update())
+    version = state._version
+
+    # Nobody moved, the next tick only changes the session
+    state.handle_packet(encode_realtime_update())
+    changes = state.changes_since(version)
+    assert changes["entries"] == {}
+    assert changes["session"] is not None
+
+
+def test_stale_cached_car_with_a_new_driver(tmp_path):
+
+    # The cache knows the car with one driver, a second one joined since
+    cached = AccUdpState("127.0.0.1", 9000, INFO, cache_dir=str(tmp_path))
+    cached.handle_packet(encode_track_data())
+    cached.handle_packet(encode_entry_list([0]))
+    cached.handle_packet(encode_entry_list_car(
+        0, drivers=[("A", "One", "ONE")]))
+    cached.save_cache()
+
+    state = AccUdpState("127.0.0.1", 9000, INFO, cache_dir=str(tmp_path))
+    state.handle_packet(encode_entry_list([0]))
+    state.handle_packet(encode_car_update(0, 1, driver_index=1, lap=5))
+
+    entry = state._udp_data["entries"][0]
+    assert entry["lap"] == 5
+    assert entry["team"] == "Team 0"
+    assert entry["driver"] == {"first_name": "First Name",
+                               "last_name": "Last Name"}
+
+    state.handle_packet(encode_entry_list_car(
+        0, drivers=[("A", "One", "ONE"), ("B", "Two", "TWO")]))
+    state.handle_packet(encode_car_update(0, 1, driver_index=1, lap=5))
+    assert state._udp_data["entries"][0]["driver"]["last_name"] == "Two"
+
+
+def test_unsubscribed_packets_are_not_timed():
+
+    state = AccUdpState("127.0.0.1", 9000, INFO, metrics=True,
+                        subscription=Subscription(["realtime_update"]))
+    state.handle_packet(encode_realtime_update())
+    for car_index in range(3):
+        state.handle_packet(encode_car_update(car_index, car_index + 1))
+
+    # Counted as received, only the decoded ones are in the histograms
+    stats = state.stats()
+    assert stats["packets"]["car_update"] == 3
+    assert stats["decode"]["car_update"]["count"] == 0
+    assert stats["decode"]["realtime_update"]["count"] == 1
+
+
+def test_prometheus_without_metrics():
+
+    state = AccUdpState("127.0.0.1", 9000, INFO)
+    state.handle_packet(encode_realtime_update())
+
+    assert state.stats() is None
+    assert state.prometheus() == ""
@@ -0,0 +1,51 @@
+import math
+
+import pytest
+
+from AccServerSimulator import encode_car_update
+from PyAccUdpInterface import Cursor, RealTimeCarUpdate, TelemetryBuffer
+
+pytest.importorskip("numpy")
+
+
+def car_update(car_index: int, **fields) -> RealTimeCarUpdate:
+    return RealTimeCarUpdate(Cursor(encode_car_update(car_index, 1,
+                                                      **fields)[1:]))
+
+
+def test_yaw_interpolated_across_pi():
+
+    buffer = TelemetryBuffer(capacity=8, max_cars=4)
+    buffer.append(car_update(0, yaw=3.0), 10.0)
+    buffer.append(car_update(0, yaw=-3.0), 11.0)
+
+    # The short way round is 0.28 rad through pi, not 6 through zero
+    yaw = float(buffer.resample(10.5)["yaw"][0])
+    assert abs(abs(yaw) - math.pi) < 1e-5
+
+    yaw = float(buffer.resample(10.25)["yaw"][0])
+    assert yaw == pytest.approx(3.0 + (2 * math.pi - 6.0) / 4, abs=1e-5)
+
+
+def test_spline_interpolated_across_the_line():
+
+    buffer = TelemetryBuffer(capacity=8, max_cars=4)
+    buffer.append(car_update(0, spline_position=0.9), 10.0)
+    buffer.append(car_update(0, spline_position=0.1), 11.0)
+
+    spline = buffer.resample(10.25)["spline_position"]
+    assert float(spline[0]) == pytest.approx(0.95, abs=1e-5)
+
+    # Past the line, not back on the lap before
+    spline = buffer.resample(10.75)["spline_position"]
+    assert float(spline[0]) == pytest.approx(0.05, abs=1e-5)
+
+
+@pytest.mark.parametrize("history", [0, 8, 20])
+def test_resample_history_within_capacity(history):
+
+    buffer = TelemetryBuffer(capacity=8, max_cars=4)
+    buffer.append(car_update(0), 10.0)
+
+    with pytest.raises(ValueError):
+        buffer.resample(10.0, history=history)